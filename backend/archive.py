@@ -0,0 +1,197 @@
+"""
+Scrape archive: every scraped event as one JSON line, for backfills and offline
+ingest load tests.
+
+ArchiveWriter buffers lines in memory and appends them in batches off the event
+loop. The live segment (scraped_events.jsonl) is rotated into a gzipped,
+timestamped file (scraped_events-YYYYmmdd-HHMMSS-ffffff.jsonl.gz) once it exceeds
+SCRAPE_ARCHIVE_MAX_BYTES or has been written to for SCRAPE_ARCHIVE_MAX_AGE
+seconds; only the newest SCRAPE_ARCHIVE_KEEP rotated segments are kept.
+
+Replay re-ingests archived events through bulk_upsert_events without touching
+the network. Archived events are listing cards, so detail fields already
+stored on an event are kept; each batch goes through the deduplicator for
+its canonical_id like a scraped one:
+
+    python archive.py replay [--dry-run] [--batch-size N] [PATH ...]
+
+PATH defaults to every rotated segment plus the live one, oldest first.
+"""
+import asyncio
+import glob
+import gzip
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+from models import Event
+from log import get_logger
+
+logger = get_logger("archive")
+
+
+class ArchiveWriter:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        keep: Optional[int] = None,
+        flush_lines: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.path = path or os.getenv("SCRAPE_ARCHIVE_PATH", "scraped_events.jsonl")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("SCRAPE_ARCHIVE_MAX_BYTES", 50 * 1024 * 1024))
+        self.max_age = max_age if max_age is not None else float(os.getenv("SCRAPE_ARCHIVE_MAX_AGE", 24 * 3600))
+        self.keep = keep if keep is not None else int(os.getenv("SCRAPE_ARCHIVE_KEEP", 14))
+        # Buffered lines that trigger a background flush
+        self.flush_lines = flush_lines if flush_lines is not None else int(os.getenv("SCRAPE_ARCHIVE_FLUSH_LINES", 1000))
+        self.enabled = enabled if enabled is not None else os.getenv("SCRAPE_ARCHIVE", "true").lower() == "true"
+        self._buffer: List[str] = []
+        self._lock = asyncio.Lock()
+        self._pending: Optional[asyncio.Task] = None
+        # When this process first appended to the live segment (age-based rotation)
+        self._segment_started: Optional[float] = None
+        self.lines_written = 0
+        self.rotations = 0
+
+    def write(self, events: Iterable[Event]):
+        """Buffer events; flushes in the background once `flush_lines` are waiting."""
+        if not self.enabled:
+            return
+        for event in events:
+            event_data = event.model_dump(exclude_none=True, exclude={"id"})
+            self._buffer.append(json.dumps(event_data, default=str) + "\n")
+        if len(self._buffer) >= self.flush_lines and (self._pending is None or self._pending.done()):
+            self._pending = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """Append everything buffered so far, rotating first if the segment is due."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            try:
+                await asyncio.to_thread(self._append, lines)
+            except Exception as e:
+                logger.exception("Archive write failed", dropped_lines=len(lines), error=str(e))
+
+    async def close(self):
+        if self._pending is not None:
+            await asyncio.gather(self._pending, return_exceptions=True)
+        await self.flush()
+
+    def _append(self, lines: List[str]):
+        if self._rotation_due():
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as fp:
+            fp.writelines(lines)
+        if self._segment_started is None:
+            self._segment_started = time.time()
+        self.lines_written += len(lines)
+
+    def _rotation_due(self) -> bool:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size == 0:
+            return False
+        if size >= self.max_bytes:
+            return True
+        return self._segment_started is not None and time.time() - self._segment_started >= self.max_age
+
+    def _rotate(self):
+        stem, ext = os.path.splitext(self.path)
+        rotated = f"{stem}-{datetime.utcnow():%Y%m%d-%H%M%S-%f}{ext}.gz"
+        with open(self.path, "rb") as src, gzip.open(rotated, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        self._segment_started = None
+        self.rotations += 1
+        for old in rotated_segments(self.path)[:-self.keep or None]:
+            os.remove(old)
+        logger.info("Archive rotated", segment=rotated)
+
+
+def rotated_segments(path: str) -> List[str]:
+    """Rotated segments for `path`, oldest first (timestamps sort lexically)."""
+    stem, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(stem)}-*{ext}.gz"))
+
+
+def iter_archive(paths: Iterable[str]) -> Iterator[Event]:
+    """Yield archived events from plain or gzipped JSON-lines files, in order."""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fp:
+            for line_number, line in enumerate(fp, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield Event(**json.loads(line))
+                except Exception as e:
+                    logger.warning("Skipping unreadable archive line", path=path, line=line_number, error=str(e))
+
+
+async def replay(collection, paths: Iterable[str], batch_size: int = 1000, deduplicator=None):
+    """Upsert archived events in batches; returns the summed IngestResult."""
+    from dedup import Deduplicator
+    from ingest import DERIVED_FIELDS, ENRICHED_FIELDS, IngestResult, bulk_upsert_events
+
+    deduplicator = deduplicator or Deduplicator(collection)
+    total = IngestResult()
+    batch: List[Event] = []
+
+    async def upsert_batch(events: List[Event]):
+        events = await deduplicator.assign(events)
+        total.add(await bulk_upsert_events(
+            collection, events, fill_from_stored=ENRICHED_FIELDS | DERIVED_FIELDS,
+        ))
+        logger.info("Replayed events", total=total.total, **total.as_dict())
+
+    for event in iter_archive(paths):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            await upsert_batch(batch)
+            batch = []
+    if batch:
+        await upsert_batch(batch)
+    return total
+
+
+async def _main(argv: List[str]) -> int:
+    if not argv or argv[0] != "replay":
+        print(__doc__)
+        return 2
+    args = argv[1:]
+    dry_run = "--dry-run" in args
+    batch_size = 1000
+    if "--batch-size" in args:
+        batch_size = int(args[args.index("--batch-size") + 1])
+        del args[args.index("--batch-size"):args.index("--batch-size") + 2]
+    paths = [a for a in args if not a.startswith("--")]
+    if not paths:
+        live = os.getenv("SCRAPE_ARCHIVE_PATH", "scraped_events.jsonl")
+        paths = rotated_segments(live) + ([live] if os.path.exists(live) else [])
+
+    if dry_run:
+        count = sum(1 for _ in iter_archive(paths))
+        print(f"{count} events in {len(paths)} archive files")
+        return 0
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    result = await replay(client.sydney_events.events, paths, batch_size)
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
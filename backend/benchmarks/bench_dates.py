@@ -0,0 +1,251 @@
+"""
+Correctness checks and benchmark for date_parser.
+
+    python benchmarks/bench_dates.py [--repeat N] [--json]
+
+1. Known strings must parse to known datetimes for a fixed reference date.
+2. For every string in the corpus and every reference date over a leap and a
+   non-leap year, `parse_date_time` must agree with the previous
+   implementation (kept below as `legacy_parse_date_time`).
+3. Then both are timed over the corpus: the legacy parser, the new parser
+   with a cold cache, and with a warm cache (the steady state while scraping,
+   since listing pages repeat the same strings).
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import calendar
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import date_parser  # noqa: E402
+from parsing import parse_listing_page  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Reference date is Tuesday 2025-06-03
+REFERENCE = date(2025, 6, 3)
+EXPECTED = {
+    "Tomorrow at 12:00 PM": datetime(2025, 6, 4, 12, 0),
+    "Today at 8:30 AM": datetime(2025, 6, 3, 8, 30),
+    "Fri, May 28, 8:30 AM": datetime(2025, 5, 28, 8, 30),
+    "Tue, Jun 10, 8:30 AM": datetime(2025, 6, 10, 8, 30),
+    "Friday at 10:00 PM": datetime(2025, 6, 6, 22, 0),
+    "Tuesday at 6:30 PM": datetime(2025, 6, 10, 18, 30),
+    "Sat, Jun 14 • 2:00 PM": datetime(2025, 6, 14, 14, 0),
+    "Sun, July 6 · 11:00 am": datetime(2025, 7, 6, 11, 0),
+    "Wed, Jan 7 2026 | 7:30 PM": datetime(2026, 1, 7, 19, 30),
+    "Thu | 9:15 PM": datetime(2025, 6, 5, 21, 15),
+    "Feb 29 • 7:00 PM": None,
+    "Tomorrow at 7:00PM": None,
+    "Sat, Jun 31 • 2:00 PM": None,
+    "Starts soon": None,
+    "": None,
+}
+
+EXTRA_CORPUS = [
+    "Mon, Sept 8 • 6:00 PM", "Saturday • 10:00 AM", "Tomorrow • 13:00 PM",
+    "Fri, Dec 26, 11:59 PM", "Sat at 9:00 pm", "Multiple dates", "Jun 10 2025, 8:30 AM",
+    "Sun, Jun 1, 0:30 AM", "Wed,, Jun 4,, 7:05 PM", "Thursday at 6:30 PM + 3 more",
+]
+
+
+def legacy_parse_date_time(raw: str, today_date: date) -> Optional[datetime]:
+    """
+    Parse strings like:
+      - "Tomorrow at 12:00 PM"
+      - "Fri, May 28, 8:30 AM"
+      - "Tue, Jun 10, 8:30 AM"
+      - "Friday at 10:00 PM"
+      - "Thursday at 6:30 PM"
+      - "Sat, Jun 14, 2:00 PM"
+    into a datetime (assuming current year). Returns None if parsing fails.
+    """
+
+    if not raw:
+        return None
+
+    # 1) Normalize “at” → comma, bullets/pipes → comma
+    normalized = (
+        raw
+        .replace(" at ", ", ")
+        .replace("•", ",")
+        .replace("·", ",")
+        .replace("|", ",")
+    )
+    normalized = re.sub(r",\s*,+", ",", normalized).strip()
+
+    # 2) Split on commas
+    parts = [p.strip() for p in normalized.split(",") if p.strip()]
+
+    # 3) Find the “time” portion (e.g. "10:00 PM" or "8:30 AM")
+    time_part = None
+    for p in parts:
+        if re.search(r"\b\d{1,2}:\d{2}\s*[APap][Mm]\b", p):
+            time_part = p
+            break
+    if not time_part:
+        return None
+
+    # Parse the time into a time object
+    try:
+        time_obj = datetime.strptime(time_part.upper(), "%I:%M %p").time()
+    except ValueError:
+        return None
+
+    current_year = today_date.year
+
+    # Helper: next occurrence of a given weekday (0=Mon ... 6=Sun)
+    def next_weekday(curr: date, target_wd: int) -> date:
+        today_wd = curr.weekday()
+        days_ahead = (target_wd - today_wd + 7) % 7
+        if days_ahead == 0:
+            days_ahead = 7  # skip today, move to next week
+        return curr + timedelta(days=days_ahead)
+
+    # 4) FIRST: attempt to find a “month-day” substring (e.g. "May 28", "Jun 10")
+    month_day_str = None
+    for p in parts:
+        # check for full month names or abbreviations
+        if any(mon.lower() in p.lower() for mon in calendar.month_name if mon):
+            month_day_str = p
+            break
+        if any(ab.lower() in p.lower() for ab in calendar.month_abbr if ab):
+            month_day_str = p
+            break
+
+    if month_day_str:
+        md = month_day_str.strip()
+        year_match = re.search(r"\b(\d{4})\b", md)
+        if year_match:
+            # parse "Jun 10 2025" or "June 10 2025"
+            try:
+                event_date = datetime.strptime(md, "%b %d %Y").date()
+            except ValueError:
+                try:
+                    event_date = datetime.strptime(md, "%B %d %Y").date()
+                except ValueError:
+                    return None
+        else:
+            # append current year (e.g. "Jun 10 2025" if current_year=2025)
+            try:
+                event_date = datetime.strptime(f"{md} {current_year}", "%b %d %Y").date()
+            except ValueError:
+                try:
+                    event_date = datetime.strptime(f"{md} {current_year}", "%B %d %Y").date()
+                except ValueError:
+                    return None
+
+        return datetime.combine(event_date, time_obj)
+
+    # 5) FALLBACK: “today”, “tomorrow”, or weekday logic
+    first_part = parts[0].lower()
+
+    if "today" in first_part:
+        event_date = today_date
+    elif "tomorrow" in first_part:
+        event_date = today_date + timedelta(days=1)
+    else:
+        weekdays_full = {name.lower(): idx for idx, name in enumerate(calendar.day_name)}
+        weekdays_abbr = {name.lower(): idx for idx, name in enumerate(calendar.day_abbr)}
+
+        if first_part in weekdays_full:
+            target_wd = weekdays_full[first_part]
+            event_date = next_weekday(today_date, target_wd)
+        elif first_part in weekdays_abbr:
+            target_wd = weekdays_abbr[first_part]
+            event_date = next_weekday(today_date, target_wd)
+        else:
+            # Unable to interpret date
+            return None
+
+    return datetime.combine(event_date, time_obj)
+
+
+def fixture_strings():
+    strings = []
+    with contextlib.redirect_stdout(io.StringIO()) as captured:
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+            with open(path, encoding="utf-8") as fp:
+                parse_listing_page(fp.read(), "", 1)
+    # The extractor logs each card's raw string; collect them from that output
+    for line in captured.getvalue().splitlines():
+        if "raw_date_time: " in line:
+            strings.append(line.split("raw_date_time: ", 1)[1])
+    return strings
+
+
+def time_it(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    failures = []
+    for raw, want in EXPECTED.items():
+        got = date_parser.parse_date_time(raw, REFERENCE)
+        if got != want:
+            failures.append(f"{raw!r}: expected {want}, got {got}")
+
+    corpus = fixture_strings() + list(EXPECTED) + EXTRA_CORPUS
+    unique = sorted(set(corpus))
+    reference_days = [date(2024, 1, 1) + timedelta(days=i) for i in range(366 + 365)]
+    for today in reference_days:
+        for raw in unique:
+            want = legacy_parse_date_time(raw, today) if raw else None
+            got = date_parser.parse_date_time(raw, today)
+            if got != want:
+                failures.append(f"{raw!r} on {today}: legacy {want}, new {got}")
+
+    if failures:
+        print("\n".join(failures[:50]))
+        sys.exit(f"{len(failures)} date parsing check(s) failed")
+
+    today = REFERENCE
+    calls = len(corpus) * args.repeat
+    legacy_s = time_it(lambda: [legacy_parse_date_time(r, today) for r in corpus if r], args.repeat)
+
+    def cold():
+        date_parser._parse_cached.cache_clear()
+        date_parser.parse_many(corpus, today)
+    cold_s = time_it(cold, args.repeat)
+    warm_s = time_it(lambda: date_parser.parse_many(corpus, today), args.repeat)
+
+    results = {
+        "corpus_strings": len(corpus),
+        "unique_strings": len(unique),
+        "reference_days_checked": len(reference_days),
+        "us_per_call": {
+            "legacy": round(legacy_s / calls * 1e6, 3),
+            "cold_cache": round(cold_s / calls * 1e6, 3),
+            "warm_cache": round(warm_s / calls * 1e6, 3),
+        },
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"all checks passed: {len(EXPECTED)} known strings, "
+          f"{len(unique)} strings x {len(reference_days)} reference days against legacy")
+    for name, value in results["us_per_call"].items():
+        print(f"{name:<12}{value:>10} us/call")
+
+
+if __name__ == "__main__":
+    main()
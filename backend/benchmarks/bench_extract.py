@@ -0,0 +1,89 @@
+"""
+Benchmark the listing-page extractors over saved Eventbrite HTML.
+
+    python benchmarks/bench_extract.py [--repeat N] [--json] [PAGE.html ...]
+
+Defaults to every page in benchmarks/fixtures/. Every engine must produce the
+same event dicts as "eventbrite" on every page, otherwise the run fails.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import EXTRACTORS, FAST_TREE_BUILDER  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ENGINES = ["eventbrite", "eventbrite-fast"]
+BASE_URL = "https://www.eventbrite.com/d/australia--sydney/all-events/"
+
+
+def run_engine(name, pages, repeat):
+    extractor = EXTRACTORS[name]
+    outputs = []
+    cards = 0
+    # With LOG_LEVEL=DEBUG the extractors log one line per card; keep that out of the timing output
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            outputs = [extractor(html, BASE_URL, i + 1) for i, html in enumerate(pages)]
+            cards += sum(len(out or []) for out in outputs)
+        elapsed = time.perf_counter() - start
+    page_runs = len(pages) * repeat
+    return outputs, {
+        "engine": name,
+        "pages": page_runs,
+        "cards": cards,
+        "ms_per_page": round(elapsed / page_runs * 1000, 3),
+        "cards_per_s": round(cards / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="saved listing pages (default: fixtures/*.html)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    paths = args.pages or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+    if not paths:
+        sys.exit("No fixture pages found")
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fp:
+            pages.append(fp.read())
+
+    results = []
+    reference = None
+    for name in ENGINES:
+        outputs, stats = run_engine(name, pages, args.repeat)
+        if reference is None:
+            reference = outputs
+        elif outputs != reference:
+            for path, got, want in zip(paths, outputs, reference):
+                if got != want:
+                    sys.exit(f"{name} output differs from {ENGINES[0]} on {path}")
+        results.append(stats)
+
+    baseline = results[0]["ms_per_page"]
+    for stats in results:
+        stats["speedup"] = round(baseline / stats["ms_per_page"], 2) if stats["ms_per_page"] else None
+
+    if args.json:
+        print(json.dumps({"tree_builder": FAST_TREE_BUILDER, "fixtures": paths, "results": results}, indent=2))
+        return
+    print(f"{len(paths)} page(s) x {args.repeat} runs, fast engine tree builder: {FAST_TREE_BUILDER}")
+    print(f"{'engine':<18}{'ms/page':>10}{'cards/s':>12}{'speedup':>9}")
+    for stats in results:
+        print(f"{stats['engine']:<18}{stats['ms_per_page']:>10}{stats['cards_per_s']:>12}{stats['speedup']:>8}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Benchmark the full periodic cycle (scrape -> parse -> upsert -> cleanup) offline.
+
+    python benchmarks/bench_pipeline.py [--sizes 1000,10000] [--cycles 2]
+                                        [--mongo-url URL] [--output FILE]
+
+A local aiohttp server stands in for Eventbrite. It serves the recorded listing
+pages in fixtures/ with their event ids rewritten, so that a catalogue of N
+events spans N/20 distinct pages (20 ids per fixture page). It answers
+If-None-Match with a 304, like the real site. Mongo is mongomock_motor (in memory) unless --mongo-url
+points at a real server, where the "bench_pipeline" database is dropped and
+reused.
+
+Each catalogue size runs in a fresh subprocess, so peak RSS is per size. It
+runs main.scrape_cycle `--cycles` times: the first cycle is a cold full crawl
+into an empty database, later ones are warm (HTTP cache, delta crawl).
+Results go to stdout (or --output) as JSON, for comparing runs.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(BACKEND_DIR, "benchmarks", "fixtures")
+LISTING_PATH = "/d/australia--sydney/all-events/"
+
+
+class StandInServer:
+    """Serves `catalogue_size` events as recorded listing pages with unique ids."""
+
+    def __init__(self, catalogue_size: int):
+        self.templates = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "eventbrite_sydney_page_*.html"))):
+            with open(path, encoding="utf-8") as fp:
+                html = fp.read()
+            ids = list(dict.fromkeys(re.findall(r'data-event-id="(\d+)"', html)))
+            self.templates.append((html, ids))
+        with open(os.path.join(FIXTURES_DIR, "eventbrite_sydney_empty_page.html"), encoding="utf-8") as fp:
+            self.empty_page = fp.read()
+        per_page = len(self.templates[0][1])
+        self.pages = -(-catalogue_size // per_page)
+        self.events = self.pages * per_page
+        self.requests = 0
+        self.not_modified = 0
+
+    def render(self, page_number: int) -> str:
+        html, ids = self.templates[(page_number - 1) % len(self.templates)]
+        id_pattern = re.compile("|".join(ids))
+        offset = page_number * 1000
+        mapping = {old: str(10 ** 11 + offset + i) for i, old in enumerate(ids)}
+        return id_pattern.sub(lambda m: mapping[m.group(0)], html)
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        page_number = int(request.query.get("page", 1))
+        etag = f'"page-{page_number}-of-{self.pages}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        body = self.render(page_number) if page_number <= self.pages else self.empty_page
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    async def start(self) -> str:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get(LISTING_PATH, self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}{LISTING_PATH}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def children_peak_rss_mb() -> float:
+    """Summed peak RSS of live child processes (the parse workers), from /proc."""
+    total_kb = 0
+    for children in glob.glob("/proc/self/task/*/children"):
+        with open(children) as fp:
+            pids = fp.read().split()
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/status") as fp:
+                    for line in fp:
+                        if line.startswith("VmHWM:"):
+                            total_kb += int(line.split()[1])
+            except OSError:
+                continue
+    return round(total_kb / 1024, 1)
+
+
+async def run_one(catalogue_size: int, cycles: int, mongo_url: str) -> dict:
+    server = StandInServer(catalogue_size)
+    base_url = await server.start()
+
+    # Point the built-in source at the stand-in, with limits that let it run flat out
+    os.environ["SCRAPE_SOURCES"] = json.dumps([{
+        "name": "eventbrite-sydney", "base_url": base_url,
+        "extractor": os.getenv("EVENTBRITE_EXTRACTOR", "eventbrite"),
+        "rate": 10000, "burst": 10000, "concurrency": 32,
+    }])
+    os.environ["HTTP_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-http-cache-")
+    os.environ["SCRAPE_ARCHIVE"] = "false"
+    # Fixture ticket_urls point at the real site
+    os.environ["ENRICH_DETAILS"] = "false"
+    os.environ["SCRAPE_START_JITTER"] = "0"
+
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    import scraper
+
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_url)
+        await client.drop_database("bench_pipeline")
+        db = client.bench_pipeline
+    else:
+        import mongomock_motor
+
+        db = mongomock_motor.AsyncMongoMockClient().bench_pipeline
+    main.db = db
+    for name in dir(main):
+        if name.endswith("_collection"):
+            setattr(main, name, db[name[: -len("_collection")]])
+    main.scrape_lease.collection = db.leases
+    await main.init_db()
+
+    timings = {}
+    scrapers = []
+
+    class RecordingScraper(scraper.EventScraper):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            scrapers.append(self)
+
+    from dedup import Deduplicator
+    from enrichment import DetailEnricher
+    from pipeline import ScrapePipeline
+
+    pipeline = main.scrape_pipeline = ScrapePipeline(
+        db.events, db.scrape_state,
+        DetailEnricher(db.event_details, scraper.default_fetcher, scraper.default_parse_pool,
+                       scraper.default_scheduler),
+        Deduplicator(db.events),
+        scraper_factory=RecordingScraper,
+    )
+
+    def timed(key, fn):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+        return wrapper
+
+    pool = scraper.default_parse_pool
+    original_parse = pool.parse
+    parsed_cards = [0]
+
+    async def counting_parse(*args, **kwargs):
+        dicts = await original_parse(*args, **kwargs)
+        parsed_cards[0] += len(dicts or [])
+        return dicts
+
+    pool.parse = timed("parse", counting_parse)
+    original_upsert = pipeline.upsert
+    batch_sizes = []
+
+    async def counting_upsert(events):
+        batch_sizes.append(len(events))
+        return await original_upsert(events)
+
+    pipeline.upsert = timed("upsert", counting_upsert)
+
+    results = []
+    for cycle in range(1, cycles + 1):
+        timings.clear()
+        batch_sizes.clear()
+        parsed_cards[0] = 0
+        requests_before = server.requests
+        start = time.perf_counter()
+        counts = await main.scrape_cycle()
+        elapsed = time.perf_counter() - start
+        stats = scrapers[-1].crawl_stats[0]
+        upsert_s = timings.get("upsert", 0.0)
+        results.append({
+            "cycle": cycle,
+            "mode": "full" if stats.full else "delta",
+            "cycle_s": round(elapsed, 3),
+            # Upserts overlap the crawl, so this is not a share of cycle_s
+            "upsert_s": round(upsert_s, 3),
+            "upsert_batches": len(batch_sizes),
+            "max_batch_events": max(batch_sizes, default=0),
+            "http_requests": server.requests - requests_before,
+            "pages_fetched": stats.pages_fetched,
+            "pages_parsed": stats.pages_parsed,
+            "pages_unchanged": stats.pages_unchanged,
+            "pages_per_s": round(stats.pages_fetched / elapsed, 1) if elapsed else None,
+            "cards_parsed": parsed_cards[0],
+            # Summed wall time of parse calls, which overlap when PARSE_WORKERS > 1
+            "parse_ms_per_card": round(timings.get("parse", 0.0) / parsed_cards[0] * 1000, 4) if parsed_cards[0] else None,
+            "events_submitted": counts["scraped"] if counts else 0,
+            "upsert_ops_per_s": round(counts["scraped"] / upsert_s, 1) if counts and upsert_s else None,
+            "ingest": {k: v for k, v in (counts or {}).items() if k != "scraped"},
+        })
+
+    children_rss = children_peak_rss_mb()
+    await server.stop()
+    await main.mail_queue.stop()
+    pool.shutdown()
+    return {
+        "catalogue_size": catalogue_size,
+        "events_served": server.events,
+        "pages_served": server.pages,
+        "stored_events": await db.events.count_documents({}),
+        "cycles": results,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_parse_workers_mb": children_rss,
+    }
+
+
+def child(args) -> int:
+    # Send the app's logs (and the parse workers' copies) to /dev/null and keep
+    # the real stdout for the result
+    result_fd = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    result = asyncio.run(run_one(args.one, args.cycles, args.mongo_url))
+    with os.fdopen(result_fd, "w") as out:
+        out.write(json.dumps(result))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated catalogue sizes, e.g. 1000,10000,100000")
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--mongo-url", default="", help="real MongoDB to use instead of mongomock_motor")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        sys.exit(child(args))
+
+    if not args.mongo_url:
+        try:
+            import mongomock_motor  # noqa: F401
+        except ImportError:
+            sys.exit("Install mongomock-motor or pass --mongo-url")
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        command = [sys.executable, os.path.abspath(__file__), "--one", str(size),
+                   "--cycles", str(args.cycles), "--mongo-url", args.mongo_url]
+        proc = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            sys.exit(f"Benchmark for catalogue size {size} failed")
+        results.append(json.loads(proc.stdout))
+        print(f"catalogue {size}: {results[-1]['cycles'][0]['cycle_s']}s cold cycle", file=sys.stderr)
+
+    report = json.dumps({
+        "benchmark": "pipeline",
+        "mongo": "external" if args.mongo_url else "mongomock_motor",
+        "extractor": os.getenv("EVENTBRITE_EXTRACTOR", "eventbrite"),
+        "parse_workers": int(os.getenv("PARSE_WORKERS", 2)),
+        "python": sys.version.split()[0],
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            fp.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
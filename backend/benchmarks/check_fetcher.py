@@ -0,0 +1,179 @@
+"""
+Fault-injection checks for fetcher.Fetcher and the scraper's use of it.
+
+    python benchmarks/check_fetcher.py
+
+Starts a local aiohttp server whose routes misbehave on purpose:
+
+1. /flaky     503 with Retry-After: 0 twice, then 200: retried, then succeeds.
+2. /throttled 429 with Retry-After: 1 once: the retry waits ~1s, not the backoff.
+3. /slow      sleeps past the request timeout once: retried after the timeout.
+4. /down      500 until told otherwise, on its own host: retries end with the
+              last error status; the circuit opens after the threshold, fails
+              fast while open, and one half-open trial closes it once the
+              host recovers.
+5. A crawl of the recorded listing pages where page 2 returns 503 once:
+   the scraper retries instead of truncating the crawl at page 1.
+
+Exits non-zero if any check fails.
+"""
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+
+from fetcher import CircuitOpen, Fetcher  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FaultyServer:
+    def __init__(self):
+        self.hits = {}
+        self.down = True
+        pages = sorted(glob.glob(os.path.join(FIXTURES_DIR, "eventbrite_sydney_page_*.html")))
+        self.listing = [open(p, encoding="utf-8").read() for p in pages]
+        with open(os.path.join(FIXTURES_DIR, "eventbrite_sydney_empty_page.html"), encoding="utf-8") as fp:
+            self.empty = fp.read()
+
+    def hit(self, name: str) -> int:
+        self.hits[name] = self.hits.get(name, 0) + 1
+        return self.hits[name]
+
+    async def flaky(self, request):
+        if self.hit("flaky") <= 2:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.Response(text="ok")
+
+    async def throttled(self, request):
+        if self.hit("throttled") == 1:
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        return web.Response(text="ok")
+
+    async def slow(self, request):
+        if self.hit("slow") == 1:
+            await asyncio.sleep(2)
+        return web.Response(text="ok")
+
+    async def down_route(self, request):
+        self.hit("down")
+        if self.down:
+            return web.Response(status=500)
+        return web.Response(text="ok")
+
+    async def listing_route(self, request):
+        page = int(request.query.get("page", 1))
+        self.hit(f"listing-{page}")
+        if page == 2 and self.hits["listing-2"] == 1:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        body = self.listing[page - 1] if page <= len(self.listing) else self.empty
+        return web.Response(text=body, content_type="text/html")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/flaky", self.flaky)
+        app.router.add_get("/throttled", self.throttled)
+        app.router.add_get("/slow", self.slow)
+        app.router.add_get("/down", self.down_route)
+        app.router.add_get("/listing", self.listing_route)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def url(self, path: str, host: str = "127.0.0.1") -> str:
+        return f"http://{host}:{self.port}{path}"
+
+
+async def run_checks() -> list:
+    server = FaultyServer()
+    await server.start()
+    failures = []
+
+    def check(name, condition, detail=""):
+        print(f"{'ok  ' if condition else 'FAIL'} {name}{': ' + detail if detail else ''}")
+        if not condition:
+            failures.append(name)
+
+    fetcher = Fetcher(max_retries=3, backoff=0.05, total_timeout=0.5, connect_timeout=0.5,
+                      breaker_threshold=3, breaker_reset=0.5)
+
+    result = await fetcher.get(server.url("/flaky"))
+    check("retries 503 then succeeds", result.status == 200 and result.attempts == 3,
+          f"status {result.status} after {result.attempts} attempts")
+
+    start = time.perf_counter()
+    result = await fetcher.get(server.url("/throttled"))
+    waited = time.perf_counter() - start
+    check("honours Retry-After on 429", result.status == 200 and 0.9 <= waited < 2, f"waited {waited:.2f}s")
+
+    start = time.perf_counter()
+    result = await fetcher.get(server.url("/slow"))
+    waited = time.perf_counter() - start
+    check("times out and retries a stalled response", result.status == 200 and waited < 1.5,
+          f"{result.attempts} attempts in {waited:.2f}s")
+
+    # A separate host name gives /down its own breaker
+    down_url = server.url("/down", host="localhost")
+    patient = Fetcher(max_retries=1, backoff=0.05, breaker_threshold=10)
+    result = await patient.get(down_url)
+    check("returns the last error status once retries run out", result.status == 500 and result.attempts == 2)
+    await patient.close()
+
+    server.hits["down"] = 0
+    try:
+        await fetcher.get(down_url)
+        opened = False
+    except CircuitOpen:
+        opened = True
+    check("circuit opens after the failure threshold", opened and server.hits["down"] == 3,
+          f"{server.hits['down']} requests sent")
+    try:
+        await fetcher.get(down_url)
+        fast_failed = False
+    except CircuitOpen:
+        fast_failed = True
+    check("open circuit fails fast", fast_failed and server.hits["down"] == 3, f"{fetcher.stats()['breakers']}")
+    check("other hosts are unaffected", (await fetcher.get(server.url("/flaky"))).status == 200)
+
+    server.down = False
+    await asyncio.sleep(0.6)
+    result = await fetcher.get(down_url)
+    check("half-open trial closes the circuit after recovery",
+          result.status == 200 and fetcher.breaker(down_url).state == "closed")
+
+    # A transient 503 in the middle of a crawl no longer truncates it
+    os.environ["HTTP_CACHE_DIR"] = tempfile.mkdtemp(prefix="check-fetcher-cache-")
+    from http_cache import HttpCache
+    from scraper import EventScraper
+    from sources import Source
+
+    source = Source(name="faulty", base_url=server.url("/listing"))
+    scraper = EventScraper(sources=[source], fetcher=fetcher, http_cache=HttpCache(max_entries=0))
+    scraper.archive.enabled = False
+    events = await scraper.scrape_events()
+    stats = scraper.crawl_stats[0]
+    check("crawl survives a transient 503", stats.completed and stats.pages_parsed == len(server.listing) + 1,
+          f"{stats.pages_parsed} pages, {len(events)} events")
+
+    await fetcher.close()
+    await server.runner.cleanup()
+    return failures
+
+
+def main():
+    failures = asyncio.run(run_checks())
+    if failures:
+        sys.exit(f"{len(failures)} check(s) failed")
+    print("All fetcher checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List
-from models import Event
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import AsyncIterator, List, Optional
+from models import Event, normalize_email
+from ingest import IngestResult, bulk_upsert_events
+from indexes import reconcile_indexes
 import os
 from datetime import datetime
 from dotenv import load_dotenv
+from log import get_logger
 
 load_dotenv()
+logger = get_logger("database")
 
 class Database:
     def __init__(self):
@@ -19,29 +25,14 @@ class Database:
         self.verified_emails_collection = self.db.verified_emails
 
     async def ensure_indexes(self):
-        # Unique index on (email, event_id) in email_submissions
-        await self.email_submissions_collection.create_index(
-            [("email", 1), ("event_id", 1)],
-            unique=True
-        )
-
-        # TTL index on OTPs (expire after 300 seconds)
-        await self.otps_collection.create_index(
-            [("created_at", 1)],
-            expireAfterSeconds=300
-        )
+        """Create the indexes declared in indexes.py; returns the drift report."""
+        return await reconcile_indexes(self.db)
 
-        # Unique index on verified_emails.email
-        await self.verified_emails_collection.create_index(
-            [("email", 1)],
-            unique=True
-        )
-
-    async def get_all_events(self) -> List[Event]:
-        events = []
-        cursor = self.events_collection.find()
+    async def iter_events(self, batch_size: int = 500) -> AsyncIterator[Event]:
+        """Yield every stored event, fetching `batch_size` documents per round-trip."""
+        cursor = self.events_collection.find().batch_size(batch_size)
         async for document in cursor:
-            events.append(Event(
+            yield Event(
                 id=str(document["_id"]),
                 source_id=document.get("source_id", ""),
                 title=document.get("title", ""),
@@ -50,38 +41,46 @@ class Database:
                 venue=document.get("venue", ""),
                 image_url=document.get("image_url", ""),
                 ticket_url=document.get("ticket_url", ""),
-                source_url=document.get("source_url", "")
-            ))
-        return events
+                source_url=document.get("source_url", ""),
+                end_date=document.get("end_date"),
+                price=document.get("price"),
+                canonical_id=document.get("canonical_id"),
+            )
 
-    async def update_events(self, events: List[Event]):
-        for event in events:
-            event_data = event.dict(exclude_none=True, exclude={"id"})
-            filter_query = {
-                "source_url": event.source_url,
-                "source_id": event.source_id
-            }
-            update_doc = {"$set": event_data}
-            try:
-                await self.events_collection.update_one(
-                    filter_query, update_doc, upsert=True
-                )
-            except Exception as e:
-                print(f"[Database.update_events] Failed to upsert {event.source_id}: {e}")
+    async def get_all_events(self) -> List[Event]:
+        return [event async for event in self.iter_events()]
+
+    async def update_events(self, events: List[Event]) -> IngestResult:
+        result = await bulk_upsert_events(
+            self.events_collection,
+            events,
+            key_fields=("source_url", "source_id"),
+            exclude_none=True,
+        )
+        if result.failed:
+            logger.warning("Failed to upsert events", failed=result.failed)
+        return result
 
     # --- OTP & Verification Methods ---
 
     async def create_otp(self, email: str, otp: str, dob: str):
-        await self.otps_collection.insert_one({
-            "email": email,
-            "otp": otp,
-            "dob": dob,
-            "created_at": datetime.utcnow()
-        })
+        # One document per email (unique index); a resend replaces the code and resets attempts
+        email = normalize_email(email)
+        update = {
+            "$set": {"otp": otp, "dob": dob, "created_at": datetime.utcnow(), "attempts": 0},
+            "$inc": {"sends": 1},
+        }
+        try:
+            await self.otps_collection.update_one({"email": email}, update, upsert=True)
+        except DuplicateKeyError:
+            await self.otps_collection.update_one({"email": email}, update)
 
-    async def verify_otp(self, email: str, otp: str, dob: str = None) -> bool:
-        record = await self.otps_collection.find_one(
-            {"email": email}, sort=[("created_at", -1)]
+    async def verify_otp(self, email: str, otp: str, dob: str = None, max_attempts: int = 5) -> bool:
+        email = normalize_email(email)
+        record = await self.otps_collection.find_one_and_update(
+            {"email": email, "attempts": {"$not": {"$gte": max_attempts}}},
+            {"$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
         )
         if not record:
             return False
@@ -98,28 +97,35 @@ class Database:
 
     async def is_email_verified(self, email: str) -> bool:
         doc = await self.verified_emails_collection.find_one({
-            "email": email,
+            "email": normalize_email(email),
             "verified": True
         })
         return doc is not None
 
-    async def save_email_submission(self, email: str, event_id: str):
+    async def save_email_submission(self, email: str, event_id: Optional[str] = None) -> bool:
+        """
+        Subscribe `email`; returns False if it already was. Subscriptions are
+        one per email (unique index in indexes.py), as with /submit-email;
+        `event_id` only records which event the first submission came from.
+        """
+        email = normalize_email(email)
         # Ensure email is verified first
         if not await self.is_email_verified(email):
             raise Exception("Email not verified")
 
+        doc = {"email": email, "submitted_at": datetime.utcnow()}
+        if event_id is not None:
+            doc["event_id"] = event_id
         try:
-            await self.email_submissions_collection.insert_one({
-                "email": email,
-                "event_id": event_id,
-                "submitted_at": datetime.utcnow()
-            })
-        except Exception as e:
-            if "duplicate key error" in str(e).lower():
-                # Already subscribed; ignore
-                return
-            else:
-                raise
+            result = await self.email_submissions_collection.update_one(
+                {"email": email},
+                {"$setOnInsert": doc},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent submission for the same email won the upsert race
+            return False
+        return result.upserted_id is not None
 
     def close(self):
         self.client.close()
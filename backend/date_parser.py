@@ -0,0 +1,132 @@
+"""
+Parser for the relative date strings on Eventbrite listing cards.
+
+Listing pages repeat the same handful of strings ("Tomorrow at 7:00 PM",
+"Sat, Jun 14 • 2:00 PM") over and over, so results are memoized per
+(raw string, reference date). The reference date is "today" in Sydney, which
+is what the listing's relative dates are relative to. Returned datetimes are
+naive Sydney wall-clock times, which is how events have always been stored.
+"""
+import calendar
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+    SYDNEY_TZ = ZoneInfo("Australia/Sydney")
+except Exception:  # no tz database available; fall back to the host's local date
+    SYDNEY_TZ = None
+
+_REPEATED_COMMAS = re.compile(r",\s*,+")
+# A part that contains a time somewhere...
+_TIME_SEARCH = re.compile(r"\b\d{1,2}:\d{2}\s*[APap][Mm]\b")
+# ...and what the whole part has to look like for it to be used
+_TIME_FULL = re.compile(r"(1[0-2]|0[1-9]|[1-9]):([0-5]\d|\d)\s+(AM|PM)")
+# Any month abbreviation (full month names all start with one)
+_MONTH_SEARCH = re.compile(
+    "|".join(abbr.lower() for abbr in calendar.month_abbr if abbr), re.IGNORECASE
+)
+_MONTH_DAY = re.compile(r"([A-Za-z]+)\s+(\d{1,2})(?:\s+(\d{4}))?")
+
+_MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({abbr.lower(): i for i, abbr in enumerate(calendar.month_abbr) if abbr})
+_WEEKDAYS = {name.lower(): i for i, name in enumerate(calendar.day_name)}
+_WEEKDAYS.update({abbr.lower(): i for i, abbr in enumerate(calendar.day_abbr)})
+
+CACHE_SIZE = int(os.getenv("DATE_PARSE_CACHE_SIZE", 4096))
+
+
+def sydney_today() -> date:
+    if SYDNEY_TZ is None:
+        return date.today()
+    return datetime.now(SYDNEY_TZ).date()
+
+
+def _parse_time(part: str) -> Optional[time]:
+    match = _TIME_FULL.fullmatch(part.strip().upper())
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2)), match.group(3)
+    return time(hour % 12 + (12 if meridiem == "PM" else 0), minute)
+
+
+def _parse_month_day(part: str, year: int) -> Optional[date]:
+    match = _MONTH_DAY.fullmatch(part.strip())
+    if not match:
+        return None
+    month = _MONTHS.get(match.group(1).lower())
+    if month is None:
+        return None
+    try:
+        return date(int(match.group(3) or year), month, int(match.group(2)))
+    except ValueError:
+        return None
+
+
+def _next_weekday(curr: date, target_wd: int) -> date:
+    """Next occurrence of a weekday (0=Mon ... 6=Sun), never today."""
+    days_ahead = (target_wd - curr.weekday() + 7) % 7 or 7
+    return curr + timedelta(days=days_ahead)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_cached(raw: str, today: date) -> Optional[datetime]:
+    # 1) Normalize “at” → comma, bullets/pipes → comma, then split into parts
+    normalized = raw.replace(" at ", ", ").replace("•", ",").replace("·", ",").replace("|", ",")
+    normalized = _REPEATED_COMMAS.sub(",", normalized).strip()
+    parts = [p.strip() for p in normalized.split(",") if p.strip()]
+
+    # 2) The first part mentioning a time has to be exactly that time
+    time_part = next((p for p in parts if _TIME_SEARCH.search(p)), None)
+    if time_part is None:
+        return None
+    time_obj = _parse_time(time_part)
+    if time_obj is None:
+        return None
+
+    # 3) An explicit "Jun 10" / "June 10 2025" wins over relative words
+    month_day_str = next((p for p in parts if _MONTH_SEARCH.search(p)), None)
+    if month_day_str is not None:
+        event_date = _parse_month_day(month_day_str, today.year)
+        return datetime.combine(event_date, time_obj) if event_date else None
+
+    # 4) "today", "tomorrow" or a weekday name
+    first_part = parts[0].lower()
+    if "today" in first_part:
+        event_date = today
+    elif "tomorrow" in first_part:
+        event_date = today + timedelta(days=1)
+    elif first_part in _WEEKDAYS:
+        event_date = _next_weekday(today, _WEEKDAYS[first_part])
+    else:
+        return None
+    return datetime.combine(event_date, time_obj)
+
+
+def parse_date_time(raw: str, today: Optional[date] = None) -> Optional[datetime]:
+    """
+    Parse strings like:
+      - "Tomorrow at 12:00 PM"
+      - "Fri, May 28, 8:30 AM"
+      - "Tue, Jun 10, 8:30 AM"
+      - "Friday at 10:00 PM"
+      - "Sat, Jun 14 • 2:00 PM"
+    into a datetime, relative to `today` (default: today in Sydney) and
+    assuming the current year. Returns None if parsing fails.
+    """
+    if not raw:
+        return None
+    return _parse_cached(raw, today or sydney_today())
+
+
+def parse_many(raws: Iterable[str], today: Optional[date] = None) -> List[Optional[datetime]]:
+    """Parse a batch of strings against a single reference date."""
+    today = today or sydney_today()
+    return [_parse_cached(raw, today) if raw else None for raw in raws]
+
+
+def cache_info():
+    return _parse_cached.cache_info()
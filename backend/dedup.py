@@ -0,0 +1,189 @@
+"""
+Near-duplicate detection across pages, sources and cycles.
+
+Exact repeats (promoted cards Eventbrite shows on several pages) never get
+this far: the scraper drops a card whose (source_url, source_id) it already
+saw this cycle. This module catches the same event listed under different
+ids, e.g. one gig on two sources.
+
+An event's normalized title and venue are cut into character shingles and
+reduced to a MinHash signature. The signature is split into LSH bands, each
+hashed into a key prefixed with the event's day; the keys are stored on the
+event (`dedup_keys`, a multikey index), so candidates for a whole batch come
+from one indexed `$in` lookup instead of a comparison with every stored
+event. The lookup also uses the neighbouring day's keys when the event starts
+within MAX_START_GAP of midnight, so a duplicate listed just across it is
+still compared. A candidate is a duplicate when the signatures estimate a similarity of
+at least DEDUP_THRESHOLD and the two start within an hour of each other.
+
+The first event seen of a group is its canonical event. A new or changed event
+that duplicates stored ones takes over their `canonical_id`, otherwise it is
+its own; unchanged events keep theirs without being hashed again. GET /events
+with `collapse=true` returns canonical events only.
+"""
+import hashlib
+import os
+import random
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ingest import LISTING_FIELDS, listing_hash
+from log import get_logger
+from metrics import EVENTS_DEDUPLICATED
+from models import Event
+
+logger = get_logger("dedup")
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE_SIZE = 4
+# Duplicates start within this many seconds of each other
+MAX_START_GAP = 3600
+
+# XOR masks standing in for independent hash functions; fixed so signatures
+# and band keys stay comparable across processes and releases
+_rng = random.Random(0x5EED)
+_MASKS = tuple(_rng.getrandbits(64) for _ in range(PERMUTATIONS))
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def signature(title: str, venue: str) -> Tuple[int, ...]:
+    """MinHash signature over character shingles of the normalized title and venue."""
+    text = f"{normalize(title)} | {normalize(venue)}"
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = [_hash64(s) for s in shingles]
+    return tuple(min(map(mask.__xor__, hashes)) for mask in _MASKS)
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def _band_digests(sig: Sequence[int]) -> List[str]:
+    return [hashlib.blake2b(repr(sig[band * ROWS:(band + 1) * ROWS]).encode("ascii"), digest_size=6).hexdigest()
+            for band in range(BANDS)]
+
+
+def band_keys(sig: Sequence[int], date: Optional[datetime]) -> List[str]:
+    """The keys an event is stored under: one per band, on the day it starts."""
+    day = date.date().isoformat() if date else "undated"
+    return [f"{day}:{band}:{digest}" for band, digest in enumerate(_band_digests(sig))]
+
+
+def candidate_keys(sig: Sequence[int], date: Optional[datetime]) -> List[str]:
+    """
+    The keys to look duplicates of an event up by: its band keys on every day
+    an event starting within MAX_START_GAP of it can be stored under.
+    """
+    if date is None:
+        return band_keys(sig, None)
+    gap = timedelta(seconds=MAX_START_GAP)
+    days = sorted({(date - gap).date(), date.date(), (date + gap).date()})
+    digests = _band_digests(sig)
+    return [f"{day.isoformat()}:{band}:{digest}" for day in days for band, digest in enumerate(digests)]
+
+
+def _close_in_time(a: Optional[datetime], b: Optional[datetime]) -> bool:
+    if a is None or b is None:
+        return a is b
+    return abs((a - b).total_seconds()) <= MAX_START_GAP
+
+
+class Deduplicator:
+    def __init__(self, events_collection, threshold: Optional[float] = None, enabled: Optional[bool] = None):
+        self.collection = events_collection
+        self.threshold = threshold if threshold is not None else float(os.getenv("DEDUP_THRESHOLD", 0.6))
+        if enabled is None:
+            enabled = os.getenv("DEDUP_NEAR", "true").lower() == "true"
+        self.enabled = enabled
+
+    async def assign(self, events: List[Event]) -> List[Event]:
+        """Return `events` with `canonical_id` and `dedup_keys` set."""
+        if not self.enabled or not events:
+            return events
+
+        # Unchanged events keep what they were stored with
+        stored: Dict[str, dict] = {}
+        projection = {"_id": 0, "canonical_id": 1, "dedup_keys": 1, **{f: 1 for f in LISTING_FIELDS}}
+        async for doc in self.collection.find({"source_id": {"$in": [e.source_id for e in events]}}, projection):
+            stored[doc["source_id"]] = doc
+
+        result: List[Optional[Event]] = [None] * len(events)
+        # (position, event, signature, band keys, candidate keys)
+        pending: List[Tuple[int, Event, Tuple[int, ...], List[str], List[str]]] = []
+        for i, event in enumerate(events):
+            doc = stored.get(event.source_id)
+            if doc and doc.get("canonical_id") and doc.get("dedup_keys") \
+                    and listing_hash(doc) == listing_hash(event.model_dump(exclude={"id"})):
+                result[i] = event.model_copy(update={"canonical_id": doc["canonical_id"],
+                                                     "dedup_keys": doc["dedup_keys"]})
+                continue
+            sig = signature(event.title, event.venue)
+            pending.append((i, event, sig, band_keys(sig, event.date), candidate_keys(sig, event.date)))
+
+        if pending:
+            candidates = await self._candidates({k for *_, lookup in pending for k in lookup})
+            # Events assigned earlier in this batch are candidates for later ones
+            buckets: Dict[str, List[dict]] = {}
+            for doc in candidates:
+                for key in doc.get("dedup_keys") or ():
+                    buckets.setdefault(key, []).append(doc)
+
+            near = 0
+            for i, event, sig, keys, lookup in pending:
+                previous = stored.get(event.source_id, {}).get("canonical_id")
+                if previous == event.source_id:
+                    # Other events may point at this one; it stays canonical
+                    canonical = previous
+                else:
+                    canonical = self._match(event, sig, lookup, buckets) or event.source_id
+                if canonical != event.source_id:
+                    near += 1
+                result[i] = event.model_copy(update={"canonical_id": canonical, "dedup_keys": keys})
+                entry = {"source_id": event.source_id, "source_url": event.source_url,
+                         "date": event.date, "canonical_id": canonical, "_sig": sig}
+                for key in keys:
+                    buckets.setdefault(key, []).append(entry)
+            if near:
+                EVENTS_DEDUPLICATED.inc(near, kind="near")
+                logger.debug("Near-duplicate events", count=near, checked=len(pending))
+        return result
+
+    async def _candidates(self, keys) -> List[dict]:
+        projection = {"_id": 0, "source_id": 1, "source_url": 1, "title": 1, "venue": 1,
+                      "date": 1, "canonical_id": 1, "dedup_keys": 1}
+        return await self.collection.find({"dedup_keys": {"$in": list(keys)}}, projection).to_list(length=None)
+
+    def _match(self, event: Event, sig, keys: List[str], buckets: Dict[str, List[dict]]) -> Optional[str]:
+        """Canonical id of the duplicates of `event` among its bucket neighbours, if any."""
+        canonical_ids = set()
+        checked = set()
+        for key in keys:
+            for doc in buckets.get(key, ()):
+                ident = (doc.get("source_url"), doc.get("source_id"))
+                if ident in checked or ident == (event.source_url, event.source_id):
+                    continue
+                checked.add(ident)
+                if "_sig" not in doc:
+                    doc["_sig"] = signature(doc.get("title", ""), doc.get("venue", ""))
+                if _close_in_time(event.date, doc.get("date")) and similarity(sig, doc["_sig"]) >= self.threshold:
+                    canonical_ids.add(doc.get("canonical_id") or doc.get("source_id"))
+        # Several groups can match; pick one deterministically
+        return min(canonical_ids) if canonical_ids else None
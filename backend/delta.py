@@ -0,0 +1,130 @@
+"""
+Incremental ("delta") scraping.
+
+Most listing pages carry the same events from one hourly cycle to the next. A
+delta crawl compares each parsed card against the (source_url, source_id) →
+listing-hash pairs of the stored events, and stops paginating a source after
+DELTA_STOP_AFTER_PAGES consecutive pages that bring nothing new or changed.
+Every FULL_CRAWL_INTERVAL seconds a source gets a full crawl instead, which
+reconciles anything a delta crawl stopped short of and refreshes the source's
+high-water mark (how many pages its listing ran to).
+"""
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from ingest import LISTING_FIELDS, listing_hash
+from models import Event
+from sources import Source
+
+
+@dataclass
+class SourcePlan:
+    full: bool
+    # Pages the source's last complete full crawl reached
+    high_water: int = 0
+
+
+@dataclass
+class CrawlStats:
+    source: str
+    full: bool = True
+    high_water: int = 0
+    pages_fetched: int = 0
+    pages_parsed: int = 0
+    # Byte-identical to a page already parsed today (see http_cache)
+    pages_unchanged: int = 0
+    last_page: int = 0
+    # Cards dropped as repeats of one already seen this run
+    cards_repeated: int = 0
+    # Reached the end of the listing (an empty page) rather than an error
+    completed: bool = False
+    stopped_early: bool = False
+
+    @property
+    def pages_skipped(self) -> int:
+        """Pages below the high-water mark that were never requested."""
+        return max(0, self.high_water - self.pages_fetched) if self.stopped_early else 0
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "mode": "full" if self.full else "delta",
+            "pages_fetched": self.pages_fetched,
+            "pages_parsed": self.pages_parsed,
+            "pages_unchanged": self.pages_unchanged,
+            "pages_skipped": self.pages_skipped,
+            "cards_repeated": self.cards_repeated,
+            "high_water": self.high_water,
+            "stopped_early": self.stopped_early,
+        }
+
+
+@dataclass
+class DeltaState:
+    known: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    plans: Dict[str, SourcePlan] = field(default_factory=dict)
+    stop_after: int = 2
+
+    def plan(self, source_name: str) -> SourcePlan:
+        return self.plans.get(source_name, SourcePlan(full=True))
+
+    def is_new_or_changed(self, event: Event) -> bool:
+        stored = self.known.get((event.source_url, event.source_id))
+        return stored != listing_hash(event.model_dump(exclude={"id"}))
+
+
+async def load_delta_state(
+    events_collection,
+    state_collection,
+    sources: List[Source],
+    force_full: bool = False,
+    full_crawl_interval: Optional[float] = None,
+    stop_after: Optional[int] = None,
+) -> DeltaState:
+    """
+    Build the seen-set for the events of `sources` (only those: a per-source
+    job should not load the whole catalogue) and decide which of them get a
+    full crawl.
+    """
+    if full_crawl_interval is None:
+        full_crawl_interval = float(os.getenv("FULL_CRAWL_INTERVAL", 24 * 3600))
+    if stop_after is None:
+        stop_after = int(os.getenv("DELTA_STOP_AFTER_PAGES", 2))
+
+    # Listing hashes only: enrichment fills in fields the listing card never has
+    known: Dict[Tuple[str, str], str] = {}
+    projection = {"_id": 0, **{f: 1 for f in LISTING_FIELDS}}
+    source_urls = list({source.base_url for source in sources})
+    async for doc in events_collection.find({"source_url": {"$in": source_urls}}, projection):
+        known[(doc.get("source_url"), doc.get("source_id"))] = listing_hash(doc)
+
+    plans: Dict[str, SourcePlan] = {}
+    source_names = [source.name for source in sources]
+    full_before = datetime.utcnow() - timedelta(seconds=full_crawl_interval)
+    states = {doc["_id"]: doc async for doc in state_collection.find({"_id": {"$in": source_names}})}
+    for name in source_names:
+        state = states.get(name)
+        last_full = state.get("last_full_crawl_at") if state else None
+        plans[name] = SourcePlan(
+            full=force_full or last_full is None or last_full < full_before,
+            high_water=state.get("high_water", 0) if state else 0,
+        )
+    return DeltaState(known=known, plans=plans, stop_after=max(1, stop_after))
+
+
+async def save_crawl_stats(state_collection, stats: List[CrawlStats]):
+    """Record each source's crawl; complete full crawls move the high-water mark."""
+    now = datetime.utcnow()
+    for s in stats:
+        update = {
+            "last_crawl_at": now,
+            "last_crawl_full": s.full,
+            "last_pages_fetched": s.pages_fetched,
+            "last_pages_skipped": s.pages_skipped,
+        }
+        if s.full and s.completed:
+            update["last_full_crawl_at"] = now
+            update["high_water"] = s.last_page
+        await state_collection.update_one({"_id": s.source}, {"$set": update}, upsert=True)
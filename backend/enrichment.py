@@ -0,0 +1,174 @@
+"""
+Detail-page enrichment: description, end time and price from each event's
+ticket_url page.
+
+Fetching thousands of detail pages every cycle is not viable, so results are
+cached per source_id in the `event_details` collection along with the
+listing hash they were fetched for. An event's detail page is fetched only when
+it has no cached details, its listing card changed (different listing hash),
+or the cached details are older than ENRICH_TTL seconds; a TTL index on
+`fetched_at` drops expired entries. Everything else is filled in from the
+cache. At most ENRICH_MAX_PER_CYCLE pages are fetched per cycle by
+ENRICH_WORKERS workers, within the per-host limits of the scheduler; pass the
+listing crawl's (scraper.default_scheduler) so both count against one limit.
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from fetcher import CircuitOpen, Fetcher
+from ingest import ENRICHED_FIELDS, listing_hash
+from log import get_logger
+from models import Event
+from parsing import ParsePool
+from scheduler import HostScheduler
+
+logger = get_logger("enrichment")
+
+
+def enrich_ttl() -> int:
+    return int(os.getenv("ENRICH_TTL", 7 * 24 * 3600))
+
+
+@dataclass
+class EnrichResult:
+    events: List[Event]
+    cached: int = 0
+    fetched: int = 0
+    failed: int = 0
+    # Needed a fetch but over ENRICH_MAX_PER_CYCLE; picked up next cycle
+    deferred: int = 0
+
+    def as_dict(self) -> dict:
+        return {"cached": self.cached, "fetched": self.fetched, "failed": self.failed, "deferred": self.deferred}
+
+
+class DetailEnricher:
+    def __init__(
+        self,
+        details_collection,
+        fetcher: Fetcher,
+        parse_pool: ParsePool,
+        scheduler: Optional[HostScheduler] = None,
+        workers: Optional[int] = None,
+        ttl: Optional[int] = None,
+        max_per_cycle: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.collection = details_collection
+        self.fetcher = fetcher
+        self.parse_pool = parse_pool
+        self.scheduler = scheduler or HostScheduler()
+        self.workers = max(1, workers if workers is not None else int(os.getenv("ENRICH_WORKERS", 4)))
+        self.ttl = ttl if ttl is not None else enrich_ttl()
+        self.max_per_cycle = max_per_cycle if max_per_cycle is not None else int(os.getenv("ENRICH_MAX_PER_CYCLE", 500))
+        if enabled is None:
+            enabled = os.getenv("ENRICH_DETAILS", "true").lower() == "true"
+        self.enabled = enabled
+
+    async def enrich(self, events: List[Event], max_fetches: Optional[int] = None) -> EnrichResult:
+        """
+        Return `events` with detail fields filled from the cache or fresh
+        fetches. At most `max_fetches` pages (default `max_per_cycle`) are
+        fetched; callers enriching a cycle batch by batch pass what is left.
+        """
+        if not self.enabled:
+            return EnrichResult(events=list(events))
+        result = EnrichResult(events=[])
+        cached = await self._load_cached([e.source_id for e in events if e.source_id])
+        fresh_after = datetime.utcnow() - timedelta(seconds=self.ttl)
+
+        hashes: Dict[str, str] = {}
+        to_fetch: Dict[str, Event] = {}
+        for event in events:
+            key = event.source_id
+            hashes[key] = listing_hash(event.model_dump(exclude={"id"}))
+            doc = cached.get(key)
+            if doc and doc.get("listing_hash") == hashes[key] and doc.get("fetched_at", datetime.min) > fresh_after:
+                continue
+            if key and event.ticket_url and key not in to_fetch:
+                to_fetch[key] = event
+
+        if max_fetches is None:
+            max_fetches = self.max_per_cycle
+        queue = list(to_fetch.values())
+        if len(queue) > max_fetches:
+            result.deferred = len(queue) - max(0, max_fetches)
+            queue = queue[:max(0, max_fetches)]
+        fetched = await self._fetch_all(queue, hashes)
+        result.fetched = len(fetched)
+        result.failed = len(queue) - len(fetched)
+        cached.update(fetched)
+
+        for event in events:
+            doc = cached.get(event.source_id)
+            if doc is None:
+                result.events.append(event)
+                continue
+            if event.source_id not in fetched:
+                result.cached += 1
+            # Stale details beat none while a refetch is deferred or failing
+            update = {f: doc.get(f) for f in ENRICHED_FIELDS if doc.get(f) is not None}
+            result.events.append(event.model_copy(update=update))
+        logger.debug("Enriched batch", **result.as_dict())
+        return result
+
+    async def _load_cached(self, source_ids: List[str]) -> Dict[str, dict]:
+        cached: Dict[str, dict] = {}
+        for start in range(0, len(source_ids), 1000):
+            chunk = source_ids[start:start + 1000]
+            async for doc in self.collection.find({"_id": {"$in": chunk}}):
+                cached[doc["_id"]] = doc
+        return cached
+
+    async def _fetch_all(self, events: List[Event], hashes: Dict[str, str]) -> Dict[str, dict]:
+        """Fetch detail pages with a bounded worker pool; cache and return the successes."""
+        pending: asyncio.Queue = asyncio.Queue()
+        for event in events:
+            pending.put_nowait(event)
+        fetched: Dict[str, dict] = {}
+
+        async def worker():
+            while True:
+                try:
+                    event = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                details = await self._fetch_one(event)
+                if details is not None:
+                    details.update(_id=event.source_id, listing_hash=hashes[event.source_id],
+                                   fetched_at=datetime.utcnow())
+                    fetched[event.source_id] = details
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(events)))))
+        if fetched:
+            await self.collection.bulk_write(
+                [UpdateOne({"_id": key}, {"$set": doc}, upsert=True) for key, doc in fetched.items()],
+                ordered=False,
+            )
+        return fetched
+
+    async def _fetch_one(self, event: Event) -> Optional[dict]:
+        try:
+            async with self.scheduler.slot(event.ticket_url):
+                response = await self.fetcher.get(event.ticket_url)
+        except CircuitOpen:
+            return None
+        except Exception as e:
+            logger.warning("Detail page fetch failed", url=event.ticket_url, error=repr(e))
+            return None
+        if response.status != 200 or not response.text:
+            logger.warning("Detail page fetch failed", url=event.ticket_url, status=response.status)
+            # A missing page will not appear by retrying; cache the miss until the TTL
+            if response.status in (404, 410):
+                return {f: None for f in ENRICHED_FIELDS}
+            return None
+        try:
+            return await self.parse_pool.parse_detail(response.text)
+        except Exception as e:
+            logger.warning("Detail page parse failed", url=event.ticket_url, error=repr(e))
+            return None
@@ -0,0 +1,113 @@
+"""
+Filter, projection and keyset-cursor helpers for GET /events.
+
+Pages are ordered by (date, _id) and a cursor encodes the last (date, _id)
+returned, so each page is a bounded index range scan instead of a skip.
+"""
+import base64
+import json
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from models import Event
+
+EVENT_SORT = [("date", 1), ("_id", 1)]
+
+# Stored alongside events for ingest and dedup, never sent to clients
+HIDDEN_FIELDS = {"content_hash": 0, "dedup_keys": 0}
+
+# Fields a client may ask for via ?fields=; date and _id are always returned
+# because the next cursor is built from them.
+PROJECTABLE_FIELDS = set(Event.model_fields) - {"id"} - set(HIDDEN_FIELDS)
+
+
+def encode_cursor(date: Optional[datetime], object_id: ObjectId) -> str:
+    payload = json.dumps({"d": date.isoformat() if date else None, "i": str(object_id)})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Optional[datetime], ObjectId]:
+    """Inverse of `encode_cursor`. Raises ValueError on a malformed token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        date = datetime.fromisoformat(payload["d"]) if payload["d"] else None
+        return date, ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored dates are naive, so drop any offset a client sent after converting to UTC."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _contains(text: str) -> dict:
+    return {"$regex": re.escape(text), "$options": "i"}
+
+
+def build_events_filter(
+    now: datetime,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    venue: Optional[str] = None,
+    title: Optional[str] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    collapse: bool = False,
+) -> dict:
+    """
+    Build the Mongo filter for a page of upcoming events.
+    `q` matches title, description or venue; `title`/`venue` match only that field.
+    `collapse` keeps only canonical events (see dedup.py), one per duplicate group.
+    """
+    date_from, date_to = naive_utc(date_from), naive_utc(date_to)
+    if date_from is not None and date_from > now:
+        date_range = {"$gte": date_from}
+    else:
+        date_range = {"$gt": now}
+    if date_to is not None:
+        date_range["$lte"] = date_to
+
+    clauses: List[dict] = [{"date": date_range}]
+    if venue:
+        clauses.append({"venue": _contains(venue)})
+    if title:
+        clauses.append({"title": _contains(title)})
+    if q:
+        clauses.append({"$or": [{field: _contains(q)} for field in ("title", "description", "venue")]})
+    if collapse:
+        clauses.append({"$or": [
+            {"canonical_id": None},
+            {"$expr": {"$eq": ["$canonical_id", "$source_id"]}},
+        ]})
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        clauses.append({"$or": [
+            {"date": {"$gt": after_date}},
+            {"date": after_date, "_id": {"$gt": after_id}},
+        ]})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def build_projection(fields: Optional[str]) -> dict:
+    """
+    Turn ?fields=title,venue into a Mongo projection.
+    Without `fields` everything but internal bookkeeping is returned;
+    raises ValueError on unknown field names.
+    """
+    if not fields:
+        return dict(HIDDEN_FIELDS)
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - PROJECTABLE_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    projection = {f: 1 for f in requested}
+    projection["date"] = 1
+    return projection
@@ -0,0 +1,209 @@
+"""
+Shared HTTP fetch layer for the scraper.
+
+One `Fetcher` (and its aiohttp session) lives across scrape cycles, so
+connections, keep-alive and DNS lookups are reused. Every request gets
+explicit timeouts. Transient failures (timeouts, connection errors, 429 and
+5xx) are retried with exponential backoff plus jitter; a Retry-After header
+takes precedence when present. A per-host circuit breaker stops hammering a
+host that keeps failing: after FETCH_BREAKER_THRESHOLD consecutive failures
+requests to it fail fast with `CircuitOpen` for FETCH_BREAKER_RESET seconds,
+then a single trial request decides whether it closes again.
+"""
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from log import get_logger
+
+logger = get_logger("fetcher")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of sending a request to a host whose breaker is open."""
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    text: Optional[str]
+    headers: Mapping[str, str]
+    attempts: int = 1
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # True while the single half-open trial request is in flight
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+    def abandon(self):
+        """A request ended without an outcome (e.g. cancelled); let another trial through."""
+        self._trial = False
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class Fetcher:
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        total_timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        breaker_threshold: Optional[int] = None,
+        breaker_reset: Optional[float] = None,
+    ):
+        self.limit = limit if limit is not None else int(os.getenv("FETCH_CONNECTION_LIMIT", 32))
+        self.limit_per_host = limit_per_host if limit_per_host is not None else int(os.getenv("FETCH_CONNECTIONS_PER_HOST", 8))
+        self.total_timeout = total_timeout if total_timeout is not None else float(os.getenv("FETCH_TIMEOUT", 30))
+        self.connect_timeout = connect_timeout if connect_timeout is not None else float(os.getenv("FETCH_CONNECT_TIMEOUT", 10))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("FETCH_MAX_RETRIES", 3))
+        self.backoff = backoff if backoff is not None else float(os.getenv("FETCH_RETRY_BACKOFF", 1.0))
+        self.max_backoff = max_backoff if max_backoff is not None else float(os.getenv("FETCH_MAX_BACKOFF", 30))
+        self.breaker_threshold = breaker_threshold if breaker_threshold is not None else int(os.getenv("FETCH_BREAKER_THRESHOLD", 5))
+        self.breaker_reset = breaker_reset if breaker_reset is not None else float(os.getenv("FETCH_BREAKER_RESET", 60))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=30,
+                ttl_dns_cache=300,
+                use_dns_cache=True,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.total_timeout,
+                connect=self.connect_timeout,
+                sock_read=self.total_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._loop = loop
+        return self._session
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        return breaker
+
+    def _delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        return delay + random.uniform(0, delay / 2)
+
+    async def get(self, url: str, headers: Optional[Mapping[str, str]] = None) -> FetchResult:
+        """
+        GET `url`, retrying transient failures. Returns the last response even
+        if it is still an error status; raises the last exception if every
+        attempt failed without a response, or `CircuitOpen`.
+        """
+        breaker = self.breaker(url)
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                raise CircuitOpen(f"Circuit open for {urlsplit(url).netloc}")
+            retry_after = None
+            try:
+                async with self._get_session().get(url, headers=headers) as response:
+                    text = await response.text() if response.status == 200 else None
+                    result = FetchResult(url, response.status, text, dict(response.headers), attempt + 1)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("Fetch failed, retrying", url=url, attempt=attempt + 1, error=repr(e))
+            except BaseException:
+                # Cancelled (look-ahead past the last page, early stop) or unexpected:
+                # nothing to record, but a half-open trial must not stay taken
+                breaker.abandon()
+                raise
+            else:
+                if result.status not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return result
+                breaker.record_failure()
+                if attempt == self.max_retries:
+                    return result
+                retry_after = retry_after_seconds(result.headers.get("Retry-After"))
+                logger.warning("Fetch got a retryable status", url=url, status=result.status,
+                               attempt=attempt + 1, retry_after=retry_after)
+            self.retries += 1
+            await asyncio.sleep(self._delay(attempt, retry_after))
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "breakers": {host: b.state for host, b in self._breakers.items()},
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,200 @@
+"""
+Persistent on-disk HTTP cache for listing pages.
+
+Per URL we keep the validators (ETag / Last-Modified), a hash of the body, the
+number of event cards it held and the day it was parsed, plus the gzipped body
+itself. The scraper sends conditional requests from this, and skips parsing a
+page whose body is byte-identical to one already parsed today. Entries are
+evicted least-recently-used once the entry or byte budget is exceeded.
+
+The index lives in memory; reading and writing it and the bodies (gzip
+included) run in a thread via asyncio.to_thread, so a crawl never stalls the
+event loop on disk.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from date_parser import sydney_today
+from log import get_logger
+
+logger = get_logger("http_cache")
+
+
+@dataclass
+class CacheEntry:
+    body_hash: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Event cards on the page when it was last parsed, and on which day.
+    # Relative dates ("Tomorrow at 7:00 PM") parse differently day to day,
+    # so an unchanged body only lets us skip parsing on the same day.
+    cards: Optional[int] = None
+    parsed_on: Optional[str] = None
+
+
+def body_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.directory = directory or os.getenv("HTTP_CACHE_DIR", ".http_cache")
+        self.max_entries = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", 1000)) if max_entries is None else max_entries
+        self.max_bytes = int(os.getenv("HTTP_CACHE_MAX_BYTES", 100 * 1024 * 1024)) if max_bytes is None else max_bytes
+        self._entries: Optional["OrderedDict[str, CacheEntry]"] = None
+        # Concurrent crawls share the index; one save at a time
+        self._save_lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html.gz")
+
+    def _read_index(self) -> "OrderedDict[str, CacheEntry]":
+        entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        try:
+            with open(self._index_path, encoding="utf-8") as fp:
+                for url, data in json.load(fp):
+                    entries[url] = CacheEntry(**data)
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError) as e:
+            logger.warning("Ignoring unreadable HTTP cache index", path=self._index_path, error=str(e))
+        return entries
+
+    def _load(self) -> "OrderedDict[str, CacheEntry]":
+        # Blocking fallback; the scraper awaits `load()` before its first lookup
+        if self._entries is None:
+            self._entries = self._read_index()
+        return self._entries
+
+    async def load(self):
+        """Read the index from disk, once."""
+        if self._entries is None and self.enabled:
+            entries = await asyncio.to_thread(self._read_index)
+            if self._entries is None:
+                self._entries = entries
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        if not self.enabled:
+            return None
+        entries = self._load()
+        entry = entries.get(url)
+        if entry is not None:
+            entries.move_to_end(url)
+        return entry
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def _read_body(self, url: str) -> Optional[str]:
+        try:
+            with gzip.open(self._body_path(url), "rt", encoding="utf-8") as fp:
+                return fp.read()
+        except OSError:
+            return None
+
+    async def read_body(self, url: str) -> Optional[str]:
+        return await asyncio.to_thread(self._read_body, url)
+
+    def is_parsed_today(self, url: str, digest: str) -> bool:
+        """True when this exact body was already parsed today."""
+        entry = self.get(url)
+        return (
+            entry is not None
+            and entry.body_hash == digest
+            and entry.cards is not None
+            and entry.parsed_on == sydney_today().isoformat()
+        )
+
+    def _write_body(self, url: str, body: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with gzip.open(self._body_path(url), "wt", encoding="utf-8", compresslevel=5) as fp:
+            fp.write(body)
+
+    async def store(
+        self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]
+    ) -> Optional[CacheEntry]:
+        """Record a freshly downloaded body; parse results are added by `mark_parsed`."""
+        if not self.enabled:
+            return None
+        await self.load()
+        entries = self._load()
+        digest = body_hash(body)
+        previous = entries.get(url)
+        entry = CacheEntry(body_hash=digest, size=len(body), etag=etag, last_modified=last_modified)
+        if previous is not None and previous.body_hash == digest:
+            entry.cards, entry.parsed_on = previous.cards, previous.parsed_on
+        else:
+            await asyncio.to_thread(self._write_body, url, body)
+        entries[url] = entry
+        entries.move_to_end(url)
+        evicted = self._evict()
+        if evicted:
+            await asyncio.to_thread(self._remove_bodies, evicted)
+        return entry
+
+    def mark_parsed(self, url: str, cards: int):
+        entry = self.get(url)
+        if entry is not None:
+            entry.cards = cards
+            entry.parsed_on = sydney_today().isoformat()
+
+    def _evict(self) -> List[str]:
+        """Drop entries over budget from the index; returns their URLs."""
+        entries = self._load()
+        total = sum(e.size for e in entries.values())
+        evicted = []
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            url, entry = entries.popitem(last=False)
+            total -= entry.size
+            evicted.append(url)
+        return evicted
+
+    def _remove_bodies(self, urls: List[str]):
+        for url in urls:
+            try:
+                os.remove(self._body_path(url))
+            except OSError:
+                pass
+
+    def _write_index(self, rows: list):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(rows, fp)
+        os.replace(tmp_path, self._index_path)
+
+    async def save(self):
+        """Persist the index; written atomically so a crash never leaves it half-written."""
+        if self._entries is None:
+            return
+        # Snapshot on the loop; other crawls keep changing the index meanwhile
+        rows = [[url, asdict(e)] for url, e in self._entries.items()]
+        async with self._save_lock:
+            await asyncio.to_thread(self._write_index, rows)
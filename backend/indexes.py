@@ -0,0 +1,264 @@
+"""
+Declarative index registry.
+
+Every index the app relies on is declared once in INDEXES, keyed by
+collection. `reconcile_indexes` creates missing ones at startup and reports
+drift: declared indexes whose options differ from the live ones, and live
+indexes nobody declared. Nothing is dropped unless INDEX_DROP_DRIFT=true.
+
+`check_query_plans` runs explain() on the hot queries in HOT_QUERIES and
+reports any that fall back to a COLLSCAN. Run it against a real database with
+
+    python indexes.py --check
+
+which exits non-zero on a collection scan. tests/test_query_plans.py runs
+the same check under pytest, so CI with a MongoDB fails on one.
+"""
+import asyncio
+import os
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from enrichment import enrich_ttl
+from jobqueue import PENDING, job_retention
+from event_query import EVENT_SORT, build_events_filter, encode_cursor
+
+Key = Tuple[Tuple[str, int], ...]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    keys: Key
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+    # partialFilterExpression: index only the documents matching it
+    partial_filter: Optional[dict] = None
+    note: str = ""
+
+    @property
+    def name(self) -> str:
+        # Mongo's default index name, e.g. "email_1_created_at_-1"
+        return "_".join(f"{k}_{d}" for k, d in self.keys)
+
+    def options(self) -> dict:
+        options = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = self.partial_filter
+        return options
+
+
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "events": [
+        # Upcoming-events listing and keyset pages (EVENT_SORT), cleanup of past events
+        IndexSpec((("date", 1), ("_id", 1)), note="listing, keyset pagination, cleanup"),
+        # Ingest looks stored hashes up by source_id (main) or (source_url, source_id) (database.py).
+        # Not unique: rows written before ingest deduplicated may still collide.
+        IndexSpec((("source_id", 1), ("source_url", 1)), note="ingest, re-indexing changed events"),
+        IndexSpec((("source_url", 1),), note="delta seen-set for the sources being crawled"),
+        # Multikey: one entry per LSH band key, see dedup.py
+        IndexSpec((("dedup_keys", 1),), note="near-duplicate candidate lookup"),
+    ],
+    "email_submissions": [
+        # /submit-email and Database.save_email_submission subscribe once per email
+        # and rely on this for race safety
+        IndexSpec((("email", 1),), unique=True, note="one subscription per email"),
+    ],
+    "otps": [
+        IndexSpec((("created_at", 1),), expire_after_seconds=300, note="OTPs expire after 5 minutes"),
+        # One document per email; concurrent /send-otp upserts cannot both insert
+        IndexSpec((("email", 1),), unique=True, note="one OTP document per email"),
+    ],
+    "verified_emails": [
+        IndexSpec((("email", 1),), unique=True, note="one verification per email"),
+    ],
+    "jobs": [
+        # Workers claim the longest-due queued (or abandoned running) job
+        IndexSpec((("status", 1), ("available_at", 1)), note="claiming due jobs, reaping"),
+        # Unique among queued/running jobs only, so finished ones keep their key.
+        # $in in a partial filter needs MongoDB 6.0+.
+        IndexSpec((("key", 1),), unique=True, partial_filter={"status": {"$in": PENDING}},
+                  note="one pending job per key"),
+        IndexSpec((("finished_at", 1),), expire_after_seconds=job_retention(),
+                  note="finished jobs expire after JOB_RETENTION"),
+    ],
+    "event_details": [
+        IndexSpec((("fetched_at", 1),), expire_after_seconds=enrich_ttl(),
+                  note="cached detail pages expire after ENRICH_TTL"),
+    ],
+}
+
+
+@dataclass
+class IndexReport:
+    created: List[str] = field(default_factory=list)
+    # Same keys as a declared index but different options (unique, TTL, partial filter)
+    mismatched: List[str] = field(default_factory=list)
+    # Live indexes that nothing declares
+    undeclared: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    # Declared indexes the server refused to create, with its error
+    failed: List[str] = field(default_factory=list)
+
+    @property
+    def drift(self) -> bool:
+        return bool(self.mismatched or self.undeclared)
+
+    def as_dict(self) -> dict:
+        return {"created": self.created, "mismatched": self.mismatched,
+                "undeclared": self.undeclared, "dropped": self.dropped, "failed": self.failed}
+
+
+def _normalize_keys(key) -> Key:
+    # index_information() may report directions as floats; text/hashed stay strings
+    return tuple((k, int(d) if isinstance(d, (int, float)) else d) for k, d in key)
+
+
+def _live_matches(spec: IndexSpec, info: dict) -> bool:
+    return (bool(info.get("unique", False)) == spec.unique
+            and info.get("expireAfterSeconds") == spec.expire_after_seconds
+            and info.get("partialFilterExpression") == spec.partial_filter)
+
+
+async def reconcile_indexes(db, registry: Dict[str, List[IndexSpec]] = None,
+                            drop_drift: Optional[bool] = None) -> IndexReport:
+    """Create missing declared indexes and report (optionally drop) drift."""
+    registry = registry or INDEXES
+    if drop_drift is None:
+        drop_drift = os.getenv("INDEX_DROP_DRIFT", "false").lower() == "true"
+    report = IndexReport()
+
+    for collection_name, specs in registry.items():
+        collection = db[collection_name]
+        live = await collection.index_information()
+        live_by_keys = {_normalize_keys(info["key"]): (name, info) for name, info in live.items()}
+        declared = {spec.keys for spec in specs}
+
+        for spec in specs:
+            existing = live_by_keys.get(spec.keys)
+            if existing and _live_matches(spec, existing[1]):
+                continue
+            label = f"{collection_name}.{spec.name}"
+            if existing and not drop_drift:
+                report.mismatched.append(f"{collection_name}.{existing[0]}")
+                continue
+            # One refused index (e.g. a partial filter the server version lacks)
+            # must not keep the rest from being reconciled
+            try:
+                if existing:
+                    await collection.drop_index(existing[0])
+                    report.dropped.append(f"{collection_name}.{existing[0]}")
+                await collection.create_index(list(spec.keys), **spec.options())
+                report.created.append(label)
+            except PyMongoError as e:
+                report.failed.append(f"{label}: {e}")
+
+        for keys, (name, _) in live_by_keys.items():
+            if name == "_id_" or keys in declared:
+                continue
+            label = f"{collection_name}.{name}"
+            if drop_drift:
+                await collection.drop_index(name)
+                report.dropped.append(label)
+            else:
+                report.undeclared.append(label)
+
+    return report
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    name: str
+    collection: str
+    # Built at check time so date filters are relative to now
+    filter: Callable[[], dict]
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+def _now() -> datetime:
+    return datetime.utcnow()
+
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery("events: upcoming listing", "events",
+             lambda: build_events_filter(_now()), EVENT_SORT),
+    HotQuery("events: keyset page", "events",
+             lambda: build_events_filter(_now(), cursor=encode_cursor(_now() + timedelta(days=1), "0" * 24)),
+             EVENT_SORT),
+    HotQuery("events: date window", "events",
+             lambda: build_events_filter(_now(), date_to=_now() + timedelta(days=7)), EVENT_SORT),
+    HotQuery("events: past-event cleanup", "events", lambda: {"date": {"$lt": _now()}}),
+    HotQuery("events: ingest by source_id", "events", lambda: {"source_id": {"$in": ["a", "b"]}}),
+    HotQuery("events: ingest by (source_url, source_id)", "events",
+             lambda: {"$or": [{"source_url": "u", "source_id": "a"}, {"source_url": "u", "source_id": "b"}]}),
+    HotQuery("events: delta seen-set by source", "events",
+             lambda: {"source_url": {"$in": ["https://www.eventbrite.com/d/australia--sydney/all-events/"]}}),
+    HotQuery("events: near-duplicate candidates", "events",
+             lambda: {"dedup_keys": {"$in": ["2024-01-01:0:000000000000", "2024-01-01:1:000000000000"]}}),
+    HotQuery("jobs: claim next due job", "jobs",
+             lambda: {"status": {"$in": PENDING}, "available_at": {"$lte": _now()},
+                      "attempts": {"$lt": 3}, "kind": {"$in": ["scrape_source"]}},
+             [("available_at", 1)]),
+    HotQuery("jobs: pending job for key", "jobs",
+             lambda: {"key": "scrape_source:eventbrite-sydney", "status": {"$in": PENDING}}),
+    HotQuery("otps: by email", "otps", lambda: {"email": "someone@example.com"}),
+    HotQuery("verified_emails: by email", "verified_emails", lambda: {"email": "someone@example.com"}),
+    HotQuery("email_submissions: by email", "email_submissions", lambda: {"email": "someone@example.com"}),
+]
+
+
+def _plan_stages(plan: dict):
+    """Yield every stage name in an explain() plan tree (classic and SBE shapes)."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan", "winningPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def check_query_plans(db, queries: List[HotQuery] = None) -> List[str]:
+    """Return a description of every hot query whose winning plan is a COLLSCAN."""
+    failures = []
+    for query in queries or HOT_QUERIES:
+        cursor = db[query.collection].find(query.filter())
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+        explained = await cursor.explain()
+        stages = list(_plan_stages(explained.get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages:
+            failures.append(f"{query.name}: COLLSCAN ({' <- '.join(stages)})")
+    return failures
+
+
+async def _main(argv: List[str]) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    db = client.sydney_events
+    report = await reconcile_indexes(db)
+    print(f"Indexes: {report.as_dict()}")
+    status = 1 if report.drift or report.failed else 0
+    if "--check" in argv:
+        failures = await check_query_plans(db)
+        for failure in failures:
+            print(f"FAIL {failure}")
+        print(f"{len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries use an index")
+        status = status or (1 if failures else 0)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
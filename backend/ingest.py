@@ -0,0 +1,171 @@
+"""
+Bulk, change-aware event upserts.
+
+Each stored event carries a `content_hash` of its fields. Incoming events whose
+hash matches the stored one are skipped, the rest are written with batched
+`bulk_write` calls instead of one `update_one` round-trip per event. Fields an
+event arrives without (detail fields not fetched this cycle, say) can be kept
+from the stored document instead of being overwritten with empty values.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models import Event
+from metrics import UPSERT_BATCH_SECONDS
+from log import get_logger
+
+logger = get_logger("ingest")
+
+# Fields that are bookkeeping rather than event content
+_UNHASHED_FIELDS = {"id", "_id", "content_hash"}
+# Fields that come from detail pages (enrichment.py) rather than the listing card
+ENRICHED_FIELDS = {"description", "end_date", "price"}
+# Fields derived by dedup.py from this and other events
+DERIVED_FIELDS = {"canonical_id", "dedup_keys"}
+LISTING_FIELDS = tuple(
+    f for f in Event.model_fields if f != "id" and f not in ENRICHED_FIELDS and f not in DERIVED_FIELDS
+)
+
+
+def event_content_hash(event_data: dict) -> str:
+    """Stable hash over an event's content fields."""
+    payload = {k: v for k, v in event_data.items() if k not in _UNHASHED_FIELDS}
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def listing_hash(event_data: dict) -> str:
+    """Hash over just the listing-card fields; changes when the card changes."""
+    return event_content_hash({k: event_data.get(k) for k in LISTING_FIELDS})
+
+
+@dataclass
+class IngestResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    # source_ids of events that were inserted or changed
+    changed_ids: List[str] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged + self.failed
+
+    def add(self, other: "IngestResult"):
+        """Add another batch's counts to this one (changed_ids are per batch)."""
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.failed += other.failed
+
+    def as_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+        }
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _existing_filter(key_fields: Tuple[str, ...], keys: List[tuple]) -> dict:
+    if len(key_fields) == 1:
+        return {key_fields[0]: {"$in": [k[0] for k in keys]}}
+    return {"$or": [dict(zip(key_fields, k)) for k in keys]}
+
+
+async def bulk_upsert_events(
+    collection,
+    events: List[Event],
+    key_fields: Tuple[str, ...] = ("source_id",),
+    batch_size: Optional[int] = None,
+    ordered: Optional[bool] = None,
+    exclude_none: bool = False,
+    fill_from_stored: Iterable[str] = (),
+) -> IngestResult:
+    """
+    Upsert `events` into `collection`, keyed on `key_fields`.
+
+    `batch_size` (INGEST_BATCH_SIZE, default 500) bounds each `bulk_write`;
+    `ordered` (INGEST_ORDERED, default false) is passed straight through to it.
+    Events whose content hash matches the stored document are not written.
+    Fields in `fill_from_stored` that an incoming event leaves empty (None or
+    "") take the stored document's value before hashing.
+    """
+    if batch_size is None:
+        batch_size = int(os.getenv("INGEST_BATCH_SIZE", 500))
+    if ordered is None:
+        ordered = os.getenv("INGEST_ORDERED", "false").lower() == "true"
+    fill_from_stored = tuple(fill_from_stored)
+
+    # Last occurrence wins, as it did with sequential update_one calls
+    latest: Dict[tuple, dict] = {}
+    for event in events:
+        event_data = event.model_dump(exclude={"id"}, exclude_none=exclude_none)
+        latest[tuple(event_data.get(k) for k in key_fields)] = event_data
+
+    result = IngestResult()
+    for batch_keys in _chunks(list(latest), max(1, batch_size)):
+        # Hash prefetch plus bulk_write: the latency of one batch
+        with UPSERT_BATCH_SECONDS.time(collection=collection.name):
+            stored: Dict[tuple, dict] = {}
+            projection = {k: 1 for k in key_fields}
+            projection.update({"_id": 0, "content_hash": 1}, **{f: 1 for f in fill_from_stored})
+            async for doc in collection.find(_existing_filter(key_fields, batch_keys), projection):
+                stored[tuple(doc.get(k) for k in key_fields)] = doc
+
+            operations = []
+            changed_ids = []
+            for key in batch_keys:
+                event_data = latest[key]
+                doc = stored.get(key, {})
+                for f in fill_from_stored:
+                    if event_data.get(f) in (None, "") and doc.get(f) not in (None, ""):
+                        event_data[f] = doc[f]
+                content_hash = event_content_hash(event_data)
+                if doc.get("content_hash") == content_hash:
+                    result.unchanged += 1
+                    continue
+                event_data["content_hash"] = content_hash
+                operations.append(UpdateOne(
+                    dict(zip(key_fields, key)),
+                    {"$set": event_data},
+                    upsert=True
+                ))
+                changed_ids.append(event_data.get("source_id"))
+
+            if not operations:
+                continue
+            try:
+                write = await collection.bulk_write(operations, ordered=ordered)
+                result.inserted += write.upserted_count
+                result.updated += write.matched_count
+                result.changed_ids.extend(changed_ids)
+            except BulkWriteError as e:
+                details = e.details
+                write_errors = details.get("writeErrors", [])
+                result.inserted += details.get("nUpserted", 0)
+                result.updated += details.get("nMatched", 0)
+                if ordered and write_errors:
+                    # Operations after the first failure were never attempted
+                    failed_indexes = set(range(write_errors[0]["index"], len(operations)))
+                else:
+                    failed_indexes = {err["index"] for err in write_errors}
+                result.failed += len(failed_indexes)
+                result.changed_ids.extend(
+                    sid for i, sid in enumerate(changed_ids) if i not in failed_indexes
+                )
+                logger.error("bulk_write reported errors", errors=len(write_errors),
+                             first=write_errors[0]["errmsg"] if write_errors else None)
+    return result
@@ -0,0 +1,160 @@
+"""
+Mongo-backed work queue for scrape jobs.
+
+Jobs live in the `jobs` collection. Workers claim a due job with one atomic
+find_one_and_update, which marks it "running" and hides it from other
+workers for JOB_VISIBILITY_TIMEOUT seconds. A worker extends that while it
+works (`heartbeat`); if the worker dies, the job becomes claimable again
+once the timeout passes. A failed attempt is retried after
+JOB_RETRY_BACKOFF * 2^(attempt - 1) seconds, up to JOB_MAX_ATTEMPTS attempts,
+after which the job is "failed". A TTL index removes finished jobs
+JOB_RETENTION seconds after they finish.
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from log import get_logger
+
+logger = get_logger("jobqueue")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# Statuses of a job that is not finished; at most one per key
+PENDING = [QUEUED, RUNNING]
+
+
+def job_retention() -> int:
+    return int(os.getenv("JOB_RETENTION", 7 * 24 * 3600))
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for failures that retrying cannot fix."""
+
+
+@dataclass
+class Job:
+    id: ObjectId
+    kind: str
+    payload: dict
+    attempts: int
+    key: Optional[str] = None
+
+
+class JobQueue:
+    def __init__(
+        self,
+        collection,
+        visibility_timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+    ):
+        self.collection = collection
+        self.visibility_timeout = visibility_timeout if visibility_timeout is not None else float(os.getenv("JOB_VISIBILITY_TIMEOUT", 300))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(os.getenv("JOB_RETRY_BACKOFF", 60))
+
+    async def enqueue(self, kind: str, payload: dict, key: Optional[str] = None) -> Optional[ObjectId]:
+        """
+        Add a job. With `key`, nothing is added while a job with the same key is
+        still queued or running, and None is returned. A unique partial index
+        on `key` (see indexes.py) settles concurrent enqueues.
+        """
+        now = datetime.utcnow()
+        doc = {"kind": kind, "payload": payload, "status": QUEUED, "attempts": 0,
+               "available_at": now, "created_at": now}
+        if key is None:
+            return (await self.collection.insert_one(doc)).inserted_id
+        try:
+            result = await self.collection.update_one(
+                {"key": key, "status": {"$in": PENDING}},
+                {"$setOnInsert": doc},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Another enqueue inserted the pending job between our match and insert
+            return None
+        return result.upserted_id
+
+    async def claim(self, worker: str, kinds: Optional[List[str]] = None) -> Optional[Job]:
+        """Atomically take the longest-due job, or None when nothing is due."""
+        now = datetime.utcnow()
+        query = {
+            # Running jobs past their visibility timeout were abandoned
+            "status": {"$in": PENDING},
+            "available_at": {"$lte": now},
+            "attempts": {"$lt": self.max_attempts},
+        }
+        if kinds:
+            query["kind"] = {"$in": kinds}
+        doc = await self.collection.find_one_and_update(
+            query,
+            {
+                "$set": {"status": RUNNING, "worker": worker, "claimed_at": now,
+                         "available_at": now + timedelta(seconds=self.visibility_timeout)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            return None
+        return Job(doc["_id"], doc["kind"], doc.get("payload") or {}, doc["attempts"], doc.get("key"))
+
+    def _owned(self, job: Job, worker: str) -> dict:
+        return {"_id": job.id, "worker": worker, "status": RUNNING}
+
+    async def heartbeat(self, job: Job, worker: str) -> bool:
+        """Push the job's visibility timeout out again; False if another worker has taken it over."""
+        result = await self.collection.update_one(
+            self._owned(job, worker),
+            {"$set": {"available_at": datetime.utcnow() + timedelta(seconds=self.visibility_timeout)}},
+        )
+        return result.matched_count == 1
+
+    async def complete(self, job: Job, worker: str, result: Optional[dict] = None):
+        await self.collection.update_one(
+            self._owned(job, worker),
+            {"$set": {"status": DONE, "result": result, "finished_at": datetime.utcnow()}},
+        )
+
+    async def fail(self, job: Job, worker: str, error: str, retry: bool = True):
+        """Record a failed attempt and schedule a retry, or fail the job for good."""
+        now = datetime.utcnow()
+        if retry and job.attempts < self.max_attempts:
+            delay = self.retry_backoff * 2 ** (job.attempts - 1)
+            update = {"status": QUEUED, "error": error, "available_at": now + timedelta(seconds=delay)}
+        else:
+            update = {"status": FAILED, "error": error, "finished_at": now}
+        await self.collection.update_one(self._owned(job, worker), {"$set": update})
+
+    async def release(self, job: Job, worker: str):
+        """Hand a job back untouched (e.g. on shutdown); the attempt does not count."""
+        await self.collection.update_one(
+            self._owned(job, worker),
+            {"$set": {"status": QUEUED, "available_at": datetime.utcnow()}, "$inc": {"attempts": -1}},
+        )
+
+    async def reap(self) -> int:
+        """Fail abandoned jobs that have used up their attempts; returns how many."""
+        now = datetime.utcnow()
+        result = await self.collection.update_many(
+            {"status": RUNNING, "available_at": {"$lte": now}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": FAILED, "error": "visibility timeout", "finished_at": now}},
+        )
+        if result.modified_count:
+            logger.warning("Failed abandoned jobs", count=result.modified_count)
+        return result.modified_count
+
+    async def stats(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
@@ -0,0 +1,150 @@
+"""
+Cluster-wide leases backed by a Mongo collection, and in-process single-flight.
+
+Every uvicorn worker or replica runs its own periodic loop; a lease lets only
+one of them run a given job at a time. A lease document is
+{_id: name, holder, expires_at, last_completed_at}. A holder keeps it alive with
+heartbeats every ttl/3 seconds; a crashed holder's lease simply expires, after
+which any process may take it over. If a heartbeat finds the lease taken
+over, or no renewal has succeeded for a whole ttl, the work done under `hold()`
+is cancelled and LeaseLost raised in its place.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from log import get_logger
+
+logger = get_logger("lease")
+
+
+class LeaseLost(Exception):
+    """Raised out of `MongoLease.hold()` when the lease was lost while held."""
+
+
+def default_holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class MongoLease:
+    def __init__(self, collection, name: str, ttl: Optional[float] = None, holder: Optional[str] = None):
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl if ttl is not None else float(os.getenv("LEASE_TTL", 120))
+        self.holder = holder or default_holder_id()
+        # Set when a heartbeat finds the lease taken over (e.g. after a long GC
+        # pause) or cannot renew it within ttl
+        self.lost = False
+
+    async def acquire(self) -> bool:
+        """Take the lease if it is free, expired, or already ours."""
+        now = datetime.utcnow()
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"expires_at": {"$lte": now}}, {"holder": self.holder}]},
+                {"$set": {"holder": self.holder, "acquired_at": now,
+                          "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # The document exists and another holder's lease has not expired
+            return False
+        self.lost = False
+        return doc is not None and doc.get("holder") == self.holder
+
+    async def renew(self) -> bool:
+        result = await self.collection.update_one(
+            {"_id": self.name, "holder": self.holder},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)}},
+        )
+        return result.matched_count == 1
+
+    async def release(self):
+        # Expire rather than delete, so last_completed_at survives
+        await self.collection.update_one(
+            {"_id": self.name, "holder": self.holder},
+            {"$set": {"expires_at": datetime.utcnow()}},
+        )
+
+    async def mark_completed(self):
+        await self.collection.update_one(
+            {"_id": self.name, "holder": self.holder},
+            {"$set": {"last_completed_at": datetime.utcnow()}},
+        )
+
+    async def last_completed_at(self) -> Optional[datetime]:
+        doc = await self.collection.find_one({"_id": self.name}, {"last_completed_at": 1})
+        return doc.get("last_completed_at") if doc else None
+
+    async def _heartbeat(self, holder_task: asyncio.Task):
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                if await self.renew():
+                    renewed_at = time.monotonic()
+                    continue
+                logger.warning("Lease lost", lease=self.name, holder=self.holder)
+            except Exception as e:
+                logger.warning("Lease heartbeat failed", lease=self.name, error=str(e))
+                # Unrenewed for a whole ttl, the lease may already be someone else's
+                if time.monotonic() - renewed_at < self.ttl:
+                    continue
+                logger.warning("Lease expired unrenewed", lease=self.name, holder=self.holder)
+            self.lost = True
+            holder_task.cancel()
+            return
+
+    @asynccontextmanager
+    async def hold(self):
+        """
+        Yield whether the lease was acquired; heartbeat and release it if so.
+        Losing the lease cancels the body, which then raises LeaseLost.
+        """
+        if not await self.acquire():
+            yield False
+            return
+        task = asyncio.current_task()
+        heartbeat = asyncio.create_task(self._heartbeat(task))
+        try:
+            yield True
+        except asyncio.CancelledError:
+            if not self.lost:
+                raise
+            task.uncancel()
+            raise LeaseLost(f"Lease {self.name!r} lost while held by {self.holder}") from None
+        finally:
+            heartbeat.cancel()
+            try:
+                if not self.lost:
+                    await self.release()
+            except Exception as e:
+                logger.warning("Lease release failed", lease=self.name, error=str(e))
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key onto one running task.
+    Callers that arrive while it runs await the same result; the task is
+    shielded so a disconnected caller does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
@@ -0,0 +1,93 @@
+"""
+Structured, level-gated logging.
+
+    logger = get_logger(__name__)
+    logger.info("Ingest finished", inserted=3, updated=1)
+
+LOG_LEVEL (default INFO) gates output. Calls below it return before their
+message or fields are formatted, so per-card debug lines cost one level check.
+LOG_FORMAT=json (default) writes one JSON object per line; LOG_FORMAT=text
+writes "[timestamp] LEVEL logger: message key=value ...".
+"""
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Any
+
+_configured = False
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+        line = (f"[{datetime.utcfromtimestamp(record.created).isoformat()}] "
+                f"{record.levelname} {record.name}: {record.getMessage()}")
+        if fields:
+            line += " " + fields
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure():
+    """Install the handler on the root "app" logger; safe to call repeatedly."""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    text = os.getenv("LOG_FORMAT", "json").lower() == "text"
+    handler.setFormatter(_TextFormatter() if text else _JsonFormatter())
+    root = logging.getLogger("app")
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+    _configured = True
+
+
+class StructuredLogger:
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"app.{name}")
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level: int, msg: str, exc_info: bool, fields: Any):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, msg, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+    def debug(self, msg: str, **fields):
+        self._log(logging.DEBUG, msg, False, fields)
+
+    def info(self, msg: str, **fields):
+        self._log(logging.INFO, msg, False, fields)
+
+    def warning(self, msg: str, **fields):
+        self._log(logging.WARNING, msg, False, fields)
+
+    def error(self, msg: str, **fields):
+        self._log(logging.ERROR, msg, False, fields)
+
+    def exception(self, msg: str, **fields):
+        """Log at ERROR with the current exception's traceback."""
+        self._log(logging.ERROR, msg, True, fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    configure()
+    return StructuredLogger(name)
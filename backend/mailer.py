@@ -0,0 +1,196 @@
+"""
+Asynchronous outbound mail queue.
+
+`/send-otp` only enqueues a message; a small pool of workers delivers it. Each
+worker keeps its own SMTP connection open between messages (reconnecting when
+it goes idle or breaks) and runs the blocking smtplib calls in a thread, so the
+event loop never waits on the mail server. Failed sends are retried with
+exponential backoff when they may succeed later (a dropped connection, a
+network error, a 4xx reply); a refused recipient, a failed login or any other
+5xx reply fails the message at once.
+
+For local testing point SMTP_HOST/SMTP_PORT at a stand-in such as
+`python -m aiosmtpd -n -l localhost:8025` with SMTP_STARTTLS=false and no
+SMTP_EMAIL/SMTP_PASSWORD (login is skipped without credentials).
+"""
+import asyncio
+import os
+import random
+import smtplib
+import time
+from dataclasses import dataclass, field
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import List, Optional
+
+from metrics import SMTP_SEND_SECONDS, LatencyWindow
+from log import get_logger
+
+logger = get_logger("mailer")
+
+
+@dataclass
+class OutgoingMail:
+    to: str
+    subject: str
+    body: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether retrying the send could succeed."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPAuthenticationError)):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # Any other SMTPException is a protocol/capability problem; OSError is the network
+    return isinstance(error, OSError)
+
+
+class _SmtpConnection:
+    """One persistent SMTP session; only ever used from one worker at a time."""
+
+    def __init__(self, queue: "MailQueue"):
+        self.queue = queue
+        self.server: Optional[smtplib.SMTP] = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        q = self.queue
+        server = smtplib.SMTP(q.host, q.port, timeout=q.timeout)
+        try:
+            if q.starttls:
+                server.starttls()
+            if q.username and q.password:
+                server.login(q.username, q.password)
+        except BaseException:
+            # Don't leak the socket of a session that never became usable
+            server.close()
+            raise
+        self.server = server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+    def send(self, sender: str, mail: OutgoingMail):
+        """Blocking; called through asyncio.to_thread."""
+        if self.server is not None and time.monotonic() - self.last_used > self.queue.idle_timeout:
+            # Servers drop idle sessions; start fresh rather than fail the first send
+            self.close()
+        if self.server is None:
+            self._connect()
+
+        msg = MIMEMultipart()
+        msg["From"] = sender
+        msg["To"] = mail.to
+        msg["Subject"] = mail.subject
+        msg.attach(MIMEText(mail.body, "plain"))
+        try:
+            self.server.sendmail(sender, mail.to, msg.as_string())
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self.server = None
+            raise
+        self.last_used = time.monotonic()
+
+
+class MailQueue:
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        workers: Optional[int] = None,
+    ):
+        self.host = host or os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.port = port or int(os.getenv("SMTP_PORT", "587"))
+        self.username = username if username is not None else os.getenv("SMTP_EMAIL")
+        self.password = password if password is not None else os.getenv("SMTP_PASSWORD")
+        self.sender = self.username or os.getenv("SMTP_FROM", "no-reply@localhost")
+        self.starttls = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+        self.workers = workers or int(os.getenv("SMTP_WORKERS", 2))
+        self.max_retries = int(os.getenv("SMTP_MAX_RETRIES", 3))
+        self.retry_backoff = float(os.getenv("SMTP_RETRY_BACKOFF", 1.0))
+        self.idle_timeout = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))
+        self.timeout = float(os.getenv("SMTP_TIMEOUT", 30))
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=int(os.getenv("SMTP_QUEUE_SIZE", 1000)))
+        self._tasks: List[asyncio.Task] = []
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        # Time spent on the SMTP exchange, and from enqueue to delivery
+        self.send_latency = LatencyWindow()
+        self.delivery_latency = LatencyWindow()
+
+    def enqueue(self, to: str, subject: str, body: str):
+        """Queue a message for delivery. Raises asyncio.QueueFull when the backlog is full."""
+        self._queue.put_nowait(OutgoingMail(to, subject, body))
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Give queued mail a chance to go out, then stop the workers."""
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Mail queue stopped with unsent messages", unsent=self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        connection = _SmtpConnection(self)
+        try:
+            while True:
+                mail = await self._queue.get()
+                try:
+                    await self._deliver(connection, mail)
+                finally:
+                    self._queue.task_done()
+        finally:
+            await asyncio.to_thread(connection.close)
+
+    async def _deliver(self, connection: _SmtpConnection, mail: OutgoingMail):
+        first_attempt = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(connection.send, self.sender, mail)
+            except (smtplib.SMTPException, OSError) as e:
+                if attempt == self.max_retries or not _is_transient(e):
+                    self.failed += 1
+                    SMTP_SEND_SECONDS.observe(time.perf_counter() - first_attempt, outcome="failed")
+                    logger.error("Failed to send mail", to=mail.to, attempts=attempt + 1, error=str(e))
+                    return
+                self.retries += 1
+                delay = self.retry_backoff * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+                continue
+            self.send_latency.observe(time.perf_counter() - start)
+            self.delivery_latency.observe(time.monotonic() - mail.enqueued_at)
+            self.sent += 1
+            SMTP_SEND_SECONDS.observe(time.perf_counter() - first_attempt, outcome="sent")
+            logger.info("Mail sent", subject=mail.subject, to=mail.to)
+            return
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "workers": len(self._tasks),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "send_latency": self.send_latency.summary(),
+            "delivery_latency": self.delivery_latency.summary(),
+        }
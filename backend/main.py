@@ -2,25 +2,52 @@ import os
 import asyncio
 import random
 import string
+import time
 
 from datetime import datetime, timedelta
 from fastapi.staticfiles import StaticFiles
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from dotenv import load_dotenv
-from scraper import EventScraper
-from models import Event as EventModel  # Pydantic model from models.py
+from scraper import default_archive, default_fetcher, default_parse_pool, default_scheduler
+from metrics import (
+    EVENTS_CLEANED,
+    HTTP_REQUEST_SECONDS,
+    OTPS_SENT,
+    OTPS_VERIFIED,
+    REGISTRY,
+    LatencyWindow,
+)
+from log import get_logger
+from snapshot import EventsSnapshot
+from mailer import MailQueue
+from enrichment import DetailEnricher
+from dedup import Deduplicator
+from pipeline import ScrapePipeline, bump_events_version, events_version
+from jobqueue import JobQueue
+from sources import get_sources
+from lease import MongoLease, SingleFlight
+from indexes import reconcile_indexes
+from ratelimit import KeyedRateLimiter
+from ttl_cache import TTLCache
+from streaming import stream_cursor
+from search_index import SearchIndex
+from ingest import IngestResult
+from models import normalize_email
+from event_query import (
+    EVENT_SORT, HIDDEN_FIELDS, build_events_filter, build_projection, encode_cursor, naive_utc
+)
 
 load_dotenv()
+logger = get_logger("main")
 
 app = FastAPI(title="Louder")
 
@@ -34,8 +61,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Request latency, overall and restricted to requests served while a scrape is running
+request_latency = LatencyWindow()
+request_latency_during_scrape = LatencyWindow()
+scrapes_in_progress = 0
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    scraping = scrapes_in_progress > 0
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        request_latency.observe(elapsed)
+        if scraping:
+            request_latency_during_scrape.observe(elapsed)
+        # Route templates (not raw paths) keep label cardinality bounded;
+        # streamed responses are timed to their first byte
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=status)
+
+
 # Initialize MongoDB client
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 client = AsyncIOMotorClient(MONGODB_URL)
@@ -46,36 +101,72 @@ email_submissions_collection = db.email_submissions
 # We also need two new collections:
 otps_collection = db.otps
 verified_emails_collection = db.verified_emails
-
-SMTP_EMAIL = os.getenv("SMTP_EMAIL")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
-SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+# Per-source crawl bookkeeping for incremental scrapes
+scrape_state_collection = db.scrape_state
+# Only one process across all workers/replicas scrapes (or enqueues) at a time
+scrape_lease = MongoLease(db.leases, "scrape-cycle")
+scrape_flight = SingleFlight()
+# Scrape -> enrich (detail pages, cached in event_details) -> dedup (canonical_id) -> upsert
+scrape_pipeline = ScrapePipeline(
+    events_collection, scrape_state_collection,
+    DetailEnricher(db.event_details, default_fetcher, default_parse_pool, default_scheduler),
+    Deduplicator(events_collection),
+)
+# "inline" scrapes in this process; "queue" only enqueues jobs for worker.py
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "inline").lower()
+job_queue = JobQueue(db.jobs)
+# Seconds between checks for events written by workers or other API processes
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", 10))
+# Events version bumps made by this process since watch_events_writes last
+# looked; it has already refreshed for those itself
+own_version_bumps = 0
+
+# Minimum seconds between /events snapshot rebuilds while a crawl streams in
+SNAPSHOT_STREAM_INTERVAL = float(os.getenv("SNAPSHOT_STREAM_INTERVAL", 5))
+
+MAX_EVENTS_PAGE_SIZE = int(os.getenv("MAX_EVENTS_PAGE_SIZE", 200))
+
+# Serialized, pre-compressed GET /events body; refreshed after every write
+events_snapshot = EventsSnapshot(cursor_for=lambda event: encode_cursor(event.get("date"), event["id"]))
+
+# Ranked full-text search over upcoming events; updated incrementally after each ingest
+search_index = SearchIndex()
+
+# OTP abuse limits: per-email sends and per-IP requests, as "count/seconds"
+otp_email_limiter = KeyedRateLimiter.from_spec(os.getenv("OTP_EMAIL_RATE_LIMIT", "3/600"))
+otp_ip_limiter = KeyedRateLimiter.from_spec(os.getenv("OTP_IP_RATE_LIMIT", "30/600"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))
+# Take the client IP from X-Forwarded-For (only behind a trusted proxy)
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+# Emails known to be verified / subscribed, so /submit-email can skip Mongo reads.
+# This process only ever adds to either collection, so entries are never
+# invalidated; they expire after EMAIL_CACHE_TTL seconds, which bounds how long
+# an out-of-band change (e.g. init_db.py clearing submissions) can go unnoticed.
+EMAIL_CACHE_TTL = float(os.getenv("EMAIL_CACHE_TTL", 600))
+verified_email_cache = TTLCache(ttl=EMAIL_CACHE_TTL)
+subscribed_email_cache = TTLCache(ttl=EMAIL_CACHE_TTL)
+submit_email_latency = LatencyWindow()
+
+# Outbound mail; SMTP settings are read from the environment by MailQueue
+mail_queue = MailQueue()
 
 
 async def init_db():
     """
-    Initialize or re-create indexes on `email_submissions`, `otps`, and `verified_emails` collections.
-    We will NOT drop the entire `email_submissions` collection here—only ensure unique indexes.
+    Reconcile indexes with the registry in indexes.py (creates missing ones,
+    reports drift). We will NOT drop the entire `email_submissions` collection here.
     """
     try:
-        # Ensure `email_submissions` has a unique index on "email"
-        await email_submissions_collection.create_index(
-            [("email", 1)], unique=True
-        )
-        # Ensure `otps` has a TTL index on "created_at" so OTPs auto-expire after, say, 300 seconds (5 minutes)
-        # Note: TTL index can only be set once, so ignoring exceptions if it already exists.
-        await otps_collection.create_index(
-            [("created_at", 1)],
-            expireAfterSeconds=300  # auto-delete after 5 minutes
-        )
-        # Ensure `verified_emails` has a unique index on "email"
-        await verified_emails_collection.create_index(
-            [("email", 1)], unique=True
-        )
-        print("Database indexes ensured successfully.")
+        report = await reconcile_indexes(db)
+        logger.info("Database indexes ensured", **report.as_dict())
+        if report.drift:
+            logger.warning("Index drift (set INDEX_DROP_DRIFT=true to fix)",
+                           mismatched=report.mismatched, undeclared=report.undeclared)
+        if report.failed:
+            logger.error("Indexes could not be created", failed=report.failed)
     except Exception as e:
-        print(f"Error initializing database indexes: {e}")
+        logger.exception("Error initializing database indexes", error=str(e))
 
 
 class EmailSubmission(BaseModel):
@@ -88,65 +179,287 @@ class OTPVerifyRequest(BaseModel):
     dob: str | None = None
 
 
+async def load_upcoming_events() -> List[dict]:
+    """All upcoming events in API shape; the source for the /events snapshot."""
+    cursor = events_collection.find(
+        build_events_filter(datetime.utcnow()), build_projection(None)
+    ).sort(EVENT_SORT)
+    events = await cursor.to_list(length=None)
+    for event in events:
+        event["id"] = str(event.pop("_id"))
+    return events
+
+
+async def rebuild_search_index():
+    """Load every upcoming event into the search index from scratch."""
+    try:
+        search_index.replace_all(await load_upcoming_events())
+        logger.info("Search index built", events=len(search_index))
+    except Exception as e:
+        logger.exception("Error building search index", error=str(e))
+
+
+async def index_events(source_ids: List[str]):
+    """Re-index just the events that an ingest inserted or changed."""
+    if not source_ids:
+        return
+    cursor = events_collection.find({"source_id": {"$in": source_ids}}, HIDDEN_FIELDS)
+    async for event in cursor:
+        event["id"] = str(event.pop("_id"))
+        search_index.upsert(event)
+
+
+async def note_events_changed():
+    """Tell the other API processes to reload their snapshot and search index."""
+    global own_version_bumps
+    await bump_events_version(scrape_state_collection)
+    own_version_bumps += 1
+
+
 async def cleanup_past_events():
     """Remove events whose date < now."""
     try:
         current_time = datetime.utcnow()
         result = await events_collection.delete_many({"date": {"$lt": current_time}})
-        print(f"[{datetime.utcnow().isoformat()}] Cleaned up {result.deleted_count} past events")
+        EVENTS_CLEANED.inc(result.deleted_count)
+        logger.info("Cleaned up past events", deleted=result.deleted_count)
+        if result.deleted_count:
+            await note_events_changed()
+            await events_snapshot.refresh(load_upcoming_events)
+        search_index.remove_before(current_time)
     except Exception as e:
-        print(f"[{datetime.utcnow().isoformat()}] Error in cleanup_past_events: {e}")
+        logger.exception("Error in cleanup_past_events", error=str(e))
 
 
-async def update_events(events: List[EventModel]):
-    """Upsert each event into MongoDB using source_id as unique key."""
+async def run_scrape(full: bool = False) -> dict:
+    """
+    Run the scrape pipeline in this process, flagged so request latency during
+    scrapes is tracked separately. Batches are upserted while the crawl
+    continues; changed events are re-indexed per batch and the /events
+    snapshot is rebuilt at most every SNAPSHOT_STREAM_INTERVAL seconds
+    mid-crawl, since each rebuild reads every upcoming event.
+    """
+    global scrapes_in_progress
+    stale_snapshot = False
+    refreshed_at = time.monotonic()
+
+    async def on_batch(batch: IngestResult):
+        nonlocal stale_snapshot, refreshed_at
+        if batch.inserted or batch.updated:
+            stale_snapshot = True
+            await note_events_changed()
+            await index_events(batch.changed_ids)
+        if stale_snapshot and time.monotonic() - refreshed_at >= SNAPSHOT_STREAM_INTERVAL:
+            await events_snapshot.refresh(load_upcoming_events)
+            stale_snapshot = False
+            refreshed_at = time.monotonic()
+
+    scrapes_in_progress += 1
     try:
-        for event in events:
-            event_dict = event.model_dump()
-            event_dict.pop("id", None)
-            await events_collection.update_one(
-                {"source_id": event_dict["source_id"]},
-                {"$set": event_dict},
-                upsert=True
-            )
+        result = await scrape_pipeline.run(full=full, on_batch=on_batch)
     except Exception as e:
-        print(f"[{datetime.utcnow().isoformat()}] Error updating events: {e}")
-        raise e
+        logger.exception("Error running scrape pipeline", error=str(e))
+        raise
+    finally:
+        scrapes_in_progress -= 1
+        if stale_snapshot:
+            await events_snapshot.refresh(load_upcoming_events)
+    return {"scraped": result.scraped, **result.ingest.as_dict()}
+
+
+async def enqueue_scrape(full: bool = False) -> dict:
+    """Queue one scrape job per source for worker.py, unless one is already pending."""
+    queued = 0
+    for source in get_sources():
+        job_id = await job_queue.enqueue(
+            "scrape_source", {"source": source.name, "full": full}, key=f"scrape_source:{source.name}",
+        )
+        queued += job_id is not None
+    pending = len(get_sources()) - queued
+    logger.info("Queued scrape jobs", queued=queued, already_pending=pending)
+    return {"queued": queued, "already_pending": pending}
+
+
+async def scrape_cycle(full: bool = False) -> Optional[dict]:
+    """
+    Scrape (SCRAPE_MODE=inline) or enqueue scrape jobs (SCRAPE_MODE=queue),
+    then clean up, under the cluster-wide scrape lease.
+    Returns None when another process holds the lease; raises LeaseLost, with
+    the scrape and cleanup cancelled, if the lease is lost mid-cycle.
+    Concurrent callers in this process share one run (and its result),
+    whatever their `full` flag.
+    """
+    async def cycle():
+        async with scrape_lease.hold() as acquired:
+            if not acquired:
+                return None
+            if SCRAPE_MODE == "queue":
+                counts = await enqueue_scrape(full=full)
+            else:
+                counts = await run_scrape(full=full)
+            await cleanup_past_events()
+            await scrape_lease.mark_completed()
+            return counts
+
+    return await scrape_flight.do("scrape", cycle)
+
+
+async def watch_events_writes():
+    """
+    Whoever changes events (scrape workers in queue mode, the lease holder's
+    scrape and cleanup in inline mode) bumps a version in scrape_state;
+    rebuild the /events snapshot and the search index when another process
+    moved it.
+    """
+    global own_version_bumps
+    seen = None
+    while True:
+        try:
+            # Taken before the read, so every bump counted is in `version`
+            own, own_version_bumps = own_version_bumps, 0
+            version = await events_version(scrape_state_collection)
+            if seen is not None and version - seen > own:
+                await events_snapshot.refresh(load_upcoming_events)
+                await rebuild_search_index()
+            seen = version
+        except Exception as e:
+            logger.exception("Error checking for worker writes", error=str(e))
+        await asyncio.sleep(EVENTS_POLL_INTERVAL)
 
 
 async def periodic_tasks():
     """
-    1) Scrape events
-    2) Upsert into MongoDB
-    3) Clean up past events
-    4) Sleep for SCRAPING_INTERVAL seconds
+    Every SCRAPING_INTERVAL seconds (jittered by ±SCRAPE_JITTER), run a scrape
+    cycle unless another process completed one within the interval or is
+    running one now.
     """
     interval = int(os.getenv("SCRAPING_INTERVAL", 3600))
+    jitter = float(os.getenv("SCRAPE_JITTER", 0.1))
+    # Stagger replicas that start together
+    await asyncio.sleep(random.uniform(0, float(os.getenv("SCRAPE_START_JITTER", 30))))
     while True:
         try:
-            scraper = EventScraper()
-            events = await scraper.scrape_events()
-            await update_events(events)
-            print(f"[{datetime.utcnow().isoformat()}] Scraped and upserted {len(events)} events.")
-            await cleanup_past_events()
+            last = await scrape_lease.last_completed_at()
+            if last and last > datetime.utcnow() - timedelta(seconds=interval * (1 - jitter)):
+                logger.info("Skipping scrape: completed recently", completed_at=last.isoformat())
+            elif await scrape_cycle() is None:
+                logger.info("Skipping scrape: lease held by another process")
         except Exception as e:
-            print(f"[{datetime.utcnow().isoformat()}] Error in periodic_tasks: {e}")
+            logger.exception("Error in periodic_tasks", error=str(e))
         finally:
-            await asyncio.sleep(interval)
+            await asyncio.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
 
 
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    await mail_queue.start()
+    asyncio.create_task(rebuild_search_index())
     asyncio.create_task(periodic_tasks())
+    asyncio.create_task(watch_events_writes())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await mail_queue.stop()
+    await default_archive.close()
+    await default_fetcher.close()
+    default_parse_pool.shutdown()
+
+
+@app.get("/stats/snapshot")
+async def snapshot_stats():
+    """Hit/miss counters and sizes for the /events snapshot."""
+    return events_snapshot.stats()
+
+
+@app.get("/stats/mail")
+async def mail_stats():
+    """Outbound mail queue depth, delivery counters and latency."""
+    return mail_queue.stats()
+
+
+@app.get("/stats/submit-email")
+async def submit_email_stats():
+    """/submit-email latency and email cache effectiveness."""
+    return {
+        "latency": submit_email_latency.summary(),
+        "verified_cache": verified_email_cache.stats(),
+        "subscribed_cache": subscribed_email_cache.stats(),
+    }
+
+
+@app.get("/stats/latency")
+async def latency_stats():
+    """Request latency percentiles, overall and while a scrape was running."""
+    return {
+        "scraping": scrapes_in_progress > 0,
+        "all_requests": request_latency.summary(),
+        "during_scrape": request_latency_during_scrape.summary(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of this process's counters and histograms."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/events")
-async def get_events():
+async def get_events(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_EVENTS_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    venue: Optional[str] = None,
+    title: Optional[str] = None,
+    q: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$"),
+    collapse: bool = False,
+):
+    """
+    Upcoming events ordered by (date, _id).
+
+    With `limit`, returns one page and sets the `X-Next-Cursor` header when more
+    results follow; pass it back as `cursor` to get the next page. `venue`,
+    `title` and `q` (title, description or venue) are case-insensitive substring filters,
+    `fields` is a comma-separated projection. `stream=ndjson|json` streams the
+    results as they come off the cursor (no `X-Next-Cursor` in that mode).
+    `collapse=true` returns one event per group of duplicates (same `canonical_id`).
+
+    Without any parameters the full list, and with only `limit` its first
+    page, is served from the in-memory snapshot, honouring If-None-Match and
+    Accept-Encoding.
+    """
+    if set(request.query_params) <= {"limit"}:
+        return await serve_events_snapshot(request, limit)
+
     try:
-        current_time = datetime.utcnow()
-        cursor = events_collection.find({"date": {"$gt": current_time}})
-        events = await cursor.to_list(length=None)
+        query = build_events_filter(
+            datetime.utcnow(), date_from, date_to, venue, title, q, cursor, collapse
+        )
+        projection = build_projection(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        mongo_cursor = events_collection.find(query, projection).sort(EVENT_SORT)
+        if limit is not None:
+            mongo_cursor = mongo_cursor.limit(limit)
+        return stream_cursor(mongo_cursor, stream)
+
+    try:
+        mongo_cursor = events_collection.find(query, projection).sort(EVENT_SORT)
+        if limit is not None:
+            mongo_cursor = mongo_cursor.limit(limit + 1)
+        events = await mongo_cursor.to_list(length=None)
+        if limit is not None and len(events) > limit:
+            events = events[:limit]
+            last = events[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(last.get("date"), last["_id"])
         for event in events:
             event["id"] = str(event.pop("_id"))
         return events
@@ -154,10 +467,53 @@ async def get_events():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/events/search")
+async def search_events(
+    q: str = Query(..., min_length=1),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=MAX_EVENTS_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Ranked search over upcoming events' title, venue and description.
+    Every word in `q` must match a word (or the start of one) in the event.
+    """
+    now = datetime.utcnow()
+    date_from = naive_utc(date_from)
+    if date_from is None or date_from < now:
+        date_from = now
+    total, results = search_index.search(q, date_from, naive_utc(date_to), limit, offset)
+    return {"total": total, "offset": offset, "limit": limit, "results": results}
+
+
+async def serve_events_snapshot(request: Request, limit: Optional[int] = None) -> Response:
+    try:
+        entry = await events_snapshot.get(load_upcoming_events, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    headers = {
+        "ETag": entry.etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache",
+    }
+    if entry.next_cursor:
+        headers["X-Next-Cursor"] = entry.next_cursor
+    if entry.matches(request.headers.get("if-none-match")):
+        events_snapshot.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    body, encoding = entry.encode_for(request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/events/{event_id}")
 async def get_event(event_id: str):
     try:
-        event = await events_collection.find_one({"_id": ObjectId(event_id)})
+        event = await events_collection.find_one({"_id": ObjectId(event_id)}, HIDDEN_FIELDS)
         if event:
             event["id"] = str(event.pop("_id"))
             return event
@@ -171,91 +527,112 @@ def generate_otp(length: int = 6) -> str:
     return ''.join(random.choices(string.digits, k=length))
 
 
-async def send_email_otp(email: str, otp: str):
+def send_email_otp(email: str, otp: str):
     """
-    Send an OTP via SMTP. Uses environment vars for SMTP credentials.
+    Queue the OTP email; delivery happens in the background mail workers.
+    Raises HTTPException(503) if the outbound queue is full.
     """
+    subject = "Your LOUDER OTP Code"
+    body = (
+        f"Hello,\n\n"
+        f"Your OTP for LOUDER is: {otp}\n"
+        f"It will expire in 5 minutes.\n\n"
+        f"Thanks,\nLOUDER Team"
+    )
     try:
-        subject = "Your LOUDER OTP Code"
-        body = (
-            f"Hello,\n\n"
-            f"Your OTP for LOUDER is: {otp}\n"
-            f"It will expire in 5 minutes.\n\n"
-            f"Thanks,\nLOUDER Team"
-        )
+        mail_queue.enqueue(email, subject, body)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Email service busy, please retry shortly")
+    OTPS_SENT.inc()
 
-        msg = MIMEMultipart()
-        msg["From"] = SMTP_EMAIL
-        msg["To"] = email
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
 
-        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_EMAIL, SMTP_PASSWORD)
-        server.sendmail(SMTP_EMAIL, email, msg.as_string())
-        server.quit()
-
-        print(f"[OTP SENT] {otp} sent to {email}")
-    except Exception as e:
-        print(f"[ERROR] Failed to send OTP: {e}")
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
 
 
 @app.post("/send-otp")
-async def send_otp(payload: dict):
+async def send_otp(payload: dict, http_request: Request):
     """
     1) Validate email
-    2) Generate OTP
-    3) Store {email, otp, dob, created_at} in otps_collection (with TTL index)
-    4) Send OTP via email
+    2) Rate-limit per email and per client IP
+    3) Generate OTP
+    4) Upsert the email's single {otp, dob, created_at, attempts} document in otps_collection (with TTL index)
+    5) Queue the OTP email (sent in the background)
     """
     email = payload.get("email")
     dob = payload.get("dob")
-    if not email or "@" not in email:
+    if not isinstance(email, str) or "@" not in email:
         raise HTTPException(status_code=400, detail="Invalid email")
     if not dob:
         raise HTTPException(status_code=400, detail="Date of birth required")
+    email = normalize_email(email)
+    if not otp_ip_limiter.allow(client_ip(http_request)) or not otp_email_limiter.allow(email):
+        raise HTTPException(status_code=429, detail="Too many OTP requests, please try again later")
     otp = generate_otp()
-    await otps_collection.insert_one({
-        "email": email,
-        "otp": otp,
-        "dob": dob,
-        "created_at": datetime.utcnow()
-    })
-    await send_email_otp(email, otp)
+    # One document per email (unique index): a resend replaces the code and
+    # resets the attempt counter
+    update = {
+        "$set": {"otp": otp, "dob": dob, "created_at": datetime.utcnow(), "attempts": 0},
+        "$inc": {"sends": 1},
+    }
+    try:
+        await otps_collection.update_one({"email": email}, update, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent send inserted the document first; replace its code instead
+        await otps_collection.update_one({"email": email}, update)
+    send_email_otp(email, otp)
     return {"message": "OTP sent to email"}
 
 
 @app.post("/verify-otp")
-async def verify_otp(request: OTPVerifyRequest):
+async def verify_otp(request: OTPVerifyRequest, http_request: Request):
     """
-    1) Look up the latest OTP for this email
-    2) If no record: error "No OTP sent"
+    1) Look up the OTP for this email, counting this attempt
+    2) If no record: error "No OTP sent"; if out of attempts: 429
     3) If OTP expired (> 5 minutes): error "OTP expired"
     4) If code mismatches: error "Invalid OTP"
     5) Otherwise: mark email as verified in verified_emails_collection
     """
-    record = await otps_collection.find_one(
-        {"email": request.email},
-        sort=[("created_at", -1)]
+    if not otp_ip_limiter.allow(client_ip(http_request)):
+        raise HTTPException(status_code=429, detail="Too many attempts, please try again later")
+    email = normalize_email(request.email)
+
+    # Count the attempt in the same round-trip as the lookup, and stop matching
+    # once the email has used up its attempts
+    record = await otps_collection.find_one_and_update(
+        {"email": email, "attempts": {"$not": {"$gte": OTP_MAX_ATTEMPTS}}},
+        {"$inc": {"attempts": 1}},
+        return_document=ReturnDocument.AFTER
     )
     if not record:
+        if await otps_collection.count_documents({"email": email}, limit=1):
+            OTPS_VERIFIED.inc(outcome="locked")
+            raise HTTPException(status_code=429, detail="Too many attempts, request a new OTP")
+        OTPS_VERIFIED.inc(outcome="no_otp")
         raise HTTPException(status_code=400, detail="No OTP sent")
 
     # TTL index on `created_at` already ensures expired documents are gone after 5 minutes.
     # But in case TTL hasn't fired yet, we can double-check:
     if (datetime.utcnow() - record["created_at"]).total_seconds() > 300:
+        OTPS_VERIFIED.inc(outcome="expired")
         raise HTTPException(status_code=400, detail="OTP expired")
 
     if record["otp"] != request.otp:
+        OTPS_VERIFIED.inc(outcome="invalid")
         raise HTTPException(status_code=401, detail="Invalid OTP")
 
     # Store dob in verified_emails_collection
     await verified_emails_collection.update_one(
-        {"email": request.email},
+        {"email": email},
         {"$set": {"verified": True, "verified_at": datetime.utcnow(), "dob": request.dob or record.get("dob")}},
         upsert=True
     )
+    verified_email_cache.set(email, True)
+    OTPS_VERIFIED.inc(outcome="verified")
     return {"message": "OTP verified"}
 
 
@@ -263,52 +640,88 @@ async def verify_otp(request: OTPVerifyRequest):
 async def submit_email(submission: EmailSubmission):
     """
     1) Validate email format
-    2) Check if this email is marked as `verified` in verified_emails_collection
+    2) Check if this email is verified (in-process cache, then verified_emails_collection)
     3) If not verified → 403 "Email not verified"
-    4) If verified, insert into email_submissions_collection (unless already there)
+    4) If verified, upsert into email_submissions_collection with $setOnInsert,
+       so "already subscribed" and "new" are told apart by one atomic write
     """
+    start = time.perf_counter()
     try:
         if "@" not in submission.email or "." not in submission.email:
             raise HTTPException(status_code=400, detail="Invalid email format")
+        email = normalize_email(submission.email)
+
+        # Repeat submissions are answered without touching Mongo
+        if subscribed_email_cache.get(email):
+            return {"message": "Email already subscribed"}
 
         # Check verification flag
-        verified_doc = await verified_emails_collection.find_one(
-            {"email": submission.email, "verified": True}
-        )
-        if not verified_doc:
-            raise HTTPException(status_code=403, detail="Email not verified")
+        if not verified_email_cache.get(email):
+            verified_doc = await verified_emails_collection.find_one(
+                {"email": email, "verified": True}, {"_id": 1}
+            )
+            if not verified_doc:
+                raise HTTPException(status_code=403, detail="Email not verified")
+            verified_email_cache.set(email, True)
 
-        # Now insert into `email_submissions_collection` if not already subscribed
-        existing = await email_submissions_collection.find_one({"email": submission.email})
-        if existing:
+        try:
+            result = await email_submissions_collection.update_one(
+                {"email": email},
+                {"$setOnInsert": {"email": email, "submitted_at": datetime.utcnow()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent submission for the same email won the upsert race
+            result = None
+        subscribed_email_cache.set(email, True)
+        if result is None or result.upserted_id is None:
             return {"message": "Email already subscribed"}
 
-        result = await email_submissions_collection.insert_one({
-            "email": submission.email,
-            "submitted_at": datetime.utcnow()
-        })
-        print(f"Successfully stored email subscription with ID: {result.inserted_id}")
+        logger.info("Stored email subscription", id=str(result.upserted_id))
         return {"message": "Email submitted successfully"}
 
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error in submit-email: {str(e)}")
+        logger.exception("Error in submit-email", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to submit email")
+    finally:
+        submit_email_latency.observe(time.perf_counter() - start)
 
 
 @app.post("/scrape-now")
-async def scrape_now():
+async def scrape_now(full: bool = False):
     """
-    Manually trigger one scrape+upsert cycle.
+    Manually trigger one scrape+upsert cycle (`full=true` skips the delta shortcut),
+    or in queue mode enqueue one for the workers.
+    Joins a cycle already running in this process; 409 if another process runs one.
     """
     try:
-        scraper = EventScraper()
-        events = await scraper.scrape_events()
-        await update_events(events)
-        return {"message": f"Manually scraped {len(events)} events."}
+        counts = await scrape_cycle(full=full)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Manual scrape failed: {e}")
+    if counts is None:
+        raise HTTPException(status_code=409, detail="A scrape is already running on another instance")
+    counts = dict(counts)  # shared with any callers that joined this run
+    if "queued" in counts:
+        return {"message": f"Queued {counts['queued']} scrape jobs.", **counts}
+    return {"message": f"Manually scraped {counts.pop('scraped')} events.", **counts}
+
+
+@app.get("/admin/jobs")
+async def job_stats():
+    """Scrape job counts by status (queue mode)."""
+    return {"mode": SCRAPE_MODE, "jobs": await job_queue.stats()}
+
+
+@app.get("/admin/events/export")
+async def export_events(format: str = Query("ndjson", pattern="^(ndjson|json)$")):
+    """Stream every stored event, past ones included, in constant memory."""
+    cursor = events_collection.find({}, HIDDEN_FIELDS).sort([("_id", 1)])
+    filename = f"events-{datetime.utcnow():%Y%m%d-%H%M%S}.{'jsonl' if format == 'ndjson' else 'json'}"
+    return stream_cursor(
+        cursor, format, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @app.post("/events/cleanup")
@@ -1,8 +1,13 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
 
+def normalize_email(email: str) -> str:
+    """The one form an email is stored, looked up and rate-limited under."""
+    return email.strip().lower()
+
+
 class PyObjectId(ObjectId):
     @classmethod
     def __get_validators__(cls):
@@ -28,6 +33,12 @@ class Event(BaseModel):
     image_url: str
     ticket_url: str
     source_url: str
+    # Filled in from the event's detail page by enrichment.py
+    end_date: Optional[datetime] = None
+    price: Optional[str] = None
+    # Set by dedup.py: source_id of the first-seen copy of this event, and its LSH band keys
+    canonical_id: Optional[str] = None
+    dedup_keys: Optional[List[str]] = None
 
     class Config:
         json_encoders = {ObjectId: str}
@@ -0,0 +1,324 @@
+"""
+CPU-bound parsing of listing pages.
+
+Nothing in here touches asyncio or the network, so extractors can be shipped
+to a worker process by `ParsePool` and keep HTML parsing off the event loop
+that serves the API. Extractors are looked up by name in `EXTRACTORS`, which
+lets a worker process resolve them without pickling functions; modules that
+register extra extractors must be imported by the worker as well.
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+from date_parser import SYDNEY_TZ, parse_date_time, sydney_today
+from log import get_logger
+
+logger = get_logger("parsing")
+
+try:
+    import lxml  # noqa: F401
+    FAST_TREE_BUILDER = "lxml"
+except ImportError:  # lxml is optional; the fast extractor still strains the tree
+    FAST_TREE_BUILDER = "html.parser"
+
+# (html, base_url, page_number) -> event dicts, or None if the page has no cards
+Extractor = Callable[[str, str, int], Optional[List[dict]]]
+
+EXTRACTORS: Dict[str, Extractor] = {}
+
+
+def register_extractor(name: str):
+    def decorator(func: Extractor) -> Extractor:
+        EXTRACTORS[name] = func
+        return func
+    return decorator
+
+
+def extract_page(extractor: str, html: str, base_url: str, page_number: int) -> Optional[List[dict]]:
+    """Run the named extractor; this is what executes in the worker process."""
+    return EXTRACTORS[extractor](html, base_url, page_number)
+
+
+@register_extractor("eventbrite")
+def parse_listing_page(html: str, base_url: str, page_number: int) -> Optional[List[dict]]:
+    """
+    Parse all event cards on one Eventbrite listing page into plain event dicts.
+    Returns None when the page has no event cards at all.
+    """
+    events: List[dict] = []
+    soup = BeautifulSoup(html, "html.parser")
+
+    # # (Optional) Write the prettified HTML to file for debugging each page
+    # domain = base_url.split("/")[2].replace(".", "_")
+    # with open(f"{domain}_page_{page_number}.html", "w", encoding="utf-8") as f:
+    #     f.write(soup.prettify())
+
+    # Selector for each Eventbrite “card” on the listing page:
+    selector = "div.Container_root__4i85v.NestedActionContainer_root__1jtfr.event-card"
+    card_elements = soup.select(selector)
+    if not card_elements:
+        return None
+
+    # Relative dates on the page are resolved against one reference day
+    today = sydney_today()
+
+    for element in card_elements:
+        try:
+            link_tag = element.select_one("a.event-card-link")
+            title_tag = element.select_one(
+                "a.event-card-link h3.event-card__clamp-line--two"
+            )
+            info_tags = element.select("p.event-card__clamp-line--one")
+            img_tag = element.select_one("img")
+            events.append(_eventbrite_card_dict(
+                link_tag, title_tag, info_tags, img_tag, base_url, page_number, today
+            ))
+        except Exception as e:
+            logger.warning("Error parsing Eventbrite card", page=page_number, error=str(e))
+
+    return events
+
+
+def _eventbrite_card_dict(
+    link_tag: Optional[Tag],
+    title_tag: Optional[Tag],
+    info_tags: List[Tag],
+    img_tag: Optional[Tag],
+    base_url: str,
+    page_number: int,
+    today: date,
+) -> dict:
+    """Build the event dict from the tags located on one Eventbrite card."""
+    # 1) source_id (data-event-id on the <a> tag)
+    source_id = ""
+    if link_tag and link_tag.has_attr("data-event-id"):
+        source_id = link_tag["data-event-id"].strip()
+
+    # 2) Title
+    title = title_tag.get_text(strip=True) if title_tag else ""
+
+    # 3) Ticket URL
+    ticket_url = ""
+    if link_tag and link_tag.has_attr("href"):
+        ticket_url = link_tag["href"]
+
+    # 4) Date & Time + Venue (two <p> tags in sequence)
+    if len(info_tags) >= 2:
+        raw_date_time = info_tags[0].get_text(strip=True)
+        venue = info_tags[1].get_text(strip=True)
+    else:
+        raw_date_time = ""
+        venue = ""
+
+    # 5) Image URL (if present)
+    image_url = img_tag["src"] if (img_tag and img_tag.has_attr("src")) else ""
+
+    # Debug: show the raw date/time string (one level check when DEBUG is off)
+    if logger.is_enabled(logging.DEBUG):
+        logger.debug("raw_date_time", page=page_number, raw=raw_date_time)
+
+    # 6) Parse raw_date_time into a datetime object
+    date_obj = parse_date_time(raw_date_time, today)
+
+    # 7) Plain dict with the Event fields (cheap to pickle back to the loop)
+    return {
+        "source_id": source_id,
+        "title": title,
+        "description": "",
+        "date": date_obj,
+        "venue": venue,
+        "image_url": image_url,
+        "ticket_url": ticket_url,
+        "source_url": base_url,
+    }
+
+
+EVENTBRITE_CARD_CLASSES = frozenset({
+    "Container_root__4i85v", "NestedActionContainer_root__1jtfr", "event-card",
+})
+
+
+def _is_eventbrite_card(class_value: Optional[str]) -> bool:
+    # bs4 tries each class on its own and then the whole space-joined value;
+    # only the joined value can carry all three.
+    return bool(class_value) and EVENTBRITE_CARD_CLASSES.issubset(class_value.split())
+
+
+# Only card <div>s (and everything inside them) make it into the tree
+_EVENTBRITE_CARD_STRAINER = SoupStrainer("div", class_=_is_eventbrite_card)
+
+
+def _inside_card_link(tag: Tag, card: Tag) -> bool:
+    for parent in tag.parents:
+        if parent is card:
+            return False
+        if parent.name == "a" and "event-card-link" in (parent.get("class") or ()):
+            return True
+    return False
+
+
+@register_extractor("eventbrite-fast")
+def parse_listing_page_fast(html: str, base_url: str, page_number: int) -> Optional[List[dict]]:
+    """
+    Same output as `parse_listing_page`, but only the card subtrees are built
+    (SoupStrainer, on lxml when it is installed) and each card's fields are
+    collected in a single walk instead of one CSS query per field.
+    """
+    events: List[dict] = []
+    soup = BeautifulSoup(html, FAST_TREE_BUILDER, parse_only=_EVENTBRITE_CARD_STRAINER)
+    card_elements = soup.find_all("div", class_=_is_eventbrite_card)
+    if not card_elements:
+        return None
+
+    # Relative dates on the page are resolved against one reference day
+    today = sydney_today()
+
+    for element in card_elements:
+        try:
+            link_tag = title_tag = img_tag = None
+            info_tags: List[Tag] = []
+            for tag in element.descendants:
+                if not isinstance(tag, Tag):
+                    continue
+                name = tag.name
+                if name == "a":
+                    if link_tag is None and "event-card-link" in (tag.get("class") or ()):
+                        link_tag = tag
+                elif name == "h3":
+                    if (title_tag is None
+                            and "event-card__clamp-line--two" in (tag.get("class") or ())
+                            and _inside_card_link(tag, element)):
+                        title_tag = tag
+                elif name == "p":
+                    if "event-card__clamp-line--one" in (tag.get("class") or ()):
+                        info_tags.append(tag)
+                elif name == "img":
+                    if img_tag is None:
+                        img_tag = tag
+            events.append(_eventbrite_card_dict(
+                link_tag, title_tag, info_tags, img_tag, base_url, page_number, today
+            ))
+        except Exception as e:
+            logger.warning("Error parsing Eventbrite card", page=page_number, error=str(e))
+
+    return events
+
+
+# schema.org types Eventbrite uses for the JSON-LD block on event pages
+_JSON_LD_EVENT_TYPES = {"Event", "BusinessEvent", "EducationEvent", "SocialEvent", "MusicEvent",
+                        "Festival", "ExhibitionEvent", "FoodEvent", "SportsEvent", "TheaterEvent",
+                        "ComedyEvent", "DanceEvent", "LiteraryEvent", "ScreeningEvent", "VisualArtsEvent"}
+
+
+def _json_ld_event(soup: BeautifulSoup) -> Optional[dict]:
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        for item in data if isinstance(data, list) else data.get("@graph", [data]):
+            kind = item.get("@type") if isinstance(item, dict) else None
+            kinds = set(kind) if isinstance(kind, list) else {kind}
+            if kinds & _JSON_LD_EVENT_TYPES:
+                return item
+    return None
+
+
+def _sydney_wall_clock(value: Optional[str]) -> Optional[datetime]:
+    """ISO timestamp -> naive Sydney wall-clock time, like the listing dates."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None and SYDNEY_TZ is not None:
+        parsed = parsed.astimezone(SYDNEY_TZ)
+    return parsed.replace(tzinfo=None)
+
+
+def _format_price(offers) -> Optional[str]:
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    if not isinstance(offers, dict):
+        return None
+    currency = offers.get("priceCurrency", "")
+    low = offers.get("lowPrice", offers.get("price"))
+    high = offers.get("highPrice")
+    try:
+        low = float(low) if low is not None else None
+        high = float(high) if high is not None else None
+    except (TypeError, ValueError):
+        return None
+    if low is None:
+        return None
+    if low == 0 and not high:
+        return "Free"
+    text = f"{currency} {low:.2f}".strip()
+    if high and high != low:
+        text += f"–{high:.2f}"
+    return text
+
+
+def parse_event_detail(html: str) -> dict:
+    """
+    Pull description, end time and price out of an Eventbrite event page.
+    Reads the schema.org JSON-LD block; falls back to the meta description.
+    Missing values come back as None.
+    """
+    soup = BeautifulSoup(html, FAST_TREE_BUILDER, parse_only=SoupStrainer(["script", "meta"]))
+    event = _json_ld_event(soup) or {}
+    description = event.get("description")
+    if not description:
+        meta = soup.find("meta", attrs={"name": "description"}) or soup.find("meta", property="og:description")
+        description = meta.get("content") if meta else None
+    return {
+        "description": description.strip() if description else None,
+        "end_date": _sydney_wall_clock(event.get("endDate")),
+        "price": "Free" if event.get("isAccessibleForFree") else _format_price(event.get("offers")),
+    }
+
+
+class ParsePool:
+    """
+    Runs extractors in a `ProcessPoolExecutor`.
+
+    `workers` defaults to PARSE_WORKERS (2). With 0 workers pages are parsed in
+    the default thread pool instead, which still keeps the loop responsive for
+    short pages but shares the GIL with the API.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = int(os.getenv("PARSE_WORKERS", 2)) if workers is None else workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def parse(
+        self, html: str, base_url: str, page_number: int, extractor: str = "eventbrite"
+    ) -> Optional[List[dict]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            partial(extract_page, extractor, html, base_url, page_number),
+        )
+
+    async def parse_detail(self, html: str) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), parse_event_detail, html)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,131 @@
+"""
+The scrape -> enrich -> dedup -> upsert pipeline.
+
+Shared by the API's inline scrape cycle (main.scrape_cycle) and by scrape
+workers (worker.py), which run it for one source per job. Batches stream
+through every stage while the crawl continues (see scraper.stream_events);
+callers hook in per batch with `on_batch`.
+"""
+import os
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from dedup import Deduplicator
+from delta import load_delta_state, save_crawl_stats
+from enrichment import DetailEnricher
+from ingest import DERIVED_FIELDS, ENRICHED_FIELDS, IngestResult, bulk_upsert_events
+from log import get_logger
+from metrics import EVENTS_UPSERTED
+from models import Event
+from scraper import EventScraper
+from sources import Source
+
+logger = get_logger("pipeline")
+
+# scrape_state document whose version is bumped whenever a process changes events
+EVENTS_VERSION_ID = "events-version"
+
+
+@dataclass
+class PipelineResult:
+    scraped: int = 0
+    ingest: IngestResult = field(default_factory=IngestResult)
+    enrichment: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {"scraped": self.scraped, **self.ingest.as_dict(), "enrichment": self.enrichment}
+
+
+class ScrapePipeline:
+    def __init__(
+        self,
+        events_collection,
+        state_collection,
+        enricher: DetailEnricher,
+        deduplicator: Deduplicator,
+        batch_size: Optional[int] = None,
+        incremental: Optional[bool] = None,
+        scraper_factory: Callable[..., EventScraper] = EventScraper,
+    ):
+        self.events_collection = events_collection
+        self.state_collection = state_collection
+        self.enricher = enricher
+        self.deduplicator = deduplicator
+        # Events per enrich + upsert step while a crawl streams in
+        self.batch_size = batch_size or int(os.getenv("INGEST_BATCH_SIZE", 500))
+        if incremental is None:
+            incremental = os.getenv("SCRAPE_INCREMENTAL", "true").lower() == "true"
+        self.incremental = incremental
+        self.scraper_factory = scraper_factory
+
+    async def batches(self, sources: Optional[List[Source]] = None, full: bool = False) -> AsyncIterator[List[Event]]:
+        """
+        Scrape `sources` (default: all registered), yielding batches of about
+        `batch_size` events as pages are parsed. Unless `full` is set (or
+        SCRAPE_INCREMENTAL=false), sources that had a full crawl within
+        FULL_CRAWL_INTERVAL get a delta crawl.
+        """
+        scraper = self.scraper_factory(sources=sources)
+        if self.incremental:
+            scraper.delta = await load_delta_state(
+                self.events_collection, self.state_collection, scraper.sources, force_full=full,
+            )
+        async with aclosing(scraper.stream_events(self.batch_size)) as batches:
+            async for batch in batches:
+                yield batch
+        await save_crawl_stats(self.state_collection, scraper.crawl_stats)
+
+    async def upsert(self, events: List[Event]) -> IngestResult:
+        """
+        Bulk-upsert one batch keyed on source_id, skipping unchanged events.
+        Detail fields an event has none for this cycle (fetch deferred or
+        failed, enrichment off) and dedup fields (DEDUP_NEAR off) keep their
+        stored values.
+        """
+        result = await bulk_upsert_events(
+            self.events_collection, events, fill_from_stored=ENRICHED_FIELDS | DERIVED_FIELDS,
+        )
+        for outcome, count in result.as_dict().items():
+            EVENTS_UPSERTED.inc(count, result=outcome)
+        logger.debug("Ingested batch", **result.as_dict())
+        return result
+
+    async def run(
+        self,
+        sources: Optional[List[Source]] = None,
+        full: bool = False,
+        on_batch: Optional[Callable[[IngestResult], Awaitable[None]]] = None,
+    ) -> PipelineResult:
+        """Scrape, enrich, deduplicate and upsert `sources` batch by batch."""
+        result = PipelineResult()
+        enrich_budget = self.enricher.max_per_cycle
+        async with aclosing(self.batches(sources, full)) as batches:
+            async for events in batches:
+                enriched = await self.enricher.enrich(events, max_fetches=enrich_budget)
+                enrich_budget -= enriched.fetched + enriched.failed
+                for key, count in enriched.as_dict().items():
+                    result.enrichment[key] = result.enrichment.get(key, 0) + count
+                batch = await self.upsert(await self.deduplicator.assign(enriched.events))
+                result.ingest.add(batch)
+                result.scraped += len(events)
+                if on_batch is not None:
+                    await on_batch(batch)
+        logger.info("Scraped and upserted events", sources=[s.name for s in sources] if sources else "all",
+                    events=result.scraped, **result.ingest.as_dict(), enrichment=result.enrichment)
+        return result
+
+
+async def bump_events_version(state_collection):
+    """Tell API processes that stored events changed (see events_version)."""
+    await state_collection.update_one(
+        {"_id": EVENTS_VERSION_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def events_version(state_collection) -> int:
+    doc = await state_collection.find_one({"_id": EVENTS_VERSION_ID})
+    return doc["version"] if doc else 0
@@ -0,0 +1,81 @@
+"""
+Token-bucket rate limiting.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+
+class TokenBucket:
+    """
+    Allows `rate` operations per second on average, with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now."""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        """Wait until a token is available, then take it."""
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def parse_rate(spec: str) -> Tuple[float, float]:
+    """
+    Parse "N/SECONDS" (e.g. "3/600": three per ten minutes) into a
+    (rate per second, burst) pair for `TokenBucket`.
+    """
+    count, _, seconds = spec.partition("/")
+    count, seconds = float(count), float(seconds or 1)
+    if count <= 0 or seconds <= 0:
+        raise ValueError(f"Rate {spec!r} must allow a positive number per positive period")
+    return count / seconds, count
+
+
+class KeyedRateLimiter:
+    """
+    One token bucket per key (an email address, a client IP, ...).
+    Only the `max_keys` most recently seen keys are tracked.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.rejected = 0
+
+    @classmethod
+    def from_spec(cls, spec: str, max_keys: int = 10000) -> "KeyedRateLimiter":
+        rate, burst = parse_rate(spec)
+        return cls(rate, burst, max_keys)
+
+    def allow(self, key: str) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        if bucket.try_acquire():
+            return True
+        self.rejected += 1
+        return False
@@ -0,0 +1,63 @@
+"""
+Per-host request scheduling for the scraper.
+
+Each host gets its own token bucket and concurrency cap, so different hosts are
+crawled in parallel while no single host sees more than its configured rate.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from ratelimit import TokenBucket
+
+
+@dataclass
+class HostLimits:
+    rate: float
+    burst: float
+    concurrency: int
+
+    def __post_init__(self):
+        # A zero rate would never refill the bucket (and divide by zero waiting on it)
+        if self.rate <= 0:
+            raise ValueError(f"Host rate must be positive, got {self.rate!r}")
+        if self.concurrency < 1:
+            raise ValueError(f"Host concurrency must be at least 1, got {self.concurrency!r}")
+
+
+def default_host_limits() -> HostLimits:
+    return HostLimits(
+        rate=float(os.getenv("HOST_RATE_LIMIT", 2)),
+        burst=float(os.getenv("HOST_RATE_BURST", 4)),
+        concurrency=int(os.getenv("HOST_CONCURRENCY", 4)),
+    )
+
+
+class HostScheduler:
+    def __init__(self, defaults: Optional[HostLimits] = None):
+        self.defaults = defaults or default_host_limits()
+        self._overrides: Dict[str, HostLimits] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def configure(self, host: str, limits: HostLimits):
+        """Override the limits for one host; only applies before its first request."""
+        self._overrides[host] = limits
+
+    def _limits(self, host: str) -> HostLimits:
+        return self._overrides.get(host, self.defaults)
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Hold one of the host's concurrency slots and spend one rate token."""
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            limits = self._limits(host)
+            self._semaphores[host] = asyncio.Semaphore(max(1, limits.concurrency))
+            self._buckets[host] = TokenBucket(limits.rate, limits.burst)
+        async with self._semaphores[host]:
+            await self._buckets[host].acquire()
+            yield
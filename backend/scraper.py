@@ -1,237 +1,303 @@
 import aiohttp
-from bs4 import BeautifulSoup
-from datetime import datetime, date, timedelta
-from typing import List, Optional
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from models import Event
-import json
-import calendar
-import re
+from parsing import ParsePool, parse_date_time
+from http_cache import HttpCache, body_hash
+from scheduler import HostLimits, HostScheduler
+from sources import Source, get_sources
+from delta import CrawlStats, DeltaState, SourcePlan
+from archive import ArchiveWriter
+from fetcher import CircuitOpen, Fetcher
+from metrics import EVENTS_DEDUPLICATED, EVENTS_SCRAPED, SCRAPE_FETCH_SECONDS, SCRAPE_PARSE_SECONDS
+from log import get_logger
+from dataclasses import dataclass
+
+logger = get_logger("scraper")
+
+# Shared across scrape cycles so worker processes are only spawned once
+default_parse_pool = ParsePool()
+default_http_cache = HttpCache()
+default_archive = ArchiveWriter()
+default_fetcher = Fetcher()
+# Listing crawls and detail-page fetches (enrichment.py) share each host's limits
+default_scheduler = HostScheduler()
+
+
+@dataclass
+class FetchedPage:
+    url: str
+    # None when the page does not need parsing again
+    html: Optional[str]
+    # Card count from the earlier parse when `html` is None
+    cards: int = 0
 
 
 class EventScraper:
-    def __init__(self):
-        # Base URL for the “All Events in Sydney” listing (no page parameter here)
-        self.sources = [
-            "https://www.eventbrite.com/d/australia--sydney/all-events/"
-        ]
-        
-    async def scrape_events(self) -> List[Event]:
+    def __init__(
+        self,
+        page_concurrency: Optional[int] = None,
+        page_lookahead: Optional[int] = None,
+        parse_pool: Optional[ParsePool] = None,
+        http_cache: Optional[HttpCache] = None,
+        sources: Optional[List[Source]] = None,
+        scheduler: Optional[HostScheduler] = None,
+        delta: Optional[DeltaState] = None,
+        archive: Optional[ArchiveWriter] = None,
+        fetcher: Optional[Fetcher] = None,
+    ):
+        # Listing sources to crawl, from the registry in sources.py
+        self.sources: List[Source] = sources if sources is not None else get_sources()
+        # Per-host rate limits and concurrency caps, shared by all sources on a host
+        self.scheduler = scheduler or default_scheduler
+        for source in self.sources:
+            if source.rate is not None or source.burst is not None or source.concurrency is not None:
+                defaults = self.scheduler.defaults
+                self.scheduler.configure(source.host, HostLimits(
+                    rate=source.rate if source.rate is not None else defaults.rate,
+                    burst=source.burst if source.burst is not None else defaults.burst,
+                    concurrency=source.concurrency if source.concurrency is not None else defaults.concurrency,
+                ))
+        # Max listing-page requests in flight per source (1 = strictly sequential)
+        self.page_concurrency = max(1, page_concurrency or int(os.getenv("SCRAPE_PAGE_CONCURRENCY", 4)))
+        # How many pages to request ahead of the one being parsed
+        self.page_lookahead = max(
+            self.page_concurrency,
+            page_lookahead or int(os.getenv("SCRAPE_PAGE_LOOKAHEAD", self.page_concurrency)),
+        )
+        # HTML parsing runs here, off the event loop
+        self.parse_pool = parse_pool or default_parse_pool
+        # Validators and bodies from earlier runs, for conditional requests
+        self.http_cache = http_cache or default_http_cache
+        # Already-stored events and per-source crawl plans; None means always crawl fully
+        self.delta = delta
+        # Pooled session with timeouts, retries and per-host circuit breakers
+        self.fetcher = fetcher or default_fetcher
+        # Buffered, rotating JSON-lines archive of everything scraped
+        self.archive = archive or default_archive
+        # Parsed pages that may wait for the consumer before sources stop fetching
+        self.queue_pages = max(1, int(os.getenv("SCRAPE_QUEUE_PAGES", 8)))
+        # Per-source page counts from the last scrape run
+        self.crawl_stats: List[CrawlStats] = []
+        # (source_url, source_id) of every card already yielded this run
+        self.seen: Set[Tuple[str, str]] = set()
+
+    async def stream_events(self, batch_size: Optional[int] = None) -> AsyncIterator[List[Event]]:
         """
-        Scrape all pages from each source until there are no more event cards.
+        Scrape all pages from each source until there are no more event cards,
+        yielding events as pages are parsed rather than once the crawl ends.
+
+        Sources run concurrently (the scheduler keeps each host within its
+        limits) and hand each parsed page to a queue of at most
+        `queue_pages` pages. While the consumer is busy the queue fills up and
+        sources stop fetching past their look-ahead window, so memory depends
+        on those two bounds rather than on the size of the crawl.
+
+        Each yielded batch holds one page's events plus any further pages that
+        were already waiting, up to about `batch_size` events.
         """
+        self.crawl_stats = []
+        self.seen = set()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_pages)
+        finished = object()
+
+        async def run(source: Source):
+            try:
+                await self._scrape_source(source, queue.put)
+            except Exception as e:
+                logger.error("Error scraping source", source=source.name, url=source.base_url, error=str(e))
+            await queue.put(finished)
+
+        tasks = [asyncio.create_task(run(source)) for source in self.sources]
+        running = len(tasks)
+        try:
+            while running:
+                item = await queue.get()
+                if item is finished:
+                    running -= 1
+                    continue
+                batch = list(item)
+                while (batch_size is None or len(batch) < batch_size) and not queue.empty():
+                    item = queue.get_nowait()
+                    if item is finished:
+                        running -= 1
+                    else:
+                        batch.extend(item)
+                yield batch
+        finally:
+            # Also reached when the consumer stops early
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.archive.flush()
+
+    async def scrape_events(self) -> List[Event]:
+        """Scrape every source and return all events at once; see `stream_events`."""
         events: List[Event] = []
-        async with aiohttp.ClientSession() as session:
-            for base_url in self.sources:
-                try:
-                    events.extend(await self._scrape_source(session, base_url))
-                except Exception as e:
-                    print(f"Error scraping {base_url}: {e}")
+        async for batch in self.stream_events():
+            events.extend(batch)
         return events
 
-    async def _scrape_source(self, session: aiohttp.ClientSession, base_url: str) -> List[Event]:
+    async def _fetch_page(
+        self,
+        semaphore: asyncio.Semaphore,
+        source: Source,
+        page_number: int,
+    ) -> Optional[FetchedPage]:
         """
-        Walk through paginated Eventbrite results for `base_url`.
-        Stops when a page returns zero event cards.
+        Fetch one listing page, holding `semaphore` and a host slot from the
+        scheduler for the duration of the request (retries included).
+        Sends the cached validators for the page, and serves 304s from the cache.
+        Returns None once retries are exhausted, on any other non-200 response,
+        or while the host's circuit breaker is open.
         """
-        events: List[Event] = []
-        page_number = 1
-
-        while True:
-            # Construct the URL for this page (Eventbrite uses ?page=N)
-            page_url = f"{base_url}?page={page_number}"
-            async with session.get(page_url) as response:
-                if response.status != 200:
-                    print(f"Failed to load {page_url}, status: {response.status}")
-                    break  # Stop pagination on HTTP error
-
-                html = await response.text()
-                soup = BeautifulSoup(html, "html.parser")
-
-                # # (Optional) Write the prettified HTML to file for debugging each page
-                # domain = base_url.split("/")[2].replace(".", "_")
-                # with open(f"{domain}_page_{page_number}.html", "w", encoding="utf-8") as f:
-                #     f.write(soup.prettify())
-
-                # Selector for each Eventbrite “card” on the listing page:
-                selector = "div.Container_root__4i85v.NestedActionContainer_root__1jtfr.event-card"
-                card_elements = soup.select(selector)
-
-                # If no event cards found, we’ve reached the end:
-                if not card_elements:
-                    break
-
-                # Otherwise, parse each card on this page
-                for element in card_elements:
-                    try:
-                        # 1) source_id (data-event-id on the <a> tag)
-                        link_tag = element.select_one("a.event-card-link")
-                        source_id = ""
-                        if link_tag and link_tag.has_attr("data-event-id"):
-                            source_id = link_tag["data-event-id"].strip()
-
-                        # 2) Title
-                        title_tag = element.select_one(
-                            "a.event-card-link h3.event-card__clamp-line--two"
-                        )
-                        title = title_tag.get_text(strip=True) if title_tag else ""
-
-                        # 3) Ticket URL
-                        ticket_url = ""
-                        if link_tag and link_tag.has_attr("href"):
-                            ticket_url = link_tag["href"]
-
-                        # 4) Date & Time + Venue (two <p> tags in sequence)
-                        info_tags = element.select("p.event-card__clamp-line--one")
-                        if len(info_tags) >= 2:
-                            raw_date_time = info_tags[0].get_text(strip=True)
-                            venue = info_tags[1].get_text(strip=True)
-                        else:
-                            raw_date_time = ""
-                            venue = ""
-
-                        # 5) Image URL (if present)
-                        img_tag = element.select_one("img")
-                        image_url = img_tag["src"] if (img_tag and img_tag.has_attr("src")) else ""
-
-                        # Debug: show the raw date/time string
-                        print(f"[Page {page_number}] raw_date_time:", raw_date_time)
-
-                        # 6) Parse raw_date_time into a datetime object
-                        date_obj = self._parse_date_time(raw_date_time)
-
-                        # 7) Build the Event object
-                        event = Event(
-                            source_id=source_id,
-                            title=title,
-                            description="",
-                            date=date_obj,
-                            venue=venue,
-                            image_url=image_url,
-                            ticket_url=ticket_url,
-                            source_url=base_url
-                        )
-
-                        # 8) Append to list and optionally write to JSONL
-                        events.append(event)
-                        with open("scraped_events.jsonl", "a", encoding="utf-8") as fp:
-                            event_data = event.dict(exclude_none=True, exclude={"id"})
-                            fp.write(json.dumps(event_data, default=str) + "\n")
-
-                    except Exception as e:
-                        print(f"Error parsing Eventbrite card on page {page_number}: {e}")
-            # Move to next page
-            page_number += 1
+        page_url = source.page_url(page_number)
+        headers = self.http_cache.conditional_headers(page_url)
+        async with semaphore, self.scheduler.slot(page_url):
+            html = None
+            status = "error"
+            start = time.perf_counter()
+            try:
+                result = await self.fetcher.get(page_url, headers=headers)
+                if result.status == 304:
+                    # Cached body may be gone, in which case fetch it again unconditionally
+                    html = await self.http_cache.read_body(page_url)
+                    if html is None:
+                        result = await self.fetcher.get(page_url)
+                status = result.status
+                if html is None:
+                    if result.status != 200:
+                        logger.warning("Failed to load page", url=page_url, status=result.status,
+                                       attempts=result.attempts)
+                        return None
+                    html = result.text
+                    await self.http_cache.store(
+                        page_url, html, result.headers.get("ETag"), result.headers.get("Last-Modified"),
+                    )
+            except CircuitOpen as e:
+                status = "circuit_open"
+                logger.warning("Skipping page", url=page_url, reason=str(e))
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning("Failed to load page", url=page_url, error=repr(e))
+                return None
+            finally:
+                SCRAPE_FETCH_SECONDS.observe(time.perf_counter() - start, source=source.name, status=status)
 
-        return events
+        if self.http_cache.is_parsed_today(page_url, body_hash(html)):
+            return FetchedPage(page_url, None, self.http_cache.get(page_url).cards)
+        return FetchedPage(page_url, html)
 
-    def _parse_date_time(self, raw: str) -> Optional[datetime]:
+    async def _scrape_source(self, source: Source, emit: Callable[[List[Event]], Awaitable[None]]):
         """
-        Parse strings like:
-          - "Tomorrow at 12:00 PM"
-          - "Fri, May 28, 8:30 AM"
-          - "Tue, Jun 10, 8:30 AM"
-          - "Friday at 10:00 PM"
-          - "Thursday at 6:30 PM"
-          - "Sat, Jun 14, 2:00 PM"
-        into a datetime (assuming current year). Returns None if parsing fails.
+        Walk through the paginated results of `source`, passing each parsed
+        page's events to `emit`. A slow `emit` holds pagination back.
+
+        Up to `page_lookahead` pages are requested ahead of the page currently
+        being parsed, with at most `page_concurrency` requests in flight at once.
+        Pages are still consumed strictly in order, so results keep page order.
+        Stops at the first page that still fails after the fetcher's retries or
+        returns zero event cards, and cancels any look-ahead requests beyond it.
+        Pages whose body is unchanged since they were parsed earlier today are
+        skipped without parsing.
+
+        In a delta crawl pagination also stops after `delta.stop_after`
+        consecutive pages with no new or changed events.
         """
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        in_flight: Dict[int, asyncio.Task] = {}
+        next_to_schedule = 1
+        page_number = 1
+        plan = self.delta.plan(source.name) if self.delta else SourcePlan(full=True)
+        stats = CrawlStats(source=source.name, full=plan.full, high_water=plan.high_water)
+        self.crawl_stats.append(stats)
+        # Consecutive pages that brought nothing new or changed
+        stale_pages = 0
+        # Validators for the conditional requests below, read off the event loop
+        await self.http_cache.load()
 
-        if not raw:
-            return None
-
-        # 1) Normalize “at” → comma, bullets/pipes → comma
-        normalized = (
-            raw
-            .replace(" at ", ", ")
-            .replace("•", ",")
-            .replace("·", ",")
-            .replace("|", ",")
-        )
-        normalized = re.sub(r",\s*,+", ",", normalized).strip()
-
-        # 2) Split on commas
-        parts = [p.strip() for p in normalized.split(",") if p.strip()]
-
-        # 3) Find the “time” portion (e.g. "10:00 PM" or "8:30 AM")
-        time_part = None
-        for p in parts:
-            if re.search(r"\b\d{1,2}:\d{2}\s*[APap][Mm]\b", p):
-                time_part = p
-                break
-        if not time_part:
-            return None
-
-        # Parse the time into a time object
         try:
-            time_obj = datetime.strptime(time_part.upper(), "%I:%M %p").time()
-        except ValueError:
-            return None
-
-        today_date = date.today()
-        current_year = today_date.year
-
-        # Helper: next occurrence of a given weekday (0=Mon ... 6=Sun)
-        def next_weekday(curr: date, target_wd: int) -> date:
-            today_wd = curr.weekday()
-            days_ahead = (target_wd - today_wd + 7) % 7
-            if days_ahead == 0:
-                days_ahead = 7  # skip today, move to next week
-            return curr + timedelta(days=days_ahead)
-
-        # 4) FIRST: attempt to find a “month-day” substring (e.g. "May 28", "Jun 10")
-        month_day_str = None
-        for p in parts:
-            # check for full month names or abbreviations
-            if any(mon.lower() in p.lower() for mon in calendar.month_name if mon):
-                month_day_str = p
-                break
-            if any(ab.lower() in p.lower() for ab in calendar.month_abbr if ab):
-                month_day_str = p
-                break
-
-        if month_day_str:
-            md = month_day_str.strip()
-            year_match = re.search(r"\b(\d{4})\b", md)
-            if year_match:
-                # parse "Jun 10 2025" or "June 10 2025"
-                try:
-                    event_date = datetime.strptime(md, "%b %d %Y").date()
-                except ValueError:
-                    try:
-                        event_date = datetime.strptime(md, "%B %d %Y").date()
-                    except ValueError:
-                        return None
-            else:
-                # append current year (e.g. "Jun 10 2025" if current_year=2025)
-                try:
-                    event_date = datetime.strptime(f"{md} {current_year}", "%b %d %Y").date()
-                except ValueError:
-                    try:
-                        event_date = datetime.strptime(f"{md} {current_year}", "%B %d %Y").date()
-                    except ValueError:
-                        return None
-
-            return datetime.combine(event_date, time_obj)
-
-        # 5) FALLBACK: “today”, “tomorrow”, or weekday logic
-        first_part = parts[0].lower()
-
-        if "today" in first_part:
-            event_date = today_date
-        elif "tomorrow" in first_part:
-            event_date = today_date + timedelta(days=1)
-        else:
-            weekdays_full = {name.lower(): idx for idx, name in enumerate(calendar.day_name)}
-            weekdays_abbr = {name.lower(): idx for idx, name in enumerate(calendar.day_abbr)}
-
-            if first_part in weekdays_full:
-                target_wd = weekdays_full[first_part]
-                event_date = next_weekday(today_date, target_wd)
-            elif first_part in weekdays_abbr:
-                target_wd = weekdays_abbr[first_part]
-                event_date = next_weekday(today_date, target_wd)
-            else:
-                # Unable to interpret date
-                return None
+            while True:
+                # Keep the look-ahead window full
+                while next_to_schedule < page_number + self.page_lookahead:
+                    in_flight[next_to_schedule] = asyncio.create_task(
+                        self._fetch_page(semaphore, source, next_to_schedule)
+                    )
+                    next_to_schedule += 1
+
+                page = await in_flight.pop(page_number)
+                if page is None:
+                    break  # Stop pagination on HTTP error
+                stats.pages_fetched += 1
+
+                if page.html is None:
+                    # Byte-identical to a page already parsed today: nothing new on it
+                    if not page.cards:
+                        stats.completed = True
+                        break
+                    stats.pages_unchanged += 1
+                    stats.last_page = page_number
+                    stale_pages += 1
+                else:
+                    with SCRAPE_PARSE_SECONDS.time(source=source.name):
+                        page_dicts = await self.parse_pool.parse(
+                            page.html, source.base_url, page_number, source.extractor
+                        )
+                    self.http_cache.mark_parsed(page.url, len(page_dicts) if page_dicts else 0)
+                    stats.pages_parsed += 1
+
+                    # If no event cards found, we’ve reached the end:
+                    if page_dicts is None:
+                        stats.completed = True
+                        break
+                    stats.last_page = page_number
+
+                    page_events = [Event(**d) for d in self._unseen(page_dicts, stats)]
+                    EVENTS_SCRAPED.inc(len(page_events), source=source.name)
+                    self.archive.write(page_events)
+                    await emit(page_events)
+                    if self.delta and any(self.delta.is_new_or_changed(e) for e in page_events):
+                        stale_pages = 0
+                    else:
+                        stale_pages += 1
+
+                if self.delta and not plan.full and stale_pages >= self.delta.stop_after:
+                    stats.stopped_early = True
+                    break
+                # Move to next page
+                page_number += 1
+        finally:
+            # Drop speculative fetches for pages past the end of the listing
+            for task in in_flight.values():
+                task.cancel()
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
+            await self.http_cache.save()
+
+        logger.info("Crawl finished", **stats.as_dict())
+
+    def _unseen(self, page_dicts: List[dict], stats: CrawlStats) -> List[dict]:
+        """
+        Drop cards already seen this run, e.g. promoted events that Eventbrite
+        repeats on every page. Runs once the page has been parsed, before the
+        cards are validated, archived or stored.
+        """
+        fresh = []
+        for card in page_dicts:
+            key = (card.get("source_url"), card.get("source_id"))
+            if not key[1]:
+                fresh.append(card)
+            elif key not in self.seen:
+                self.seen.add(key)
+                fresh.append(card)
+        repeats = len(page_dicts) - len(fresh)
+        if repeats:
+            stats.cards_repeated += repeats
+            EVENTS_DEDUPLICATED.inc(repeats, kind="exact")
+        return fresh
 
-        return datetime.combine(event_date, time_obj)
+    def _parse_date_time(self, raw: str) -> Optional[datetime]:
+        """Kept for callers of the old method; see `parsing.parse_date_time`."""
+        return parse_date_time(raw)
@@ -0,0 +1,144 @@
+"""
+In-process inverted index over event title, venue and description.
+
+Built once from Mongo at startup and updated incrementally after each ingest,
+so a search only touches the postings of the query terms rather than every
+event in the catalogue.
+"""
+import bisect
+import math
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Relative weight of a term occurrence in each indexed field
+FIELD_WEIGHTS = {"title": 3.0, "venue": 1.5, "description": 1.0}
+
+# Score multiplier when a query term only matches as a prefix
+PREFIX_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self):
+        # doc id → event in API shape
+        self._docs: Dict[str, dict] = {}
+        # term → {doc id: weighted term frequency}
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        # doc id → its terms, so a document can be removed without a full scan
+        self._doc_terms: Dict[str, Set[str]] = {}
+        # Sorted vocabulary for prefix lookups, rebuilt lazily after writes
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def upsert(self, doc: dict):
+        doc_id = doc["id"]
+        self.remove(doc_id)
+        weights: Dict[str, float] = defaultdict(float)
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for term in tokenize(doc.get(field) or ""):
+                weights[term] += field_weight
+        for term, weight in weights.items():
+            self._postings[term][doc_id] = weight
+        self._doc_terms[doc_id] = set(weights)
+        self._docs[doc_id] = doc
+        self._vocab_dirty = True
+
+    def remove(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        del self._docs[doc_id]
+        self._vocab_dirty = True
+
+    def remove_before(self, cutoff: datetime) -> int:
+        """Drop events dated before `cutoff`; returns how many were removed."""
+        stale = [i for i, d in self._docs.items() if d.get("date") is None or d["date"] < cutoff]
+        for doc_id in stale:
+            self.remove(doc_id)
+        return len(stale)
+
+    def replace_all(self, docs: Iterable[dict]):
+        self._docs.clear()
+        self._postings.clear()
+        self._doc_terms.clear()
+        for doc in docs:
+            self.upsert(doc)
+        self._vocab_dirty = True
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """The term itself plus every indexed term it is a prefix of."""
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        matches = []
+        start = bisect.bisect_left(self._vocab, term)
+        for candidate in self._vocab[start:]:
+            if not candidate.startswith(term):
+                break
+            matches.append((candidate, 1.0 if candidate == term else PREFIX_WEIGHT))
+        return matches
+
+    def search(
+        self,
+        query: str,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Tuple[int, List[dict]]:
+        """
+        Rank events matching every query term (as a word or word prefix).
+        Returns (total matches, requested page of events with a `score`).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return 0, []
+
+        total_docs = max(1, len(self._docs))
+        scores: Optional[Dict[str, float]] = None
+        for term in dict.fromkeys(terms):
+            term_scores: Dict[str, float] = defaultdict(float)
+            for candidate, match_weight in self._expand(term):
+                postings = self._postings[candidate]
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    term_scores[doc_id] += match_weight * idf * (tf / (tf + 1.2))
+            if scores is None:
+                scores = term_scores
+            else:
+                # Every term has to match
+                scores = {d: s + term_scores[d] for d, s in scores.items() if d in term_scores}
+            if not scores:
+                return 0, []
+
+        ranked = []
+        for doc_id, score in scores.items():
+            doc = self._docs[doc_id]
+            date = doc.get("date")
+            if date_from is not None and (date is None or date < date_from):
+                continue
+            if date_to is not None and (date is None or date > date_to):
+                continue
+            ranked.append((-score, date or datetime.max, doc_id))
+        ranked.sort()
+
+        page = [
+            {**self._docs[doc_id], "score": round(-neg_score, 4)}
+            for neg_score, _, doc_id in ranked[offset:offset + limit]
+        ]
+        return len(ranked), page
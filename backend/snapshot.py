@@ -0,0 +1,165 @@
+"""
+In-process snapshot of the unfiltered GET /events response.
+
+The event list only changes when a scrape, manual scrape or cleanup writes to
+Mongo, so the serialized JSON (plus gzip/brotli variants and a strong ETag)
+is built once and served from memory until one of those writes refreshes it.
+First pages of the list (GET /events?limit=N, what the frontend asks for) are
+sliced from the same events and cached alongside it.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from log import get_logger
+
+logger = get_logger("snapshot")
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+@dataclass
+class SnapshotEntry:
+    body: bytes
+    gzip_body: bytes
+    br_body: Optional[bytes]
+    etag: str
+    count: int
+    built_at: float
+    # Cursor for the page after this one (first-page entries only)
+    next_cursor: Optional[str] = None
+    # The full list's events and the first pages sliced from them, by limit
+    events: Optional[List[dict]] = field(default=None, repr=False)
+    pages: Dict[int, "SnapshotEntry"] = field(default_factory=dict, repr=False)
+
+    def encode_for(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """Pick the best pre-compressed variant for an Accept-Encoding header."""
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in accept_encoding.split(",")
+            if part.strip() and not part.replace(" ", "").endswith(";q=0")
+        }
+        if self.br_body is not None and "br" in accepted:
+            return self.br_body, "br"
+        if "gzip" in accepted or "*" in accepted:
+            return self.gzip_body, "gzip"
+        return self.body, None
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Weak comparison of an If-None-Match header against our ETag."""
+        if not if_none_match:
+            return False
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or any(t.removeprefix("W/") == self.etag for t in tags)
+
+
+def build_entry(events: List[dict], next_cursor: Optional[str] = None) -> SnapshotEntry:
+    body = json.dumps(events, default=json_default, separators=(",", ":")).encode("utf-8")
+    return SnapshotEntry(
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=6),
+        br_body=brotli.compress(body, quality=5) if brotli else None,
+        etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+        count=len(events),
+        built_at=time.monotonic(),
+        next_cursor=next_cursor,
+    )
+
+
+class EventsSnapshot:
+    """
+    Holds the current `SnapshotEntry` and rebuilds it on demand.
+
+    Entries older than `max_age` seconds (SNAPSHOT_MAX_AGE, default 300) are
+    rebuilt even without a write, so events drop out once their date passes.
+    `cursor_for` gives the next-page cursor after an event, for first pages.
+    """
+
+    def __init__(self, max_age: Optional[float] = None, cursor_for: Optional[Callable[[dict], str]] = None):
+        self.max_age = float(os.getenv("SNAPSHOT_MAX_AGE", 300)) if max_age is None else max_age
+        self.cursor_for = cursor_for
+        self._entry: Optional[SnapshotEntry] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.builds = 0
+
+    def _fresh(self) -> Optional[SnapshotEntry]:
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry.built_at < self.max_age:
+            return entry
+        return None
+
+    async def get(self, loader: Callable[[], Awaitable[List[dict]]], limit: Optional[int] = None) -> SnapshotEntry:
+        """The full list, or with `limit` its first `limit` events."""
+        entry = self._fresh()
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            async with self._lock:
+                # Another request may have rebuilt it while we waited for the lock
+                entry = self._fresh() or await self._build(loader)
+        if limit is None or limit >= entry.count:
+            return entry
+        return self._first_page(entry, limit)
+
+    def _first_page(self, entry: SnapshotEntry, limit: int) -> SnapshotEntry:
+        page = entry.pages.get(limit)
+        if page is None:
+            events = entry.events[:limit]
+            next_cursor = self.cursor_for(events[-1]) if self.cursor_for else None
+            # A page is small enough to build on the loop
+            page = entry.pages[limit] = build_entry(events, next_cursor)
+        return page
+
+    async def refresh(self, loader: Callable[[], Awaitable[List[dict]]]):
+        """Rebuild after a write; on failure just drop the stale entry."""
+        self.invalidate()
+        try:
+            async with self._lock:
+                await self._build(loader)
+        except Exception as e:
+            logger.exception("Error rebuilding events snapshot", error=str(e))
+
+    def invalidate(self):
+        self._entry = None
+
+    async def _build(self, loader: Callable[[], Awaitable[List[dict]]]) -> SnapshotEntry:
+        events = await loader()
+        # Serializing and compressing a large catalogue is CPU work; keep it off the loop
+        entry = await asyncio.to_thread(build_entry, events)
+        entry.events = events
+        self._entry = entry
+        self.builds += 1
+        return entry
+
+    def stats(self) -> dict:
+        entry = self._entry
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "builds": self.builds,
+            "events": entry.count if entry else 0,
+            "bytes": len(entry.body) if entry else 0,
+            "gzip_bytes": len(entry.gzip_body) if entry else 0,
+            "br_bytes": len(entry.br_body) if entry and entry.br_body else 0,
+            "age_seconds": round(time.monotonic() - entry.built_at, 1) if entry else None,
+        }
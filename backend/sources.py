@@ -0,0 +1,69 @@
+"""
+Registry of listing sources the scraper crawls.
+
+A source names a paginated listing URL and the extractor (registered in
+`parsing.EXTRACTORS`) that turns one of its pages into event dicts. Extra
+sources can be registered in code with `register_source`, or supplied as a JSON
+list in SCRAPE_SOURCES, e.g.
+    [{"name": "...", "base_url": "https://...", "extractor": "eventbrite",
+      "rate": 1, "concurrency": 2}]
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from parsing import EXTRACTORS
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str
+    # Listing URL without any page parameter
+    base_url: str
+    extractor: str = "eventbrite"
+    page_param: str = "page"
+    # Optional per-host overrides for the scheduler
+    rate: Optional[float] = None
+    burst: Optional[float] = None
+    concurrency: Optional[int] = None
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.base_url).netloc
+
+    def page_url(self, page_number: int) -> str:
+        separator = "&" if "?" in self.base_url else "?"
+        return f"{self.base_url}{separator}{self.page_param}={page_number}"
+
+
+_SOURCES: Dict[str, Source] = {}
+
+
+def register_source(source: Source):
+    if source.extractor not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor {source.extractor!r} for source {source.name!r}")
+    _SOURCES[source.name] = source
+
+
+def get_sources() -> List[Source]:
+    """Registered sources plus any configured through SCRAPE_SOURCES."""
+    sources = dict(_SOURCES)
+    raw = os.getenv("SCRAPE_SOURCES")
+    if raw:
+        for spec in json.loads(raw):
+            source = Source(**spec)
+            if source.extractor not in EXTRACTORS:
+                raise ValueError(f"Unknown extractor {source.extractor!r} for source {source.name!r}")
+            sources[source.name] = source
+    return list(sources.values())
+
+
+# “All Events in Sydney” on Eventbrite
+register_source(Source(
+    name="eventbrite-sydney",
+    base_url="https://www.eventbrite.com/d/australia--sydney/all-events/",
+    # "eventbrite" (full tree + CSS selectors) or "eventbrite-fast" (strained tree)
+    extractor=os.getenv("EVENTBRITE_EXTRACTOR", "eventbrite"),
+))
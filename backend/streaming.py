@@ -0,0 +1,50 @@
+"""
+Constant-memory streaming of Mongo query results as NDJSON or a chunked JSON array.
+"""
+import json
+import os
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+from snapshot import json_default
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def _encode(doc: dict) -> bytes:
+    if "_id" in doc:
+        doc["id"] = str(doc.pop("_id"))
+    return json.dumps(doc, default=json_default, separators=(",", ":")).encode("utf-8")
+
+
+async def ndjson_chunks(cursor) -> AsyncIterator[bytes]:
+    async for doc in cursor:
+        yield _encode(doc) + b"\n"
+
+
+async def json_array_chunks(cursor) -> AsyncIterator[bytes]:
+    yield b"["
+    first = True
+    async for doc in cursor:
+        yield _encode(doc) if first else b"," + _encode(doc)
+        first = False
+    yield b"]"
+
+
+def stream_cursor(cursor, fmt: str = "ndjson", batch_size: Optional[int] = None,
+                  headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    Wrap a Motor cursor in a StreamingResponse.
+
+    Documents are pulled `batch_size` at a time (STREAM_BATCH_SIZE, default 500)
+    and written out as they arrive, so memory does not grow with the result set.
+    """
+    if batch_size is None:
+        batch_size = int(os.getenv("STREAM_BATCH_SIZE", 500))
+    cursor = cursor.batch_size(batch_size)
+    chunks = ndjson_chunks(cursor) if fmt == "ndjson" else json_array_chunks(cursor)
+    return StreamingResponse(chunks, media_type=STREAM_FORMATS[fmt], headers=headers)
@@ -0,0 +1,63 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from archive import replay
+from ingest import bulk_upsert_events
+from models import Event
+
+
+def listing_card(**overrides) -> Event:
+    fields = dict(
+        source_id="2002", title="Opera Bar Sessions", description="",
+        date=datetime.utcnow().replace(microsecond=0) + timedelta(days=5),
+        venue="Opera Bar", image_url="https://img.example/2002.jpg",
+        ticket_url="https://www.eventbrite.com/e/2002", source_url="https://www.eventbrite.com/d/sydney/events/",
+    )
+    fields.update(overrides)
+    return Event(**fields)
+
+
+def write_archive(path, events):
+    with open(path, "w", encoding="utf-8") as fp:
+        for event in events:
+            fp.write(json.dumps(event.model_dump(exclude={"id"}), default=str) + "\n")
+
+
+def test_replay_keeps_enriched_fields(tmp_path):
+    async def scenario():
+        events = AsyncMongoMockClient().db.events
+        await bulk_upsert_events(events, [listing_card(description="Live jazz on the forecourt", price="Free")])
+        path = tmp_path / "scraped_events.jsonl"
+        write_archive(path, [listing_card(title="Opera Bar Sessions: Late Show")])
+
+        result = await replay(events, [str(path)])
+
+        stored = await events.find_one({"source_id": "2002"})
+        assert result.updated == 1
+        assert stored["title"] == "Opera Bar Sessions: Late Show"
+        assert stored["description"] == "Live jazz on the forecourt"
+        assert stored["price"] == "Free"
+
+    asyncio.run(scenario())
+
+
+def test_replay_assigns_canonical_ids(tmp_path):
+    async def scenario():
+        events = AsyncMongoMockClient().db.events
+        original = listing_card()
+        path = tmp_path / "scraped_events.jsonl"
+        # The same gig listed again under another id, and the original replayed unchanged
+        write_archive(path, [original, listing_card(source_id="2003", ticket_url="https://www.eventbrite.com/e/2003")])
+
+        await replay(events, [str(path)])
+        await replay(events, [str(path)])
+
+        stored = {doc["source_id"]: doc async for doc in events.find({})}
+        assert stored["2002"]["canonical_id"] == "2002"
+        assert stored["2003"]["canonical_id"] == "2002"
+        assert stored["2002"]["dedup_keys"]
+
+    asyncio.run(scenario())
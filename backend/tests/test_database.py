@@ -0,0 +1,37 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+import database
+
+
+def test_second_event_does_not_duplicate_subscription(monkeypatch):
+    monkeypatch.setattr(database, "AsyncIOMotorClient", lambda url: AsyncMongoMockClient())
+
+    async def scenario():
+        db = database.Database()
+        await db.ensure_indexes()
+        await db.verified_emails_collection.insert_one({"email": "fan@example.com", "verified": True})
+
+        assert await db.save_email_submission("fan@example.com", "event-1")
+        assert not await db.save_email_submission("fan@example.com", "event-2")
+        assert await db.email_submissions_collection.count_documents({}) == 1
+
+    asyncio.run(scenario())
+
+
+def test_otp_resend_with_different_case_reuses_the_document(monkeypatch):
+    monkeypatch.setattr(database, "AsyncIOMotorClient", lambda url: AsyncMongoMockClient())
+
+    async def scenario():
+        db = database.Database()
+        await db.ensure_indexes()
+        await db.create_otp("Fan@Example.com", "111111", "2000-01-01")
+        await db.create_otp(" fan@example.com", "222222", "2000-01-01")
+
+        assert await db.otps_collection.count_documents({}) == 1
+        assert not await db.verify_otp("fan@example.com", "111111")
+        assert await db.verify_otp("FAN@example.com", "222222")
+        assert await db.is_email_verified("fan@example.com")
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from dedup import Deduplicator
+from models import Event
+
+
+def listing(source_id: str, date: datetime) -> Event:
+    return Event(
+        source_id=source_id, title="Midnight Jazz at the Basement", description="",
+        date=date, venue="The Basement, Sydney", image_url="", ticket_url="",
+        source_url=f"https://{source_id}.example/events",
+    )
+
+
+def test_duplicates_across_midnight_are_matched():
+    async def scenario():
+        db = AsyncMongoMockClient().db
+        dedup = Deduplicator(db.events, threshold=0.6, enabled=True)
+        [first] = await dedup.assign([listing("a", datetime(2030, 3, 1, 23, 50))])
+        await db.events.insert_one(first.model_dump(exclude={"id"}))
+
+        # Stored on the next day's keys, found through the neighbouring-day lookup
+        [second] = await dedup.assign([listing("b", datetime(2030, 3, 2, 0, 20))])
+        assert second.canonical_id == "a"
+        assert all(key.startswith("2030-03-02:") for key in second.dedup_keys)
+
+        # Within one batch as well
+        db = AsyncMongoMockClient().db
+        batch = await Deduplicator(db.events, threshold=0.6, enabled=True).assign([
+            listing("c", datetime(2030, 3, 1, 23, 50)), listing("d", datetime(2030, 3, 2, 0, 20)),
+        ])
+        assert [e.canonical_id for e in batch] == ["c", "c"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from dedup import Deduplicator
+from enrichment import DetailEnricher
+from models import Event
+from pipeline import ScrapePipeline
+
+
+def listing_card(**overrides) -> Event:
+    fields = dict(
+        source_id="1001", title="Harbour Lights Festival", description="",
+        date=datetime.utcnow().replace(microsecond=0) + timedelta(days=3),
+        venue="Circular Quay", image_url="https://img.example/1001.jpg",
+        ticket_url="https://www.eventbrite.com/e/1001", source_url="https://www.eventbrite.com/d/sydney/events/",
+    )
+    fields.update(overrides)
+    return Event(**fields)
+
+
+def make_pipeline(db) -> ScrapePipeline:
+    # No fetcher or parse pool: every test here runs with a fetch budget of 0
+    enricher = DetailEnricher(db.event_details, None, None, enabled=True)
+    return ScrapePipeline(db.events, db.scrape_state, enricher, Deduplicator(db.events))
+
+
+def test_deferred_enrichment_keeps_stored_details():
+    async def scenario():
+        db = AsyncMongoMockClient().db
+        pipeline = make_pipeline(db)
+        enriched = listing_card(description="Lanterns along the foreshore", price="A$25",
+                                end_date=datetime(2030, 1, 1, 22))
+        await pipeline.upsert([enriched])
+
+        # Cached details expired and the refetch is over this cycle's budget
+        result = await pipeline.enricher.enrich([listing_card()], max_fetches=0)
+        assert result.deferred == 1
+        ingest = await pipeline.upsert(result.events)
+
+        stored = await db.events.find_one({"source_id": "1001"})
+        assert stored["description"] == "Lanterns along the foreshore"
+        assert stored["price"] == "A$25"
+        assert stored["end_date"] == datetime(2030, 1, 1, 22)
+        assert ingest.unchanged == 1
+
+    asyncio.run(scenario())
+
+
+def test_changed_listing_without_details_keeps_stored_details():
+    async def scenario():
+        db = AsyncMongoMockClient().db
+        pipeline = make_pipeline(db)
+        await pipeline.upsert([listing_card(description="Lanterns along the foreshore", price="A$25")])
+
+        ingest = await pipeline.upsert([listing_card(title="Harbour Lights Festival 2030")])
+
+        stored = await db.events.find_one({"source_id": "1001"})
+        assert ingest.updated == 1
+        assert stored["title"] == "Harbour Lights Festival 2030"
+        assert stored["description"] == "Lanterns along the foreshore"
+        assert stored["price"] == "A$25"
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import main
+from snapshot import EventsSnapshot
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = AsyncMongoMockClient().db
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    events = [{
+        "source_id": str(i), "title": f"Event {i}", "description": "Lanterns" if i == 3 else "", "date": start + timedelta(hours=i),
+        "venue": "Venue", "image_url": "", "ticket_url": "", "source_url": "https://listing.example/",
+        "content_hash": "h", "dedup_keys": ["k"],
+    } for i in range(5)]
+    asyncio.run(db.events.insert_many(events))
+    monkeypatch.setattr(main, "events_collection", db.events)
+    monkeypatch.setattr(main, "events_snapshot", EventsSnapshot(cursor_for=main.events_snapshot.cursor_for))
+    return TestClient(main.app)
+
+
+def test_first_page_served_from_snapshot(client):
+    first = client.get("/events", params={"limit": 2})
+    assert first.status_code == 200
+    assert [e["title"] for e in first.json()] == ["Event 0", "Event 1"]
+    assert "content_hash" not in first.json()[0]
+    assert main.events_snapshot.builds == 1
+
+    # Revalidation hits the snapshot without touching Mongo
+    again = client.get("/events", params={"limit": 2}, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+
+    # The cursor continues where the snapshot page stopped, through Mongo
+    rest = client.get("/events", params={"limit": 10, "cursor": first.headers["X-Next-Cursor"]})
+    assert [e["title"] for e in rest.json()] == ["Event 2", "Event 3", "Event 4"]
+    assert "X-Next-Cursor" not in rest.headers
+
+
+def test_page_covering_everything_has_no_cursor(client):
+    response = client.get("/events", params={"limit": 50})
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+    assert response.content == client.get("/events").content
+
+
+def test_search_matches_description(client):
+    response = client.get("/events", params={"limit": 10, "q": "lantern"})
+    assert [e["title"] for e in response.json()] == ["Event 3"]
@@ -0,0 +1,46 @@
+import asyncio
+
+from fetcher import CircuitBreaker, Fetcher
+
+
+def test_cancelled_half_open_trial_frees_the_circuit():
+    async def scenario():
+        fetcher = Fetcher(max_retries=0, breaker_threshold=1, breaker_reset=0)
+        url = "http://listing.example/events?page=1"
+        breaker = fetcher.breaker(url)
+        breaker.record_failure()
+        assert breaker.state == "half-open"
+
+        started = asyncio.Event()
+
+        class HangingRequest:
+            async def __aenter__(self):
+                started.set()
+                await asyncio.sleep(3600)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        class HangingSession:
+            def get(self, *args, **kwargs):
+                return HangingRequest()
+
+        fetcher._get_session = lambda: HangingSession()
+        trial = asyncio.create_task(fetcher.get(url))
+        await started.wait()
+        assert not breaker.allow()  # the trial is in flight
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+
+        assert breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_failed_trial_reopens_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    breaker.reset_timeout = 60
+    assert not breaker.allow()
@@ -0,0 +1,37 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure
+
+from indexes import INDEXES, reconcile_indexes
+
+
+class OldServerCollection:
+    """A collection on a server that rejects $in in partial filter expressions."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def create_index(self, keys, **options):
+        if "partialFilterExpression" in options:
+            raise OperationFailure("Expression not supported in partial index: $in")
+        return await self._collection.create_index(keys, **options)
+
+
+def test_refused_index_does_not_stop_reconcile():
+    async def scenario():
+        db = AsyncMongoMockClient().db
+        collections = {name: db[name] for name in INDEXES}
+        collections["jobs"] = OldServerCollection(db.jobs)
+
+        report = await reconcile_indexes(collections, drop_drift=False)
+
+        assert len(report.failed) == 1 and report.failed[0].startswith("jobs.key_1")
+        # Collections declared after jobs are still reconciled
+        assert "event_details.fetched_at_1" in report.created
+        assert "fetched_at_1" in await db.event_details.index_information()
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from indexes import reconcile_indexes
+from jobqueue import PENDING, JobQueue
+
+
+class LostRaceCollection:
+    """
+    Jobs collection whose keyed upsert behaves as if another enqueue inserted
+    the same pending job between the upsert's match and its insert.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def update_one(self, filter, update, upsert=False):
+        # The match already missed; what is left of the upsert is the insert
+        return await self._collection.insert_one({"key": filter["key"], **update["$setOnInsert"]})
+
+
+def test_concurrent_enqueue_same_key_adds_one_job():
+    async def scenario():
+        db = AsyncMongoMockClient().db
+        await reconcile_indexes(db)
+        queue = JobQueue(db.jobs)
+        ids = await asyncio.gather(*(
+            queue.enqueue("scrape_source", {"source": "sydney"}, key="scrape_source:sydney") for _ in range(5)
+        ))
+        assert len([i for i in ids if i is not None]) == 1
+
+        racing = JobQueue(LostRaceCollection(db.jobs))
+        assert await racing.enqueue("scrape_source", {"source": "sydney"}, key="scrape_source:sydney") is None
+        assert await db.jobs.count_documents({"key": "scrape_source:sydney", "status": {"$in": PENDING}}) == 1
+
+    asyncio.run(scenario())
+
+
+def test_enqueue_same_key_after_job_finishes():
+    async def scenario():
+        db = AsyncMongoMockClient().db
+        await reconcile_indexes(db)
+        queue = JobQueue(db.jobs)
+        assert await queue.enqueue("scrape_source", {}, key="scrape_source:sydney") is not None
+        job = await queue.claim("worker-1")
+        await queue.complete(job, "worker-1")
+        assert await queue.enqueue("scrape_source", {}, key="scrape_source:sydney") is not None
+
+    asyncio.run(scenario())
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from lease import LeaseLost, MongoLease
+
+
+def test_lease_taken_over_cancels_holder():
+    async def scenario():
+        leases = AsyncMongoMockClient().db.leases
+        lease = MongoLease(leases, "scrape-cycle", ttl=0.3, holder="a")
+        steps = []
+        with pytest.raises(LeaseLost):
+            async with lease.hold() as acquired:
+                assert acquired
+                steps.append("scrape")
+                # Another replica takes over, e.g. after this one stalled past the ttl
+                await leases.update_one({"_id": "scrape-cycle"}, {"$set": {"holder": "b"}})
+                await asyncio.sleep(1)
+                steps.append("cleanup")
+        assert steps == ["scrape"]
+        assert lease.lost
+        # Not released on the way out: the lease is b's now
+        assert (await leases.find_one({"_id": "scrape-cycle"}))["holder"] == "b"
+
+    asyncio.run(scenario())
+
+
+def test_lease_unrenewed_for_ttl_cancels_holder():
+    async def scenario():
+        leases = AsyncMongoMockClient().db.leases
+        lease = MongoLease(leases, "scrape-cycle", ttl=0.3, holder="a")
+
+        async def unreachable():
+            raise ConnectionError("mongo down")
+
+        with pytest.raises(LeaseLost):
+            async with lease.hold():
+                lease.renew = unreachable
+                await asyncio.sleep(1)
+
+    asyncio.run(scenario())
+
+
+def test_lease_held_through_slow_body():
+    async def scenario():
+        leases = AsyncMongoMockClient().db.leases
+        lease = MongoLease(leases, "scrape-cycle", ttl=0.3, holder="a")
+        async with lease.hold() as acquired:
+            assert acquired
+            await asyncio.sleep(0.5)
+        assert not lease.lost
+        assert await MongoLease(leases, "scrape-cycle", holder="b").acquire()
+
+    asyncio.run(scenario())
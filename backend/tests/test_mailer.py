@@ -0,0 +1,71 @@
+import asyncio
+import smtplib
+
+import pytest
+
+import mailer
+from mailer import MailQueue, OutgoingMail
+
+
+class FailingConnection:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def send(self, sender, mail):
+        self.calls += 1
+        raise self.error
+
+
+def deliver(error) -> int:
+    queue = MailQueue(host="smtp.example", port=25, username="", password="", workers=1)
+    queue.max_retries = 3
+    queue.retry_backoff = 0
+    connection = FailingConnection(error)
+    asyncio.run(queue._deliver(connection, OutgoingMail("fan@example.com", "Your code", "123456")))
+    assert queue.failed == 1
+    return connection.calls
+
+
+@pytest.mark.parametrize("error", [
+    smtplib.SMTPRecipientsRefused({"fan@example.com": (550, b"No such user")}),
+    smtplib.SMTPAuthenticationError(535, b"Bad credentials"),
+    smtplib.SMTPDataError(554, b"Rejected as spam"),
+])
+def test_permanent_errors_are_not_retried(error):
+    assert deliver(error) == 1
+
+
+@pytest.mark.parametrize("error", [
+    smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+    ConnectionResetError(),
+    smtplib.SMTPDataError(451, b"Try again later"),
+])
+def test_transient_errors_are_retried(error):
+    assert deliver(error) == 4
+
+
+def test_failed_login_closes_the_socket(monkeypatch):
+    opened = []
+
+    class FakeSMTP:
+        def __init__(self, host, port, timeout):
+            self.closed = False
+            opened.append(self)
+
+        def starttls(self):
+            pass
+
+        def login(self, username, password):
+            raise smtplib.SMTPAuthenticationError(535, b"Bad credentials")
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(mailer.smtplib, "SMTP", FakeSMTP)
+    queue = MailQueue(host="smtp.example", port=587, username="app", password="wrong", workers=1)
+    connection = mailer._SmtpConnection(queue)
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        connection._connect()
+    assert opened[0].closed
+    assert connection.server is None
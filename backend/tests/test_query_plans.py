@@ -0,0 +1,44 @@
+"""
+Hot queries must be served by an index. Needs a real MongoDB (explain() on
+mongomock says nothing); set TEST_MONGODB_URL, otherwise MONGODB_URL or
+localhost is tried and the test is skipped when none answers. Runs against
+a throwaway "louder_query_plans" database.
+"""
+import asyncio
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import check_query_plans, reconcile_indexes
+
+MONGO_URL = os.getenv("TEST_MONGODB_URL") or os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE = "louder_query_plans"
+
+
+def mongo_reachable() -> bool:
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+@pytest.mark.skipif(not mongo_reachable(), reason=f"no MongoDB at {MONGO_URL}")
+def test_hot_queries_use_an_index():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def scenario():
+        client = AsyncIOMotorClient(MONGO_URL)
+        await client.drop_database(DATABASE)
+        try:
+            db = client[DATABASE]
+            report = await reconcile_indexes(db, drop_drift=False)
+            assert not report.failed, report.failed
+            assert await check_query_plans(db) == []
+        finally:
+            await client.drop_database(DATABASE)
+            client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,25 @@
+import pytest
+
+from ratelimit import parse_rate
+from scheduler import HostLimits, HostScheduler, default_host_limits
+from scraper import EventScraper
+from sources import Source
+
+
+def test_parse_rate():
+    assert parse_rate("3/600") == (3 / 600, 3)
+    for spec in ("0/60", "3/0", "-1"):
+        with pytest.raises(ValueError):
+            parse_rate(spec)
+
+
+def test_zero_host_rate_is_rejected(monkeypatch):
+    monkeypatch.setenv("HOST_RATE_LIMIT", "0")
+    with pytest.raises(ValueError):
+        default_host_limits()
+
+    with pytest.raises(ValueError):
+        EventScraper(
+            sources=[Source(name="test", base_url="https://listing.example/events", rate=0)],
+            scheduler=HostScheduler(HostLimits(rate=1, burst=1, concurrency=1)),
+        )
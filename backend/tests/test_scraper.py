@@ -0,0 +1,65 @@
+import asyncio
+import random
+
+from archive import ArchiveWriter
+from fetcher import FetchResult
+from http_cache import HttpCache
+from scheduler import HostLimits, HostScheduler
+from scraper import EventScraper
+from sources import Source
+
+LAST_PAGE = 6
+
+
+class SlowFetcher:
+    """Listing pages 1..LAST_PAGE with out-of-order latencies, then empty pages."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.requested = []
+
+    async def get(self, url, headers=None):
+        page = int(url.rsplit("=", 1)[1])
+        self.requested.append(page)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(random.uniform(0.001, 0.02))
+        finally:
+            self.in_flight -= 1
+        return FetchResult(url, 200, str(page) if page <= LAST_PAGE else "", {})
+
+
+class FakeParsePool:
+    async def parse(self, html, base_url, page_number, extractor):
+        if not html:
+            return None
+        return [{
+            "source_id": f"{page_number}-{i}", "title": f"Event {page_number}-{i}", "description": "",
+            "date": None, "venue": "Venue", "image_url": "", "ticket_url": "", "source_url": base_url,
+        } for i in range(3)]
+
+
+def test_pages_fetched_concurrently_and_emitted_in_order():
+    async def scenario():
+        fetcher = SlowFetcher()
+        scraper = EventScraper(
+            page_concurrency=3,
+            page_lookahead=4,
+            parse_pool=FakeParsePool(),
+            http_cache=HttpCache(max_entries=0),
+            sources=[Source(name="test", base_url="https://listing.example/events")],
+            scheduler=HostScheduler(HostLimits(rate=1000, burst=1000, concurrency=10)),
+            archive=ArchiveWriter(enabled=False),
+            fetcher=fetcher,
+        )
+        events = await scraper.scrape_events()
+
+        assert [e.source_id for e in events] == [f"{p}-{i}" for p in range(1, LAST_PAGE + 1) for i in range(3)]
+        assert 1 < fetcher.peak <= 3
+        # Look-ahead past the empty page is bounded and cancelled
+        assert max(fetcher.requested) <= LAST_PAGE + 4
+        assert scraper.crawl_stats[0].completed
+
+    asyncio.run(scenario())
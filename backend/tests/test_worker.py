@@ -0,0 +1,61 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect
+
+from jobqueue import JobQueue
+from pipeline import PipelineResult
+from worker import SCRAPE_SOURCE, ScrapeWorker
+
+
+class FakePipeline:
+    def __init__(self):
+        self.runs = 0
+
+    async def run(self, sources, full=False, on_batch=None):
+        self.runs += 1
+        return PipelineResult()
+
+
+class FlakyQueue(JobQueue):
+    """Fails the first completion and the first reap, as a Mongo failover would."""
+
+    def __init__(self, collection):
+        super().__init__(collection)
+        self.failures = {"complete": 1, "reap": 1}
+
+    def _maybe_fail(self, name):
+        if self.failures[name]:
+            self.failures[name] -= 1
+            raise AutoReconnect("primary stepped down")
+
+    async def complete(self, job, worker, result=None):
+        self._maybe_fail("complete")
+        await super().complete(job, worker, result)
+
+    async def reap(self):
+        self._maybe_fail("reap")
+        return await super().reap()
+
+
+def test_worker_survives_queue_errors():
+    async def scenario():
+        db = AsyncMongoMockClient().db
+        queue = FlakyQueue(db.jobs)
+        pipeline = FakePipeline()
+        worker = ScrapeWorker(db, queue=queue, pipeline=pipeline, concurrency=1, poll_interval=0.01)
+        for _ in range(2):
+            await queue.enqueue(SCRAPE_SOURCE, {"source": "eventbrite-sydney"})
+
+        # Reaps between polls; one of them fails
+        run = asyncio.create_task(worker.run())
+        while pipeline.runs < 2 or queue.failures["reap"]:
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await run
+
+        statuses = sorted([doc["status"] async for doc in db.jobs.find({})])
+        # The first completion was lost; that job waits for its visibility timeout
+        assert statuses == ["done", "running"]
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
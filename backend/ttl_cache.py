@@ -0,0 +1,41 @@
+"""
+Small in-process cache with per-entry expiry.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Maps keys to values for `ttl` seconds. At most `max_size` entries are
+    kept; the least recently written one is evicted first. Entries are never
+    invalidated early: the TTL is the only bound on staleness.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is not None:
+            value, expires_at = item
+            if time.monotonic() < expires_at:
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any):
+        self._data.pop(key, None)
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,202 @@
+"""
+Standalone scrape worker.
+
+    python worker.py [--concurrency N] [--once]
+
+With SCRAPE_MODE=queue the API only enqueues one "scrape_source" job per
+source each cycle (see jobqueue.py); workers claim those jobs and run each
+source through the scrape pipeline. Start as many workers as needed, on as
+many machines as needed: a job is worked on by one worker at a time, and a
+job whose worker dies is picked up by another once its visibility timeout
+passes. Each worker runs up to WORKER_CONCURRENCY jobs at once. With --once
+it exits when no job is due.
+
+SIGTERM/SIGINT stop claiming, cancel the jobs in progress and hand them back
+to the queue.
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import sys
+import uuid
+from typing import Optional, Set
+
+from dotenv import load_dotenv
+
+# Before the imports below, which read their settings at import time
+load_dotenv()
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from dedup import Deduplicator  # noqa: E402
+from enrichment import DetailEnricher  # noqa: E402
+from indexes import reconcile_indexes  # noqa: E402
+from ingest import IngestResult  # noqa: E402
+from jobqueue import Job, JobQueue, PermanentJobError  # noqa: E402
+from log import get_logger  # noqa: E402
+from pipeline import ScrapePipeline, bump_events_version  # noqa: E402
+from scraper import default_archive, default_fetcher, default_parse_pool, default_scheduler  # noqa: E402
+from sources import get_sources  # noqa: E402
+
+logger = get_logger("worker")
+
+SCRAPE_SOURCE = "scrape_source"
+
+
+class ScrapeWorker:
+    def __init__(
+        self,
+        db,
+        queue: Optional[JobQueue] = None,
+        pipeline: Optional[ScrapePipeline] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self.queue = queue or JobQueue(db.jobs)
+        self.pipeline = pipeline or ScrapePipeline(
+            db.events, db.scrape_state,
+            DetailEnricher(db.event_details, default_fetcher, default_parse_pool, default_scheduler),
+            Deduplicator(db.events),
+        )
+        self.state_collection = db.scrape_state
+        self.concurrency = max(1, concurrency or int(os.getenv("WORKER_CONCURRENCY", 2)))
+        # Seconds between claim attempts while the queue is empty
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv("WORKER_POLL_INTERVAL", 5))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.stopping = asyncio.Event()
+        self._running: Set[asyncio.Task] = set()
+
+    async def run(self, once: bool = False):
+        logger.info("Worker started", worker=self.worker_id, concurrency=self.concurrency)
+        await asyncio.gather(*(self._claim_loop(once) for _ in range(self.concurrency)))
+        logger.info("Worker stopped", worker=self.worker_id)
+
+    def stop(self):
+        """Stop claiming and hand running jobs back to the queue."""
+        self.stopping.set()
+        for task in self._running:
+            task.cancel()
+
+    async def _claim_loop(self, once: bool):
+        while not self.stopping.is_set():
+            try:
+                job = await self.queue.claim(self.worker_id, kinds=[SCRAPE_SOURCE])
+            except Exception as e:
+                logger.exception("Claiming a job failed", error=str(e))
+                job = None
+            if job is not None:
+                await self._process(job)
+                continue
+            if once:
+                return
+            try:
+                await self.queue.reap()
+            except Exception as e:
+                logger.exception("Reaping abandoned jobs failed", error=str(e))
+            # Jittered so idle workers do not poll in lockstep
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.poll_interval * random.uniform(0.5, 1.5))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, job: Job):
+        """
+        Run `job` and record the outcome. If recording it fails, the job is
+        left running and claimed again once its visibility timeout passes.
+        """
+        work = asyncio.create_task(self._run_job(job))
+        self._running.add(work)
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job, work, lost))
+        try:
+            result = await work
+        except asyncio.CancelledError:
+            if lost.is_set():
+                logger.warning("Abandoned job claimed by another worker", job=str(job.id))
+            elif self.stopping.is_set():
+                if await self._record(self.queue.release(job, self.worker_id), job, "release"):
+                    logger.info("Released job on shutdown", job=str(job.id))
+            else:
+                raise
+        except Exception as e:
+            permanent = isinstance(e, PermanentJobError)
+            logger.exception("Job failed", job=str(job.id), attempt=job.attempts, permanent=permanent, error=str(e))
+            await self._record(self.queue.fail(job, self.worker_id, repr(e), retry=not permanent), job, "fail")
+        else:
+            if await self._record(self.queue.complete(job, self.worker_id, result), job, "complete"):
+                logger.info("Job done", job=str(job.id), kind=job.kind, **job.payload)
+        finally:
+            self._running.discard(work)
+            heartbeat.cancel()
+
+    async def _record(self, update, job: Job, action: str) -> bool:
+        """Await a queue update for `job`; log instead of raising so the worker keeps running."""
+        try:
+            await update
+            return True
+        except Exception as e:
+            logger.exception("Recording job outcome failed; left to the visibility timeout",
+                             job=str(job.id), action=action, error=str(e))
+            return False
+
+    async def _heartbeat(self, job: Job, work: asyncio.Task, lost: asyncio.Event):
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            try:
+                if not await self.queue.heartbeat(job, self.worker_id):
+                    lost.set()
+                    work.cancel()
+                    return
+            except Exception as e:
+                # Keep working; the job is only lost if the timeout passes unrenewed
+                logger.warning("Job heartbeat failed", job=str(job.id), error=str(e))
+
+    async def _run_job(self, job: Job) -> dict:
+        if job.kind != SCRAPE_SOURCE:
+            raise PermanentJobError(f"Unknown job kind {job.kind!r}")
+        sources = {source.name: source for source in get_sources()}
+        source = sources.get(job.payload.get("source"))
+        if source is None:
+            raise PermanentJobError(f"Unknown source {job.payload.get('source')!r}")
+
+        async def on_batch(batch: IngestResult):
+            # API processes poll this to refresh /events and search
+            if batch.inserted or batch.updated:
+                await bump_events_version(self.state_collection)
+
+        result = await self.pipeline.run([source], full=bool(job.payload.get("full")), on_batch=on_batch)
+        return result.as_dict()
+
+
+async def _main(args) -> int:
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    db = client.sydney_events
+    report = await reconcile_indexes(db)
+    if report.failed:
+        logger.error("Indexes could not be created", failed=report.failed)
+    worker = ScrapeWorker(db, concurrency=args.concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run(once=args.once)
+    finally:
+        await default_archive.close()
+        await default_fetcher.close()
+        default_parse_pool.shutdown()
+        client.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scrape jobs from the Mongo job queue.")
+    parser.add_argument("--concurrency", type=int, help="jobs run at once (default WORKER_CONCURRENCY)")
+    parser.add_argument("--once", action="store_true", help="exit when no job is due")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
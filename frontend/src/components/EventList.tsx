@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Link } from 'react-router-dom';
 
 interface Event {
@@ -17,28 +17,57 @@ const EventList: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [searchQuery, setSearchQuery] = useState('');
+  // searchQuery once typing pauses; only this one triggers a request
+  const [debouncedQuery, setDebouncedQuery] = useState('');
+  // pageCursors[i] is the cursor that loads page i + 1 (page 1 needs none)
+  const [pageCursors, setPageCursors] = useState<(string | null)[]>([null]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const latestRequest = useRef(0);
+  const inFlight = useRef<AbortController | null>(null);
   const eventsPerPage = 30;
+  const searchDebounceMs = 300;
   const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
-  useEffect(() => {
-    const fetchEvents = async () => {
-      try {
-        const response = await fetch(`${API_URL}/events`);
-        if (!response.ok) {
-          throw new Error('Failed to fetch events');
-        }
-        const data = await response.json();
-        console.log('Received events data:', data);
-        setEvents(data);
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'An error occurred');
-      } finally {
-        setLoading(false);
+  const fetchEvents = async (cursor: string | null) => {
+    const requestId = ++latestRequest.current;
+    // Cancel the request for a page or search the user has already moved past
+    inFlight.current?.abort();
+    const controller = new AbortController();
+    inFlight.current = controller;
+    try {
+      const params = new URLSearchParams({ limit: String(eventsPerPage) });
+      if (debouncedQuery.trim()) params.set('q', debouncedQuery.trim());
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${API_URL}/events?${params}`, { signal: controller.signal });
+      if (!response.ok) {
+        throw new Error('Failed to fetch events');
       }
-    };
+      const data = await response.json();
+      // A response can still land after a newer request started
+      if (requestId !== latestRequest.current) return;
+      setEvents(data);
+      setNextCursor(response.headers.get('X-Next-Cursor'));
+      setError(null);
+    } catch (err) {
+      if (requestId !== latestRequest.current) return;
+      setError(err instanceof Error ? err.message : 'An error occurred');
+    } finally {
+      if (requestId === latestRequest.current) setLoading(false);
+    }
+  };
 
-    fetchEvents();
-  }, []);
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery), searchDebounceMs);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  useEffect(() => {
+    setCurrentPage(1);
+    setPageCursors([null]);
+    fetchEvents(null);
+  }, [debouncedQuery]);
+
+  useEffect(() => () => inFlight.current?.abort(), []);
 
   const formatDate = (dateString: string) => {
     try {
@@ -69,29 +98,20 @@ const EventList: React.FC = () => {
     }
   };
 
-  const filteredEvents = events.filter(event => {
-    const searchLower = searchQuery.toLowerCase();
-    return (
-      event.title.toLowerCase().includes(searchLower) ||
-      event.description.toLowerCase().includes(searchLower) ||
-      event.venue.toLowerCase().includes(searchLower)
-    );
-  });
-
-  const indexOfLastEvent = currentPage * eventsPerPage;
-  const indexOfFirstEvent = indexOfLastEvent - eventsPerPage;
-  const currentEvents = filteredEvents.slice(indexOfFirstEvent, indexOfLastEvent);
-  const totalPages = Math.ceil(filteredEvents.length / eventsPerPage);
+  const hasNextPage = nextCursor !== null;
 
   const handlePageChange = (pageNumber: number) => {
+    if (pageNumber > currentPage) {
+      if (!nextCursor) return;
+      setPageCursors((prev) => [...prev.slice(0, currentPage), nextCursor]);
+      fetchEvents(nextCursor);
+    } else {
+      fetchEvents(pageCursors[pageNumber - 1]);
+    }
     setCurrentPage(pageNumber);
     window.scrollTo({ top: 0, behavior: 'smooth' });
   };
 
-  useEffect(() => {
-    setCurrentPage(1);
-  }, [searchQuery]);
-
   if (loading) {
     return <div className="text-center py-8">Loading events...</div>;
   }
@@ -122,16 +142,11 @@ const EventList: React.FC = () => {
               </button>
             )}
           </div>
-          {searchQuery && (
-            <p className="mt-2 text-sm text-gray-600">
-              Found {filteredEvents.length} event{filteredEvents.length !== 1 ? 's' : ''} matching "{searchQuery}"
-            </p>
-          )}
         </div>
       </div>
 
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-        {currentEvents.map((event) => (
+        {events.map((event) => (
           <Link
             key={event.id}
             to={`/event/${event.id}`}
@@ -154,14 +169,14 @@ const EventList: React.FC = () => {
       </div>
 
       {/* Show message when no events match the search */}
-      {searchQuery && filteredEvents.length === 0 && (
+      {searchQuery && events.length === 0 && (
         <div className="text-center py-8 text-gray-600">
           No events found matching "{searchQuery}"
         </div>
       )}
 
       {/* Pagination Controls */}
-      {totalPages > 1 && (
+      {(currentPage > 1 || hasNextPage) && (
         <div className="flex justify-center items-center space-x-4 mt-8 mb-4">
           <button
             onClick={() => handlePageChange(currentPage - 1)}
@@ -176,14 +191,14 @@ const EventList: React.FC = () => {
           </button>
 
           <span className="text-gray-700">
-            Page {currentPage} of {totalPages}
+            Page {currentPage}
           </span>
 
           <button
             onClick={() => handlePageChange(currentPage + 1)}
-            disabled={currentPage === totalPages}
+            disabled={!hasNextPage}
             className={`px-6 py-2 rounded-md ${
-              currentPage === totalPages
+              !hasNextPage
                 ? 'bg-gray-200 text-gray-500 cursor-not-allowed'
                 : 'bg-blue-600 text-white hover:bg-blue-700'
             }`}
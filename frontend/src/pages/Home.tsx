@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import EventCard from '../components/EventCard';
 import { formatDate } from '../utils/dateUtils';
@@ -21,63 +21,77 @@ interface HomeProps {
 
 const Home: React.FC<HomeProps> = ({ searchTerm, onShowEmailModalRequest }) => {
   const [events, setEvents] = useState<Event[]>([]);
-  const [filteredEvents, setFilteredEvents] = useState<Event[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [currentPage, setCurrentPage] = useState(1);
+  // pageCursors[i] is the cursor that loads page i + 1 (page 1 needs none)
+  const [pageCursors, setPageCursors] = useState<(string | null)[]>([null]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  // searchTerm once typing pauses; only this one triggers a request
+  const [debouncedTerm, setDebouncedTerm] = useState(searchTerm);
+  const latestRequest = useRef(0);
+  const inFlight = useRef<AbortController | null>(null);
   const EVENTS_PER_PAGE = 30;
+  const SEARCH_DEBOUNCE_MS = 300;
   const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
   useEffect(() => {
-    fetchEvents();
-  }, []);
+    const timer = setTimeout(() => setDebouncedTerm(searchTerm), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
   useEffect(() => {
-    if (!searchTerm.trim()) {
-      setFilteredEvents(events);
-      setCurrentPage(1); // Reset to first page on new search
-      return;
-    }
-
-    const searchTermLower = searchTerm.toLowerCase();
-    const filtered = events.filter(event => 
-      event.title.toLowerCase().includes(searchTermLower) ||
-      event.venue.toLowerCase().includes(searchTermLower)
-    );
-    setFilteredEvents(filtered);
     setCurrentPage(1); // Reset to first page on new search
-  }, [searchTerm, events]);
+    setPageCursors([null]);
+    fetchEvents(null);
+  }, [debouncedTerm]);
+
+  useEffect(() => () => inFlight.current?.abort(), []);
 
-  const fetchEvents = async () => {
+  const fetchEvents = async (cursor: string | null) => {
+    const requestId = ++latestRequest.current;
+    // Cancel the request for a page or search the user has already moved past
+    inFlight.current?.abort();
+    const controller = new AbortController();
+    inFlight.current = controller;
     try {
-      const response = await axios.get(`${API_URL}/events`);
+      const params: Record<string, string | number> = { limit: EVENTS_PER_PAGE };
+      if (debouncedTerm.trim()) params.q = debouncedTerm.trim();
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API_URL}/events`, { params, signal: controller.signal });
+      // A response can still land after a newer request started
+      if (requestId !== latestRequest.current) return;
       const formattedEvents = response.data.map((event: any) => ({
         ...event,
         date: formatDate(event.date)
       }));
       setEvents(formattedEvents);
-      setFilteredEvents(formattedEvents);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      setError(null);
       setLoading(false);
     } catch (err) {
+      if (requestId !== latestRequest.current) return;
       setError('Failed to fetch events');
       setLoading(false);
       console.error('Error fetching events:', err);
     }
   };
 
-  // Pagination logic
-  const totalPages = Math.ceil(filteredEvents.length / EVENTS_PER_PAGE);
-  const startIdx = (currentPage - 1) * EVENTS_PER_PAGE;
-  const endIdx = startIdx + EVENTS_PER_PAGE;
-  const currentEvents = filteredEvents.slice(startIdx, endIdx);
+  // Pagination logic (pages come from the server, one cursor at a time)
+  const hasNextPage = nextCursor !== null;
 
   const handlePrevPage = () => {
-    setCurrentPage((prev) => Math.max(prev - 1, 1));
+    if (currentPage === 1) return;
+    fetchEvents(pageCursors[currentPage - 2]);
+    setCurrentPage((prev) => prev - 1);
     window.scrollTo({ top: 0, behavior: 'smooth' });
   };
 
   const handleNextPage = () => {
-    setCurrentPage((prev) => Math.min(prev + 1, totalPages));
+    if (!nextCursor) return;
+    setPageCursors((prev) => [...prev.slice(0, currentPage), nextCursor]);
+    fetchEvents(nextCursor);
+    setCurrentPage((prev) => prev + 1);
     window.scrollTo({ top: 0, behavior: 'smooth' });
   };
 
@@ -113,7 +127,7 @@ const Home: React.FC<HomeProps> = ({ searchTerm, onShowEmailModalRequest }) => {
       <section className="container mx-auto  px-1 pt-12">
 
           <ParallaxScroll>
-        {currentEvents.map((event) => (
+        {events.map((event) => (
         <EventCard
          key={event.id}
            event={event}
@@ -121,14 +135,14 @@ const Home: React.FC<HomeProps> = ({ searchTerm, onShowEmailModalRequest }) => {
           />
           ))}
           </ParallaxScroll>
-        {filteredEvents.length === 0 && (
+        {events.length === 0 && (
           <div className="text-center py-8 text-gray-400">
             No events found matching your search.
           </div>
         )}
       </section>
       {/* Pagination Controls */}
-        {totalPages > 1 && (
+        {(currentPage > 1 || hasNextPage) && (
           <div className="relative z-10 flex justify-center items-center space-x-4 mb-8">
             <button
               onClick={handlePrevPage}
@@ -142,13 +156,13 @@ const Home: React.FC<HomeProps> = ({ searchTerm, onShowEmailModalRequest }) => {
               Previous
             </button>
             <span className="text-gray-300">
-              Page {currentPage} of {totalPages}
+              Page {currentPage}
             </span>
             <button
               onClick={handleNextPage}
-              disabled={currentPage === totalPages}
+              disabled={!hasNextPage}
               className={`px-6 py-2 rounded-full font-semibold transition-colors duration-200 ${
-                currentPage === totalPages
+                !hasNextPage
                   ? 'bg-gray-800 text-gray-500 cursor-not-allowed'
                   : 'bg-white text-black hover:bg-gray-200'
               }`}